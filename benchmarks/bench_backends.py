@@ -0,0 +1,100 @@
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from due.arraytree import ArrayTaskTree
+from due.tasks import TaskTree
+
+# compares memory use and operation times of the networkx and array-backed task trees.
+#
+#   python benchmarks/bench_backends.py
+#   python benchmarks/bench_backends.py --sizes 10000 100000
+
+BACKENDS = {'networkx': TaskTree, 'array': ArrayTaskTree}
+
+
+def synthetic_records(size, fanout=10):
+    # preorder (task_id, parent_id, attrs) records for a tree of `size` tasks where every task
+    # has up to `fanout` subtasks; deadlines spread over a year, every third task complete
+    today = date.today()
+    max_depth = 1
+    while fanout ** max_depth < size:
+        max_depth += 1
+
+    yield '0', None, {}
+    count = 1
+    stack = [('0', 0, 0)]
+    while stack and count < size:
+        parent, depth, next_child = stack.pop()
+        if next_child >= fanout or depth >= max_depth:
+            continue
+        stack.append((parent, depth, next_child + 1))
+
+        task_id = f'{parent}.{next_child}'
+        yield task_id, parent, {
+            'task_name': f'task {count}',
+            'deadline': today + timedelta(days=count % 365 - 180),
+            'complete': count % 3 == 0,
+        }
+        count += 1
+        stack.append((task_id, depth + 1, 0))
+
+
+def timed(function, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench(backend, size):
+    records = list(synthetic_records(size))
+    results = {}
+
+    gc.collect()
+    tracemalloc.start()
+    tree = backend.from_records(records)
+    results['memory (MB)'] = tracemalloc.get_traced_memory()[0] / 2**20
+    tracemalloc.stop()
+    del tree
+    gc.collect()
+
+    start = time.perf_counter()
+    tree = backend.from_records(records)
+    results['build (s)'] = time.perf_counter() - start
+    del records
+
+    today = date.today()
+    results['due_by (s)'] = timed(lambda: tree.due_by(today))
+    results['completed (s)'] = timed(lambda: tree.completed(False))
+    results['depth_limit (s)'] = timed(lambda: tree.depth_limit(1))
+    results['traverse (s)'] = timed(lambda: sum(1 for _ in tree.records()))
+
+    parent = next(iter(tree.children('0')))
+    results['add_task (us)'] = timed(lambda: tree.add_task(parent, 'new task', today), repeat=1000) * 1e6
+    results['complete_task (us)'] = timed(lambda: tree.complete_task(parent), repeat=1000) * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_backends')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rows = {name: bench(BACKENDS[name], size) for name in args.backends}
+        print(f"\n{size:,} tasks")
+        print(f"{'':<20}" + ''.join(f"{name:>12}" for name in rows))
+        for metric in next(iter(rows.values())):
+            print(f"{metric:<20}" + ''.join(f"{row[metric]:>12.3f}" for row in rows.values()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_backends import BACKENDS, synthetic_records
+from due.query import TaskQuery
+
+# compares the chained `due ls` filters (depth_limit -> due_by -> completed, each wrapping the
+# previous view) with a single TaskQuery, on a deep tree and on a wide one.
+#
+#   python benchmarks/bench_query.py
+#   python benchmarks/bench_query.py --size 200000 --backend array
+
+SHAPES = {
+    'deep (fan-out 2)': 2,
+    'wide (fan-out 500)': 500,
+}
+
+
+def best_of(function, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def render_walk(task_tree, root_id='0'):
+    # what the renderer does with the result: visit every reachable task
+    stack = [root_id]
+    count = 0
+    while stack:
+        node = stack.pop()
+        task_tree.task(node)
+        count += 1
+        stack.extend(task_tree.children(node))
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_query')
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--backend', choices=BACKENDS, default='networkx')
+    args = parser.parse_args()
+
+    today = date.today()
+    cases = {
+        'today (undone, due today)': dict(depth=None, deadline=today, status=False),
+        'milestones (depth 1)': dict(depth=1, deadline=None, status=None),
+        'undone, depth 3': dict(depth=3, deadline=None, status=False),
+    }
+
+    for shape, fanout in SHAPES.items():
+        tree = BACKENDS[args.backend].from_records(synthetic_records(args.size, fanout))
+        tree.deadline_index()
+        print(f"\n{shape}, {args.size:,} tasks, {args.backend}")
+        print(f"{'':<28}{'chained (s)':>14}{'query (s)':>14}{'shown':>10}")
+
+        for name, case in cases.items():
+            chained = lambda: render_walk(
+                tree.depth_limit(case['depth']).due_by(case['deadline']).completed(case['status'])
+            )
+            # the tree's view cache is cleared first, so the query is evaluated every time
+            fused = lambda: tree.view_cache.clear() or render_walk(
+                TaskQuery('0')
+                .depth_limit(case['depth'])
+                .due_by(case['deadline'])
+                .completed(case['status'])
+                .run(tree)
+            )
+            print(f"{name:<28}{best_of(chained):>14.4f}{best_of(fused):>14.4f}{fused():>10,}")
+
+
+if __name__ == '__main__':
+    main()
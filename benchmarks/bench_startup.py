@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# measures how long `import due` and `python -m due today` take in a fresh interpreter,
+# and fails (exit status 1) when either goes over its budget, or when `due today` imports one of
+# the libraries it's meant to do without (networkx and rich alone take over 200 ms to import,
+# so the default budget fails a `today` that loads them).
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --runs 20 --import-budget 0.02 --today-budget 0.15
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# libraries `due today` must not import
+HEAVY_MODULES = ('networkx', 'rich', 'numpy')
+
+# runs `due today` (output discarded) and prints the heavy modules it imported
+IMPORTED_SCRIPT = f"""
+import contextlib, io, runpy, sys
+sys.argv = ['due', 'today']
+with contextlib.redirect_stdout(io.StringIO()):
+    runpy.run_module('due', run_name='__main__')
+print(' '.join(sorted({{name.split('.')[0] for name in sys.modules}} & set({HEAVY_MODULES!r}))))
+"""
+
+CONFIG_TEMPLATE = """\
+task_file: {task_file}
+color:
+  task_id: '#14A2D2'
+  task_name: '#FFFFFF'
+  deadline: '#96368C'
+  complete: '#196719 reverse'
+  guide_line: '#FFFFFF'
+  delete: '#90323D reverse'
+  incomplete: '#FFFFFF reverse'
+"""
+
+
+def write_workdir(workdir, milestones, subtasks):
+    # writes a todo.json with `milestones` milestones of `subtasks` subtasks each, plus a config pointing at it
+    today = date.today()
+    children = []
+    for m in range(milestones):
+        milestone = {
+            'task_name': f'milestone {m}',
+            'deadline': (today + timedelta(days=30)).strftime("%Y-%m-%d"),
+            'complete': False,
+            'id': f'0.{m}',
+            'children': [
+                {
+                    'task_name': f'task {m}.{s}',
+                    'deadline': (today + timedelta(days=s % 14 - 7)).strftime("%Y-%m-%d"),
+                    'complete': s % 3 == 0,
+                    'id': f'0.{m}.{s}',
+                }
+                for s in range(subtasks)
+            ],
+        }
+        children.append(milestone)
+
+    task_file = workdir / 'todo.json'
+    with task_file.open(mode='w') as write_file:
+        json.dump({'id': '0', 'children': children}, write_file)
+
+    config_file = workdir / 'config.yaml'
+    config_file.write_text(CONFIG_TEMPLATE.format(task_file=task_file))
+    return config_file
+
+
+def time_command(command, env, runs):
+    # median wall time of `runs` fresh interpreter runs (after one warm-up run for the OS file cache)
+    timings = []
+    for i in range(runs + 1):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL)
+        if i:
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_startup')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--milestones', type=int, default=10)
+    parser.add_argument('--subtasks', type=int, default=50)
+    parser.add_argument('--import-budget', type=float, default=0.025, help='seconds on top of a bare interpreter')
+    parser.add_argument('--today-budget', type=float, default=0.2, help='seconds on top of a bare interpreter')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, 
+            DUE_CONFIG=str(write_workdir(Path(tmp), args.milestones, args.subtasks)),
+            DUE_NO_SERVER="1",  # measure a cold start even if `due serve` is running
+        )
+
+        baseline = time_command([sys.executable, '-c', 'pass'], env, args.runs)
+        results = {
+            'import due': (time_command([sys.executable, '-c', 'import due'], env, args.runs), args.import_budget),
+            'due today': (time_command([sys.executable, '-m', 'due', 'today'], env, args.runs), args.today_budget),
+        }
+        imported = subprocess.run(
+            [sys.executable, '-c', IMPORTED_SCRIPT], env=env, cwd=REPO_ROOT, check=True, capture_output=True, text=True,
+        ).stdout.split()
+
+    print(f"{'interpreter':<12} {baseline * 1000:8.1f} ms")
+    over_budget = False
+    for name, (elapsed, budget) in results.items():
+        net = elapsed - baseline
+        status = 'ok' if net <= budget else 'OVER BUDGET'
+        over_budget = over_budget or net > budget
+        print(f"{name:<12} {elapsed * 1000:8.1f} ms  (+{net * 1000:.1f} ms, budget {budget * 1000:.0f} ms)  {status}")
+
+    if imported:
+        print(f"due today imports {', '.join(imported)}  OVER BUDGET")
+        over_budget = True
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
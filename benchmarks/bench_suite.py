@@ -0,0 +1,203 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_backends import BACKENDS
+from generate import generate_records
+
+import due
+from due import export, storage
+from due.cli import Commands, RichTextTree
+from due.query import TaskQuery
+
+# times every stage of `due ls` and of the today / week views (load, filter, render, export,
+# save) on generated trees, with the peak memory each stage allocates. results can be written
+# as JSON and compared against an earlier run, failing (exit status 1) on regressions.
+#
+#   python benchmarks/bench_suite.py --sizes 10000 100000 --json before.json
+#   python benchmarks/bench_suite.py --sizes 10000 100000 --compare before.json
+#
+# rendering goes to /dev/null through a rich console with the bundled config's theme.
+
+VIEWS = {
+    # name: (depth, deadline in days from today or 'saturday', completion status), as in cli.py
+    'ls': (None, None, None),
+    'ls -e 1': (1, None, None),
+    'today': (None, 0, False),
+    'week': (None, 'saturday', False),
+}
+
+# stages faster than this are too noisy to flag as regressions
+MIN_SECONDS = 0.002
+
+
+def best_of(function, repeat):
+    # smallest wall time over `repeat` runs, and the last run's result
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def peak_memory(function):
+    # peak MB allocated by one run of function
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def measure(function, repeat, memory=True):
+    seconds, result = best_of(function, repeat)
+    stats = {'seconds': seconds}
+    if memory:
+        stats['peak_mb'] = peak_memory(function)
+    return stats, result
+
+
+def uncached(tree, function):
+    # function, run without the tree's view cache (see due/viewcache.py) so it does all its work
+    def run():
+        tree.view_cache.clear()
+        return function()
+    return run
+
+
+def null_console():
+    from rich.console import Console
+    return Console(file=open(os.devnull, 'w'), theme=due.COLOR, force_terminal=True, width=120)
+
+
+def run_case(backend, task_file, workdir, repeat, memory):
+    # the stages of each view, in the order a command runs them
+    results = {}
+    tree_class = BACKENDS[backend]
+
+    results['load'], tree = measure(lambda: tree_class.load(task_file, journaled=False), repeat, memory)
+    tree.deadline_index()
+
+    cons = null_console()
+    for view, (depth, deadline, status) in VIEWS.items():
+        if deadline == 'saturday':
+            deadline = Commands.get_next_saturday(due.TODAY)
+        elif deadline is not None:
+            deadline = due.TODAY + timedelta(days=deadline)
+
+        query = lambda: TaskQuery('0').depth_limit(depth).due_by(deadline).completed(status).run(tree)
+        results[f'{view}: filter'], selected = measure(uncached(tree, query), repeat, memory)
+        results[f'{view}: filter, cached'], _ = measure(query, repeat, memory)
+        results[f'{view}: render'], _ = measure(
+            lambda: RichTextTree.stream_tree('0', selected, False, False, False, cons), repeat, memory
+        )
+
+    with open(os.devnull, 'w') as devnull:
+        results['ls --jsonl: export'], _ = measure(
+            lambda: export.write_jsonl(export.rows(tree), devnull), repeat, memory
+        )
+
+    for suffix in (storage.JSON_SUFFIX, storage.SNAPSHOT_SUFFIX):
+        out = workdir / f'saved{suffix}'
+        results[f'save {suffix}'], _ = measure(lambda: tree.save(out), repeat, memory)
+
+    cons.file.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # prints the stages that got slower or bigger than baseline by more than tolerance (a
+    # fraction); returns how many did
+    regressions = 0
+    for case, stages in results.items():
+        for stage, stats in stages.items():
+            before = baseline.get(case, {}).get(stage)
+            if not before:
+                continue
+            for metric, value in stats.items():
+                old = before.get(metric)
+                if metric == 'seconds' and max(old or 0, value) < MIN_SECONDS:
+                    continue
+                if old and value > old * (1 + tolerance):
+                    regressions += 1
+                    print(f"regression: {case} / {stage} {metric} {old:.4f} -> {value:.4f} ({value / old - 1:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_suite')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000])
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--formats', nargs='+', choices=['json', 'snap'], default=['json'], help='task file formats to load')
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--fanout', type=int, default=8)
+    parser.add_argument('--deadline-spread', type=int, default=180)
+    parser.add_argument('--done-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the (slower) peak memory runs')
+    parser.add_argument('--json', type=Path, help='write results to this file')
+    parser.add_argument('--compare', type=Path, help='results file of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before --compare fails')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for size in args.sizes:
+            records = generate_records(
+                size, args.depth, args.fanout, args.deadline_spread, args.done_ratio, args.seed, due.TODAY,
+            )
+            task_files = {}
+            for file_format in args.formats:
+                task_files[file_format] = workdir / f'todo-{size}.{file_format}'
+            first, *rest = task_files.values()
+            storage.write_records(first, records)
+            for task_file in rest:
+                storage.convert(first, task_file)
+
+            for backend in args.backends:
+                for file_format, task_file in task_files.items():
+                    case = f'{size} tasks, {backend}, {file_format}'
+                    results[case] = run_case(backend, task_file, workdir, args.repeat, not args.no_memory)
+
+                    print(f"\n{case}")
+                    print(f"{'':<24}{'seconds':>12}{'peak MB':>12}")
+                    for stage, stats in results[case].items():
+                        peak = f"{stats['peak_mb']:>12.2f}" if 'peak_mb' in stats else ''
+                        print(f"{stage:<24}{stats['seconds']:>12.4f}{peak}")
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            'meta': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'today': due.TODAY.isoformat(),
+                'arguments': {key: value for key, value in vars(args).items() if key not in ('json', 'compare')},
+            },
+            'results': results,
+        }, indent=4, default=str))
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())['results']
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\n{regressions} regression(s) against {args.compare}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
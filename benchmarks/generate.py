@@ -0,0 +1,81 @@
+import argparse
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from due import storage
+
+# generates task trees that look like real ones, for benchmarks and for trying due on a big
+# todo list: milestones with a varying number of subtasks, deadlines scattered around today
+# (subtasks due no later than their parent), and tasks that are past due mostly done.
+#
+#   python benchmarks/generate.py /tmp/todo.json --size 100000
+#   python benchmarks/generate.py /tmp/todo.snap --size 1000000 --depth 6 --fanout 4
+
+
+def generate_records(size, depth=4, fanout=8, deadline_spread=180, done_ratio=0.3, seed=0, today=None):
+    # preorder (task_id, parent_id, attrs) records for a tree of `size` tasks (counting the root
+    # '0') at most `depth` levels deep. a task has 0 to 2*fanout subtasks (fanout on average);
+    # milestones are added until the tree has `size` tasks. deadlines fall within
+    # deadline_spread days of today, and about done_ratio of the tasks are complete
+    rng = random.Random(seed)
+    today = today or date.today()
+    earliest = today - timedelta(days=deadline_spread)
+
+    yield '0', None, {}
+    count = 1
+    milestones = 0
+    # (task_id, depth, deadline, subtasks still to add, next subtask number)
+    stack = []
+    while count < size:
+        if not stack:
+            deadline = today + timedelta(days=rng.randint(-deadline_spread, deadline_spread))
+            stack.append(('0', 0, deadline, 1, milestones))
+            milestones += 1
+
+        parent, parent_depth, parent_deadline, remaining, number = stack.pop()
+        if remaining == 0:
+            continue
+        stack.append((parent, parent_depth, parent_deadline, remaining - 1, number + 1))
+
+        task_id = f'{parent}.{number}'
+        # a subtask is due on or before its parent, but not before the spread starts
+        span = max((parent_deadline - earliest).days, 0)
+        deadline = parent_deadline - timedelta(days=rng.randint(0, min(span, 30)))
+        # past-due tasks are usually done, upcoming ones usually aren't; overall about done_ratio
+        past_due = deadline < today
+        complete = rng.random() < (min(1.0, done_ratio * 1.6) if past_due else done_ratio * 0.4)
+
+        yield task_id, parent, {
+            'task_name': f'task {count}',
+            'deadline': deadline,
+            'complete': complete,
+        }
+        count += 1
+
+        task_depth = parent_depth + 1
+        if task_depth < depth:
+            stack.append((task_id, task_depth, deadline, rng.randint(0, 2 * fanout), 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='generate')
+    parser.add_argument('file', type=Path, help='task file to write (.json or .snap)')
+    parser.add_argument('--size', type=int, default=10_000)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--fanout', type=int, default=8)
+    parser.add_argument('--deadline-spread', type=int, default=180, help='days either side of today')
+    parser.add_argument('--done-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    storage.write_records(args.file, generate_records(
+        args.size, args.depth, args.fanout, args.deadline_spread, args.done_ratio, args.seed,
+    ))
+
+
+if __name__ == '__main__':
+    main()
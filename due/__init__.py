@@ -1,21 +1,45 @@
-import calendar
-from datetime import datetime, date, timedelta
-
-from due.configparse import TASK_FILE_PATH, COLOR
-from due.tasks import TaskTree
+from datetime import datetime
 
 # declare version
 __version__ = "1.0.0"
 
-# load config yaml from configparse into this namespace
-TASK_FILE_PATH = TASK_FILE_PATH
-COLOR = COLOR
-
 # get today's date
 TODAY = datetime.today().date()
 
-# create calendar for this month
-CAL_STR = calendar.TextCalendar(firstweekday=6).formatmonth(TODAY.year, TODAY.month)
+# set (by __main__.py) when the process only shows a view (`due today / tomorrow / week`): the
+# tree is then loaded into an ArrayTaskTree whatever the backend, as it lists the same tasks and
+# networkx alone takes longer to import than the view takes to run
+READ_ONLY = False
+
+
+def __getattr__(name):
+    # config and task tree are built on first access rather than at import time,
+    # so commands that never touch them don't pay for yaml, rich, networkx or todo.json
+
+    # load config yaml from configparse into this namespace
+    if name in ('TASK_FILE_PATH', 'WORKSPACE', 'COLOR', 'STYLES'):
+        from due import configparse
+        value = getattr(configparse, name)
+
+    # load task tree from json, into the storage backend chosen in config.yaml
+    elif name == 'TASK_TREE':
+        from due import configparse, profiling
+        backend = configparse.BACKEND
+        with profiling.phase('load'):
+            if backend == 'array' or READ_ONLY:
+                from due.arraytree import ArrayTaskTree as TaskTree
+            else:
+                from due.tasks import TaskTree
+            if configparse.WORKSPACE:
+                # several task files shown as one tree, see workspace.py
+                from due.workspace import Workspace
+                value = Workspace.load(TaskTree, configparse.WORKSPACE)
+            else:
+                # a sharded task file is only read as far as each command needs, see shards.py
+                value = TaskTree.load(lazy=True)
+
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# load task tree from json
-TASK_TREE = TaskTree.load()
\ No newline at end of file
+    globals()[name] = value
+    return value
@@ -1,11 +1,41 @@
+import sys
+import time
+
+# how long importing the command line takes, for `due --profile`
+IMPORT_STARTED, IMPORT_BLOCKS = time.perf_counter(), sys.getallocatedblocks()
+
 import argparse
 
+import due
+from due import profiling
 from due.cli import Commands
 
-if __name__ == '__main__':
+IMPORT_STATS = (time.perf_counter() - IMPORT_STARTED, sys.getallocatedblocks() - IMPORT_BLOCKS)
+
+
+def profile_options(subcommand=False):
+    # global options, also read on their own before the full parse, since parsing an id
+    # already loads the task tree. subcommands take them too (`due week --profile`), without
+    # defaults of their own, which would hide the ones given before the subcommand
+    options = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS if subcommand else None)
+    options.add_argument('--profile', action='store_true', help='print the time spent in each phase to stderr')
+    options.add_argument('--profile-json', type=str, metavar='FILE', help='write the time spent in each phase to FILE as JSON')
+    options.add_argument('--cprofile', type=str, metavar='FILE', help='write cProfile stats to FILE')
+    return options
+
+
+def calendar_options():
+    # options of the views that show a calendar
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('-m', '--months', type=int, default=1, help='number of months to show, side by side')
+    options.add_argument('--heatmap', action='store_true', help='shade days by the number of unfinished tasks due')
+    return options
+
+
+def build_parser():
 
     # due
-    due = argparse.ArgumentParser(prog='due')
+    due = argparse.ArgumentParser(prog='due', parents=[profile_options()])
     subcommands = due.add_subparsers()
     due.set_defaults(func=Commands.display_today) # no subparser defaults to `due today`
 
@@ -15,58 +45,159 @@ if __name__ == '__main__':
     # init.set_defaults(func=Commands.init)
 
     # due today
-    today = subcommands.add_parser('today', aliases=['td'])
+    today = subcommands.add_parser('today', aliases=['td'], parents=[calendar_options(), profile_options(subcommand=True)])
     today.set_defaults(func=Commands.display_today)
 
     # due tomorrow
-    tomorrow = subcommands.add_parser('tomorrow', aliases=['tm'])
+    tomorrow = subcommands.add_parser('tomorrow', aliases=['tm'], parents=[calendar_options(), profile_options(subcommand=True)])
     tomorrow.set_defaults(func=Commands.display_tomorrow)
 
     # due week
-    week = subcommands.add_parser('week', aliases=['we','w'])
+    week = subcommands.add_parser('week', aliases=['we','w'], parents=[calendar_options(), profile_options(subcommand=True)])
     week.set_defaults(func=Commands.display_week)
 
     # TODO:
     # add subcommand 'due on YYYY-MM-DD' which should be an alias for `due ls -on YYYY-MM-DD` 
 
     # due ls
-    ls = subcommands.add_parser('ls')
+    ls = subcommands.add_parser('ls', parents=[profile_options(subcommand=True)])
     ls.add_argument('id',type=Commands.valid_id, nargs='?', default='0')
     ls.add_argument("-e", "--depth",type=int)
     ls.add_argument("-d", "--deadline", type=Commands.valid_date)    
+    ls.add_argument("-n", "--name", type=str)
     ls.add_argument("--done",action='store_true') 
     ls.add_argument("--undone",action='store_true') 
+    ls.add_argument("--promote", choices=['prune', 'context', 'lift'], help="for --done/--undone, what to do with non-matching tasks that have matching subtasks: drop them with their subtasks, show them dimmed (default for --done) or drop just them, moving their subtasks up")
     ls.add_argument("--nodates",action='store_true')
     ls.add_argument("--noyear",action='store_true')
     ls.add_argument("--noids",action='store_true')
+    ls_export = ls.add_mutually_exclusive_group()
+    ls_export.add_argument("--jsonl", dest='export', action='store_const', const='jsonl')
+    ls_export.add_argument("--csv", dest='export', action='store_const', const='csv')
+    ls_export.add_argument("--md", dest='export', action='store_const', const='md')
     ls.set_defaults(func=Commands.ls)
 
-    # TODO:
     # due add
-    add = subcommands.add_parser('add')
-    add.add_argument('parent_id',type=str)
+    add = subcommands.add_parser('add', parents=[profile_options(subcommand=True)])
+    add.add_argument('parent_id',type=Commands.valid_id)
     add.add_argument('child_task_name',type=str)
-    add.add_argument('child_task_deadline',type=str)
+    add.add_argument('child_task_deadline',type=Commands.valid_date)
+    add.add_argument('--repeat', type=Commands.valid_repeat, help="make the task recur from its deadline on: daily, weekly, weekly:smtwtfs (e.g. weekly:-m-w-f-), monthly, yearly or cron:'dom month dow'")
+    add.add_argument('--until', type=Commands.valid_date, help='last day a recurring task may fall on')
     add.set_defaults(func=Commands.add_task)
 
-    # TODO:
     # due rm
-    rm = subcommands.add_parser('rm')
-    rm.add_argument('id',type=str)
+    rm = subcommands.add_parser('rm', parents=[profile_options(subcommand=True)])
+    rm.add_argument('id',type=Commands.valid_id)
     rm.set_defaults(func=Commands.rm_task)
 
-    # TODO:
     # due done
-    done = subcommands.add_parser('done')
-    done.add_argument('id',type=str)
+    done = subcommands.add_parser('done', parents=[profile_options(subcommand=True)])
+    done.add_argument('id',type=Commands.valid_id)
+    done.add_argument('--on', type=Commands.valid_date, help='for a recurring task, the occurrence that is done (default: the first open one)')
     done.set_defaults(func=Commands.complete_task)
 
-    # TODO:
     # due undone
-    undone = subcommands.add_parser('undone')
-    undone.add_argument('id',type=str)
+    undone = subcommands.add_parser('undone', parents=[profile_options(subcommand=True)])
+    undone.add_argument('id',type=Commands.valid_id)
+    undone.add_argument('--on', type=Commands.valid_date, help='for a recurring task, the occurrence that is not done (default: the last one done)')
     undone.set_defaults(func=Commands.uncomplete_task)
 
-    # parse arguments and run
-    args = due.parse_args()
-    args.func(**vars(args)) #allows you to pass arguments to functions in Main class
\ No newline at end of file
+    # due reschedule
+    reschedule = subcommands.add_parser('reschedule', aliases=['res'], parents=[profile_options(subcommand=True)])
+    reschedule.add_argument('id', type=Commands.valid_id)
+    reschedule.add_argument('deadline', type=Commands.valid_date)
+    reschedule.add_argument('-c', '--category', type=str, help='kind of change, for the report of `due deferments` (e.g. blocked, underestimated)')
+    reschedule.add_argument('-r', '--reason', type=str, help='why the deadline moved')
+    reschedule_subtasks = reschedule.add_mutually_exclusive_group()
+    reschedule_subtasks.add_argument('--shift', action='store_true', help='move the unfinished subtasks by as many days as the task')
+    reschedule_subtasks.add_argument('--clamp', action='store_true', help='bring unfinished subtasks due after the new deadline forward to it')
+    reschedule.set_defaults(func=Commands.reschedule_task)
+
+    # due deferments
+    deferments = subcommands.add_parser('deferments', aliases=['def'], parents=[profile_options(subcommand=True)])
+    deferments.add_argument('id', type=Commands.valid_id, nargs='?', default='0', help='changes of this task and its subtasks')
+    deferments.add_argument('-c', '--category', type=str, help='only changes of this category')
+    deferments.add_argument('--jsonl', action='store_true', help='print the changes as json lines')
+    deferments.set_defaults(func=Commands.deferments)
+
+    # due import
+    import_ = subcommands.add_parser('import', parents=[profile_options(subcommand=True)])
+    import_.add_argument('file', type=str, help="jsonl, csv, yaml or json file of tasks ('-' for stdin, with --format)")
+    import_.add_argument('-p', '--parent', type=Commands.valid_id, default='0', help='id of the task to add them under')
+    import_.add_argument('--format', choices=['jsonl', 'csv', 'yaml', 'json'], dest='import_format')
+    import_.add_argument('--dry-run', action='store_true', help='check the file and list the tasks without adding them')
+    import_.set_defaults(func=Commands.import_tasks)
+
+    # due stats
+    stats = subcommands.add_parser('stats', parents=[profile_options(subcommand=True)])
+    stats.add_argument('id', type=Commands.valid_id, nargs='?', default='0', help='statistics for the subtasks of this task')
+    stats_output = stats.add_mutually_exclusive_group()
+    stats_output.add_argument('--json', action='store_true', help='print the statistics as json')
+    stats_output.add_argument('--series', action='store_true', help='print per-day counts as json, for vega')
+    stats.add_argument('--start', type=Commands.valid_date, help='first day of --series (default: earliest deadline)')
+    stats.add_argument('--end', type=Commands.valid_date, help='last day of --series (default: latest deadline)')
+    stats.set_defaults(func=Commands.stats)
+
+    # due find
+    find = subcommands.add_parser('find', parents=[profile_options(subcommand=True)])
+    find.add_argument('query', nargs='+', help='words of the task name; the last letters of each word may be left out')
+    find.add_argument('-n', '--limit', type=int, default=20, help='show at most this many matches (0 for all)')
+    find.add_argument('--jsonl', action='store_true', help='print matches as json lines')
+    find.set_defaults(func=Commands.find_tasks)
+
+    # due serve
+    serve = subcommands.add_parser('serve', parents=[profile_options(subcommand=True)])
+    serve.add_argument('--socket', type=str)
+    serve.set_defaults(func=Commands.serve)
+
+    return due
+
+
+# commands that only read the task tree, see due.READ_ONLY
+VIEWS = (Commands.display_today, Commands.display_tomorrow, Commands.display_week)
+
+
+def run(argv, standalone):
+    # parse arguments and run. standalone: this process runs just this command (not `due serve`)
+    args = build_parser().parse_args(argv)
+    if standalone and args.func in VIEWS:
+        due.READ_ONLY = True
+    args.func(**vars(args)) #allows you to pass arguments to functions in Main class
+
+
+def main(argv=None, import_stats=None, standalone=False):
+    options, _ = profile_options().parse_known_args(argv)
+    if not (options.profile or options.profile_json or options.cprofile):
+        run(argv, standalone)
+        return
+
+    # --cprofile alone only writes the cProfile stats, without the phase breakdown
+    phases = options.profile or options.profile_json
+    if phases:
+        profile = profiling.start()
+        if import_stats:
+            profile.record('import', *import_stats)
+    if options.cprofile:
+        import cProfile
+        cprofile = cProfile.Profile()
+        cprofile.enable()
+    try:
+        run(argv, standalone)
+    finally:
+        if options.cprofile:
+            cprofile.disable()
+            cprofile.dump_stats(options.cprofile)
+        if phases:
+            profiling.report(profiling.stop(), options.profile_json)
+
+
+if __name__ == '__main__':
+
+    # hand the command to a running `due serve` if there is one, otherwise run it in this process
+    from due import server
+    status = server.request(sys.argv[1:])
+    if status is not None:
+        sys.exit(status)
+
+    main(import_stats=IMPORT_STATS, standalone=True)
@@ -0,0 +1,200 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from due import recurrence
+
+# deadline and completion statistics for `due stats`. the tree is turned into columns once
+# (deadline ordinals, completion flags and the milestone each task belongs to, one entry per
+# task), and every aggregate is then a handful of numpy operations over them instead of a walk
+# over the tree. milestones are the subtasks of the task the statistics are for ('0' by default).
+# a recurring task counts by its first open occurrence, as the views show it (see recurrence.py).
+#
+#   columns = TaskColumns.from_tree(TASK_TREE)
+#   milestone_stats(columns, TODAY)          per milestone: total, done, overdue, next deadline
+#   series(columns, start, end, TODAY)       per day: due, done, open, overdue (for vega)
+
+NO_DEADLINE = 0
+
+
+class TaskColumns:
+
+    def __init__(self, root_id, milestones, ids, deadlines, complete, milestone):
+        self.root_id = root_id
+        self.milestones = milestones    # ids of the milestones
+        self.ids = ids                  # task ids, in the order of the columns
+        self.deadlines = deadlines      # date ordinals (NO_DEADLINE for none)
+        self.complete = complete        # bool
+        self.milestone = milestone      # index into milestones
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_tree(cls, task_tree, root_id='0'):
+        # the tasks under root_id (not root_id itself). a whole ArrayTaskTree (mask None, as
+        # opposed to a filtered view or a networkx tree) is read straight from its arrays
+        if root_id == '0' and getattr(task_tree, 'mask', False) is None:
+            return cls._from_arrays(task_tree)
+
+        milestones, ids, deadlines, complete, milestone = [], [], [], [], []
+        milestone_of = {}
+        for task_id, parent_id, attrs in task_tree.records(root_id):
+            if task_id == root_id:
+                continue
+            if parent_id == root_id:
+                milestone_of[task_id] = len(milestones)
+                milestones.append(task_id)
+            else:
+                milestone_of[task_id] = milestone_of[parent_id]
+            if 'repeat' in attrs:
+                attrs = recurrence.expand(attrs)
+            deadline = attrs.get('deadline')
+            ids.append(task_id)
+            deadlines.append(deadline.toordinal() if deadline else NO_DEADLINE)
+            complete.append(attrs.get('complete', False))
+            milestone.append(milestone_of[task_id])
+
+        return cls(
+            root_id, milestones, ids,
+            np.array(deadlines, dtype=np.int32),
+            np.array(complete, dtype=bool),
+            np.array(milestone, dtype=np.int32),
+        )
+
+    @classmethod
+    def _from_arrays(cls, task_tree):
+        # an ArrayTaskTree already keeps its columns in arrays, so they're wrapped, not walked
+        count = len(task_tree.ids)
+        nodes = np.fromiter(task_tree.index.values(), dtype=np.int64)
+        nodes.sort()
+        nodes = nodes[nodes != 0]
+
+        parents = np.frombuffer(task_tree.parents, dtype=np.intc).astype(np.int64)
+        depths = np.frombuffer(task_tree.depth_array, dtype=np.intc)
+        complete = np.unpackbits(np.frombuffer(task_tree.complete, dtype=np.uint8), bitorder='little')[:count]
+
+        # walk every task up to its depth-1 ancestor, one level per step for all tasks at once
+        top = np.where(depths <= 1, np.arange(count), parents)
+        deeper = depths[top] > 1
+        while deeper.any():
+            top[deeper] = parents[top[deeper]]
+            deeper = depths[top] > 1
+
+        milestone_nodes = nodes[depths[nodes] == 1]
+        position = np.full(count, -1, dtype=np.int32)
+        position[milestone_nodes] = np.arange(len(milestone_nodes), dtype=np.int32)
+
+        deadlines = np.frombuffer(task_tree.deadlines, dtype=np.intc)[nodes].astype(np.int32)
+        complete = complete[nodes].astype(bool)
+        # recurring tasks keep their series in the extra attributes; they're few, so they're
+        # expanded one at a time
+        for i, extra in task_tree.extra.items():
+            if 'repeat' in extra and i != 0:
+                attrs = recurrence.expand(task_tree.task(task_tree.ids[i]))
+                column = np.searchsorted(nodes, i)
+                deadlines[column] = attrs['deadline'].toordinal() if attrs.get('deadline') else NO_DEADLINE
+                complete[column] = attrs.get('complete', False)
+
+        return cls(
+            '0',
+            [task_tree.ids[i] for i in milestone_nodes],
+            [task_tree.ids[i] for i in nodes],
+            deadlines,
+            complete,
+            position[top[nodes]],
+        )
+
+    def open(self):
+        return ~self.complete
+
+    def overdue(self, today):
+        return self.open() & (self.deadlines != NO_DEADLINE) & (self.deadlines < today.toordinal())
+
+
+def summary(columns, today):
+    # totals over all tasks
+    deadlines, open_tasks = columns.deadlines, columns.open()
+    today_ordinal = today.toordinal()
+    week_end = today_ordinal + (5 - today.weekday()) % 7  # through saturday, like `due week`
+    return {
+        'total': len(columns),
+        'done': int(columns.complete.sum()),
+        'open': int(open_tasks.sum()),
+        'overdue': int(columns.overdue(today).sum()),
+        'due_today': int((open_tasks & (deadlines == today_ordinal)).sum()),
+        'due_this_week': int((open_tasks & (deadlines >= today_ordinal) & (deadlines <= week_end)).sum()),
+    }
+
+
+def milestone_stats(columns, today):
+    # per milestone, counting the milestone itself: tasks, done, completion ratio, overdue and
+    # the earliest deadline still open
+    count = len(columns.milestones)
+    milestone = columns.milestone
+    open_tasks = columns.open()
+
+    total = np.bincount(milestone, minlength=count)
+    done = np.bincount(milestone[columns.complete], minlength=count)
+    overdue = np.bincount(milestone[columns.overdue(today)], minlength=count)
+
+    pending = open_tasks & (columns.deadlines != NO_DEADLINE)
+    next_deadline = np.full(count, np.iinfo(np.int32).max, dtype=np.int32)
+    np.minimum.at(next_deadline, milestone[pending], columns.deadlines[pending])
+
+    stats = []
+    for i, task_id in enumerate(columns.milestones):
+        has_next = next_deadline[i] != np.iinfo(np.int32).max
+        stats.append({
+            'id': task_id,
+            'total': int(total[i]),
+            'done': int(done[i]),
+            'ratio': float(done[i] / total[i]) if total[i] else 0.0,
+            'overdue': int(overdue[i]),
+            'next_deadline': date.fromordinal(int(next_deadline[i])).isoformat() if has_next else None,
+        })
+    return stats
+
+
+def deadline_range(columns):
+    # earliest and latest deadline in the columns, or None
+    deadlines = columns.deadlines[columns.deadlines != NO_DEADLINE]
+    if not len(deadlines):
+        return None
+    return date.fromordinal(int(deadlines.min())), date.fromordinal(int(deadlines.max()))
+
+
+def histogram(columns, start, end, mask=None):
+    # number of tasks (of those in mask) due on each day from start to end
+    days = max((end - start).days + 1, 0)
+    offsets = columns.deadlines.astype(np.int64) - start.toordinal()
+    selected = (offsets >= 0) & (offsets < days) & (columns.deadlines != NO_DEADLINE)
+    if mask is not None:
+        selected &= mask
+    return np.bincount(offsets[selected], minlength=days)
+
+
+def series(columns, start, end, today):
+    # one row per day from start to end: tasks due that day, how many of them are done and
+    # open, and how many open tasks are past due on that day (due before it, up to today).
+    # the rows are ready to use as the `values` of a vega / vega-lite data source
+    due = histogram(columns, start, end)
+    done = histogram(columns, start, end, columns.complete)
+    open_due = due - done
+
+    # open tasks due before each day: those due before start, plus a running total
+    open_tasks = columns.open() & (columns.deadlines != NO_DEADLINE)
+    earlier = int((open_tasks & (columns.deadlines < start.toordinal())).sum())
+    overdue = earlier + np.concatenate(([0], np.cumsum(open_due)[:-1]))
+
+    rows = []
+    for i in range(len(due)):
+        day = start + timedelta(days=i)
+        rows.append({
+            'date': day.isoformat(),
+            'due': int(due[i]),
+            'done': int(done[i]),
+            'open': int(open_due[i]),
+            'overdue': int(overdue[i]) if day <= today else None,
+        })
+    return rows
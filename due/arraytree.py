@@ -0,0 +1,277 @@
+from array import array
+from datetime import date
+
+from due.basetree import BaseTaskTree
+from due.deadlineindex import DeadlineIndex
+
+NONE = -1
+
+
+def get_bit(bits, i):
+    return i >> 3 < len(bits) and bits[i >> 3] >> (i & 7) & 1
+
+
+def set_bit(bits, i, value):
+    if value:
+        bits[i >> 3] |= 1 << (i & 7)
+    else:
+        bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+
+class ArrayTaskTree(BaseTaskTree):
+
+    # task tree stored in parallel arrays indexed by node number, without a graph library:
+    #   parents, first_child, next_sibling, last_child    node numbers (-1 for none)
+    #   depth_array                                       distance from the root '0'
+    #   deadlines                                         date ordinals (0 for none)
+    #   names                                             index into an interned pool of task names
+    #   complete                                          bitset, one bit per node
+    # a deleted task is unlinked from its parent and dropped from the id index, but keeps its slot.
+    # the filters return views that share these arrays and carry a bitset mask of selected nodes.
+
+    # the attributes holding the task data, which views share
+    DATA = (
+        'ids', 'index', 'parents', 'first_child', 'next_sibling', 'last_child', 'depth_array',
+        'deadlines', 'names', 'complete', 'pool', 'pool_index', 'extra',
+    )
+
+    def __init__(self):
+        super().__init__()
+
+        self.ids = ['0']
+        self.index = {'0': 0}
+        self.parents = array('i', [NONE])
+        self.first_child = array('i', [NONE])
+        self.next_sibling = array('i', [NONE])
+        self.last_child = array('i', [NONE])
+        self.depth_array = array('i', [0])
+        self.deadlines = array('i', [0])
+        self.names = array('i', [NONE])
+        self.complete = bytearray(1)
+
+        self.pool = []
+        self.pool_index = {}
+
+        # attributes other than task_name, deadline and complete, by node number
+        self.extra = {}
+
+        # None for the whole tree, else a bitset of the nodes in this view
+        self.mask = None
+
+    def __contains__(self, task_id):
+        i = self.index.get(task_id)
+        return i is not None and self._visible(i)
+
+    def __len__(self):
+        if self.mask is None:
+            return len(self.index)
+        return sum(1 for _ in self._visible_nodes())
+
+    def task(self, task_id):
+        return self._attrs(self.index[task_id])
+
+    def children(self, task_id):
+        child = self.first_child[self.index[task_id]]
+        while child != NONE:
+            if self._visible(child):
+                yield self.ids[child]
+            child = self.next_sibling[child]
+
+    def parent(self, task_id):
+        p = self.parents[self.index[task_id]]
+        return None if p == NONE else self.ids[p]
+
+    def depth(self, task_id):
+        return self.depth_array[self.index[task_id]]
+
+    def nodes(self):
+        for i in self._visible_nodes():
+            yield self.ids[i], self._attrs(i)
+
+    def next_id(self, parent_task_id):
+        # the counter is an extra attribute, read without building all of the parent's attributes
+        base = self.base
+        if base.workspace is None:
+            next_id = base.extra.get(base.index[parent_task_id], {}).get('next_id')
+            if next_id is not None:
+                return next_id
+        return super().next_id(parent_task_id)
+
+    def records(self, root_task_id='0'):
+        # preorder along the sibling links; the stack holds one node per level, the next to visit
+        ids, parents, first_child, next_sibling = self.ids, self.parents, self.first_child, self.next_sibling
+        root = self.index[root_task_id]
+        yield root_task_id, None, self._attrs(root)
+        stack = [first_child[root]]
+        while stack:
+            i = stack[-1]
+            if i == NONE:
+                stack.pop()
+                continue
+            stack[-1] = next_sibling[i]
+            if self._visible(i):
+                yield ids[i], ids[parents[i]], self._attrs(i)
+                stack.append(first_child[i])
+
+    def deadline_index(self):
+        # built from the deadline array, making attribute dicts only for recurring tasks
+        base = self.base
+        if base._deadline_index is None:
+            deadlines, extra, fromordinal = base.deadlines, base.extra, date.fromordinal
+            base._deadline_index = DeadlineIndex(
+                (task_id, extra[i] if i in extra and 'repeat' in extra[i] else {'deadline': fromordinal(deadlines[i])})
+                for task_id, i in base.index.items() if deadlines[i] or i in extra and 'repeat' in extra[i]
+            )
+        return base._deadline_index
+
+    def _visible(self, i):
+        return self.mask is None or get_bit(self.mask, i)
+
+    def _visible_nodes(self):
+        if self.mask is None:
+            return iter(self.index.values())
+        return (i for i in self.index.values() if get_bit(self.mask, i))
+
+    def _attrs(self, i):
+        attrs = {}
+        if self.names[i] != NONE:
+            attrs['task_name'] = self.pool[self.names[i]]
+            if self.deadlines[i]:
+                attrs['deadline'] = date.fromordinal(self.deadlines[i])
+            attrs['complete'] = bool(get_bit(self.complete, i))
+        if i in self.extra:
+            attrs.update(self.extra[i])
+        return attrs
+
+    def _set(self, i, attrs):
+        for key, value in attrs.items():
+            if key == 'task_name':
+                name = self.pool_index.get(value)
+                if name is None:
+                    name = self.pool_index[value] = len(self.pool)
+                    self.pool.append(value)
+                self.names[i] = name
+            elif key == 'deadline':
+                self.deadlines[i] = value.toordinal() if value else 0
+            elif key == 'complete':
+                set_bit(self.complete, i, value)
+            else:
+                self.extra.setdefault(i, {})[key] = value
+
+    def _where(self, nodes):
+        # view of the tree containing only the given node numbers
+        mask = bytearray((len(self.ids) + 7) // 8)
+        for i in nodes:
+            set_bit(mask, i, 1)
+        return self._view(mask)
+
+    def _view(self, mask):
+        view = object.__new__(ArrayTaskTree)
+        # like TaskTree._select: a view gets its own lock, caches, shards and workspace state
+        # (all unset), and shares only the task data
+        BaseTaskTree.__init__(view)
+        for field in self.DATA:
+            setattr(view, field, getattr(self, field))
+        view.base = self.base
+        view.mask = mask
+        return view
+
+    def _select(self, task_ids):
+        return self._where(self.index[task_id] for task_id in task_ids)
+
+    def _insert(self, parent_task_id, task_id, attrs):
+        if task_id in self.index:
+            # replayed journal entry for a task that's already in the tree
+            self._set(self.index[task_id], attrs)
+            return
+
+        p = self.index[parent_task_id]
+        i = len(self.ids)
+        self.ids.append(task_id)
+        self.index[task_id] = i
+        self.parents.append(p)
+        self.first_child.append(NONE)
+        self.next_sibling.append(NONE)
+        self.last_child.append(NONE)
+        self.depth_array.append(self.depth_array[p] + 1)
+        self.deadlines.append(0)
+        self.names.append(NONE)
+        if i >> 3 >= len(self.complete):
+            self.complete.append(0)
+
+        # link as the parent's last child
+        if self.last_child[p] == NONE:
+            self.first_child[p] = i
+        else:
+            self.next_sibling[self.last_child[p]] = i
+        self.last_child[p] = i
+
+        self._set(i, attrs)
+
+    def _remove(self, task_id):
+        i = self.index[task_id]
+        p = self.parents[i]
+        if p == NONE:
+            raise ValueError("Can't delete the root task")
+
+        # unlink from the parent's list of children
+        prev, child = NONE, self.first_child[p]
+        while child != i:
+            prev, child = child, self.next_sibling[child]
+        if prev == NONE:
+            self.first_child[p] = self.next_sibling[i]
+        else:
+            self.next_sibling[prev] = self.next_sibling[i]
+        if self.last_child[p] == i:
+            self.last_child[p] = prev
+
+        # drop the task and its subtasks from the id index
+        stack = [i]
+        while stack:
+            n = stack.pop()
+            del self.index[self.ids[n]]
+            self.extra.pop(n, None)
+            child = self.first_child[n]
+            while child != NONE:
+                stack.append(child)
+                child = self.next_sibling[child]
+
+    def _update(self, task_id, **attrs):
+        self._set(self.index[task_id], attrs)
+
+    @classmethod
+    def from_records(cls, records):
+        # builds a task tree from (task_id, parent_id, attrs) records in preorder
+        t = cls()
+        for node, parent, data in records:
+            if parent is None:
+                t._set(0, data)
+            else:
+                t._insert(parent, node, data)
+        return t
+
+    # the completion filter works directly on the arrays rather than on per-task attribute dicts
+
+    def completed(self,completion_status,promote='prune'):
+        if completion_status == None or promote != 'prune':
+            return super().completed(completion_status, promote)
+        self.require_all()
+        complete, status = self.complete, int(completion_status)
+        return self._where(
+            i for i in self._visible_nodes() if i == 0 or (complete[i >> 3] >> (i & 7) & 1) == status
+        )
+
+    def due_between(self, start, end):
+        # as BaseTaskTree.due_between, walking up the parent array and marking the view's mask
+        index, parents = self.index, self.parents
+        selected = bytearray((len(self.ids) + 7) // 8)
+        selected[0] = 1
+        for task_id in self.due_candidates(start, end):
+            chain, i = [], index.get(task_id, NONE)
+            while i != NONE and not get_bit(selected, i) and self._visible(i):
+                chain.append(i)
+                i = parents[i]
+            if i != NONE and get_bit(selected, i):
+                for n in chain:
+                    selected[n >> 3] |= 1 << (n & 7)
+        return self._view(selected)
@@ -0,0 +1,592 @@
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import due
+from due import history, journal, locking, profiling, recurrence, shards, storage
+from due.deadlineindex import DeadlineIndex
+from due.viewcache import ViewCache
+
+
+class BaseTaskTree:
+
+    # everything a task tree does that doesn't depend on how nodes are stored: mutations and
+    # their journal, filters, and load/save. backends (tasks.TaskTree on networkx,
+    # arraytree.ArrayTaskTree on parallel arrays) implement the storage primitives:
+    #
+    #   __contains__(task_id), __len__()
+    #   task(task_id)           attribute dict of a task ({} for the root '0')
+    #   children(task_id)       ids of a task's subtasks, in insertion order
+    #   parent(task_id)         id of a task's parent task (None for the root)
+    #   nodes()                 (task_id, attrs) for every task
+    #   _select(task_ids)       view of the tree containing only task_ids
+    #   _insert(parent_task_id, task_id, attrs), _remove(task_id), _update(task_id, **attrs)
+    #   from_records(records)   (classmethod) builds a tree from preorder records
+    #
+    # views returned by _select() point at the full tree they were filtered from in self.base
+
+    def __init__(self):
+
+        # set by load(): the task file this tree came from, and its mutation journal
+        self.file = None
+        self.journal = None
+        # also set by load(): the task file's lock, and the stamp of the version of it this tree
+        # is based on (see locked())
+        self.lock = None
+        self.stamp = None
+        # for a tree loaded lazily from a sharded store: which shards are read and changed (see shards.py)
+        self.shards = None
+        # for the union of a workspace's task files: the files' own trees (see workspace.py)
+        self.workspace = None
+
+        self.base = self
+        self._deadline_index = None
+        self._search_index = None
+        self._history = None
+        self._depths = {'0': 0}
+
+        # tasks a view only holds to connect its matches to the root, shown dimmed (see TaskQuery.promote)
+        self.context = frozenset()
+
+        # recurring tasks as of the occurrence a view was filtered for, see occurrence()
+        self.occurrences = {}
+
+        # bumped by every change, so cached views and output (see viewcache.py) of an older
+        # version are never looked up again
+        self.version = 0
+        self.view_cache = ViewCache()
+
+    def next_task_id(self, parent_task_id):
+        # subtask ids come from a counter kept in the parent's 'next_id' attribute (and saved with
+        # it), so finding one doesn't list the children, and ids of deleted tasks aren't reused
+        id_suffix = str(self.next_id(parent_task_id))
+        return parent_task_id + '.' + id_suffix
+
+    def next_id(self, parent_task_id):
+        if self.base.workspace is not None and parent_task_id != '0':
+            # the counter of the file the parent is in, which locked(parent_task_id) has caught up
+            return self.base.workspace.next_id(parent_task_id)
+        next_id = self.base.task(parent_task_id).get('next_id')
+        if next_id is None:
+            # task files saved before the counters existed: one past the highest subtask id
+            next_id = max((int(child.rsplit('.', 1)[1]) + 1 for child in self.base.children(parent_task_id)), default=0)
+        return next_id
+
+    def occurrence(self, task_id):
+        # a task's attributes as shown: for a recurring task (see recurrence.py) the deadline is
+        # that of the occurrence the view was filtered for, or else of its first open occurrence
+        if task_id in self.occurrences:
+            return self.occurrences[task_id]
+        attrs = self.task(task_id)
+        if 'repeat' in attrs:
+            return recurrence.expand(attrs)
+        return attrs
+
+    def add_task(self, parent_task_id, task_name, deadline, repeat=None, until=None):
+
+        # adds subtask to existing task with id parent_task_id
+        # new subtask has subtask name of task_name
+        # and deadline of deadline
+        # with a repeat rule, the task recurs from deadline on (until `until`, if given)
+
+        # TODO: assert that deadline of parent must be after deadline of child
+        # TODO: assert that parent can't be done while children aren't (somehow)
+
+        with self.locked(parent_task_id):
+            task_id = self.next_task_id(parent_task_id)
+            entry = dict(id=task_id, parent=parent_task_id, task_name=task_name, deadline=deadline)
+            if repeat:
+                entry['repeat'] = repeat
+            if repeat and until:
+                entry['until'] = until
+            return self.mutate('add', **entry)
+
+    def add_tasks(self, parent_task_id, tasks):
+        # adds subtasks from (task_name, deadline) pairs to task parent_task_id, journaled with a
+        # single write. returns the new task ids
+        with self.locked(parent_task_id):
+            first = self.next_id(parent_task_id)
+            entries = [
+                dict(id=f'{parent_task_id}.{first + n}', parent=parent_task_id, task_name=task_name, deadline=deadline)
+                for n, (task_name, deadline) in enumerate(tasks)
+            ]
+            self.mutate_many('add', entries)
+        return [entry['id'] for entry in entries]
+
+    def delete_task(self,task_id):
+        # deletes the task along with all of its subtasks
+        return self.mutate('rm', id=task_id)
+
+    def complete_task(self,task_id,on=None):
+        # TODO: assert that parent can't be done while children aren't
+        # on: the occurrence of a recurring task that's done (the task itself stays open)
+        if on is not None:
+            return self.mutate('done', id=task_id, on=on)
+        return self.mutate('done', id=task_id)
+
+    def uncomplete_task(self,task_id,on=None):
+        if on is not None:
+            return self.mutate('undone', id=task_id, on=on)
+        return self.mutate('undone', id=task_id)
+
+    def reschedule_task(self, task_id, deadline, category=None, reason=None):
+        # moves a task's deadline, recording the change (why, if given) in the history store
+        if task_id == '0':
+            raise ValueError("the root '0' isn't a task, it has no deadline to move")
+        with self.locked(task_id):
+            self.require_tasks([task_id])
+            attrs = self.task(task_id)
+            old, name = attrs.get('deadline'), attrs['task_name']
+            self.mutate('reschedule', id=task_id, deadline=deadline)
+            if old != deadline:
+                self.record_changes([history.change(task_id, name, old, deadline, category, reason)])
+        return self
+
+    def shift_deadlines(self, task_id, delta, category=None, reason=None):
+        # moves the deadline of a task and of every unfinished task under it by delta (a timedelta)
+        return self.move_deadlines(task_id, lambda node, deadline: deadline + delta, category, reason)
+
+    def clamp_deadlines(self, task_id, deadline, category=None, reason=None):
+        # gives a task a new deadline, and brings the unfinished tasks under it that were due
+        # later forward to it
+        return self.move_deadlines(
+            task_id, lambda node, old: deadline if node == task_id else min(old, deadline), category, reason,
+        )
+
+    def move_deadlines(self, task_id, move, category=None, reason=None):
+        # reschedules a subtree in one pass: move(task_id, deadline) gives the new deadline of
+        # the task and of each unfinished task under it. the changes are journaled with one write
+        # (or, when there are more than the journal takes before compacting, saved with one),
+        # recorded in the history with one append, and moved in the deadline index at once.
+        # returns the ids rescheduled
+        with self.locked(task_id):
+            if task_id == '0':
+                self.require_all()
+            else:
+                self.require_tasks([task_id])
+
+            entries, records = [], []
+            for node, _, attrs in self.records(task_id):
+                # the task itself is moved even when done; of its subtasks only unfinished ones are
+                old = attrs.get('deadline')
+                if old is None or (attrs.get('complete') and node != task_id):
+                    continue
+                new = move(node, old)
+                if new != old:
+                    entries.append(dict(id=node, deadline=new))
+                    records.append(history.change(node, attrs['task_name'], old, new, category, reason))
+            if not entries:
+                return []
+
+            # the index is left out of apply() and updated for all of them afterwards (if this
+            # fails, it's built again when next needed)
+            index, self._deadline_index = self._deadline_index, None
+            if len(entries) >= journal.COMPACT_AFTER and (self.file is not None or self.workspace is not None):
+                self.commit('reschedule', entries)
+            else:
+                self.mutate_many('reschedule', entries)
+            if index is not None:
+                index.move_many({entry['id']: entry['deadline'] for entry in entries})
+                self._deadline_index = index
+            self.record_changes(records)
+        return [entry['id'] for entry in entries]
+
+    def record_changes(self, records):
+        # appends deadline change records (see history.py) next to the task file, or to each
+        # file's own history in a workspace
+        if self.workspace is not None:
+            self.workspace.record_changes(records)
+        elif self.file is None:
+            for record in records:
+                self.history().add(record)
+        else:
+            with self.locked():
+                history.append(history.history_file(self.file), records)
+
+    def mutate(self, op, **entry):
+        # applies a change to the tree and appends it to the journal, if the tree has one
+        return self.mutate_many(op, [entry])
+
+    def mutate_many(self, op, entries):
+        if self.workspace is not None:
+            # checked before anything is applied, so a bad id changes nothing
+            routed = self.workspace.route(op, entries)
+            for entry in entries:
+                self.apply(op, **entry)
+            self.workspace.mutate_many(op, routed)
+            return self
+
+        with self.locked():
+            for entry in entries:
+                self.apply(op, **entry)
+            if self.journal is not None and entries:
+                with profiling.phase('save'):
+                    self.journal.extend(op, entries)
+                if self.journal.entries >= journal.COMPACT_AFTER:
+                    self.compact()
+        return self
+
+    @contextmanager
+    def locked(self, task_id=None):
+        # holds the task file's write lock (see locking.py). other processes may have changed the
+        # task file since this tree was loaded, so their changes are merged in first, and what's
+        # applied, journaled or saved inside the block is based on the latest version. ids for
+        # new tasks have to be picked inside the block, too.
+        # in a workspace, the lock is that of the file task_id is in (none for the root '0')
+        if self.workspace is not None:
+            tree = self.workspace.tree_of(task_id) if task_id not in (None, '0') else None
+            with tree.locked() if tree is not None else nullcontext():
+                yield self
+            return
+        if self.lock is None:
+            yield self
+            return
+        with self.lock.hold():
+            if self.lock.depth == 1:
+                self.catch_up()
+            yield self
+
+    def changed_on_disk(self):
+        # whether another process saved the task file or journaled changes since this tree last
+        # read or wrote them
+        if storage.stamp(self.file) != self.stamp:
+            return True
+        return self.journal is not None and self.journal.size() != self.journal.offset
+
+    def catch_up(self):
+        # merges in what other processes changed: entries they appended to the journal are
+        # replayed, and if they rewrote the task file it's read again. journal entries describe
+        # the resulting state, so replaying them over this tree's own changes is safe
+        if not self.changed_on_disk():
+            return
+        with profiling.phase('load'):
+            if storage.stamp(self.file) == self.stamp:
+                for entry in self.journal.replay(self.journal.offset):
+                    self.apply(**entry)
+                return
+
+            # reread the whole file into this tree, keeping its identity (and its version
+            # increasing, so nothing cached for it is taken for the new contents)
+            if self.journal is not None:
+                self.journal.close()
+            loaded = self.shards.loaded() if self.shards is not None else None
+            fresh = type(self)._read(self.file, journaled=self.journal is not None, lazy=loaded is not None)
+            lock, version = self.lock, self.version
+            self.__dict__.update(fresh.__dict__)
+            self.base, self.lock, self.version = self, lock, version + fresh.version + 1
+            if loaded:
+                self._load_shards(set(loaded))
+
+    def apply(self, op, id, parent=None, task_name=None, deadline=None, complete=False, repeat=None, until=None, on=None):
+        # entries describe the resulting state rather than a delta, so replaying an entry that
+        # the task file already includes (e.g. after a crash during compaction) is harmless
+        if self.shards is not None:
+            # the task's shard is read before it's changed, and written at the next save
+            self.require_tasks([id])
+            self.shards.changed.add(shards.shard_of(id))
+        index = self._deadline_index
+        search_index = self._search_index
+        self.version += 1
+
+        if op == 'add':
+            if parent in self:
+                # the parent's id counter is moved past the new id first (it may need the children)
+                id_suffix = int(id.rsplit('.', 1)[1])
+                if self.next_id(parent) <= id_suffix:
+                    self._update(parent, next_id=id_suffix + 1)
+                attrs = dict(task_name=task_name, deadline=deadline, complete=complete)
+                if repeat:
+                    attrs['repeat'] = repeat
+                    if until:
+                        attrs['until'] = str(until)
+                self._insert(parent, id, attrs)
+                if index is not None:
+                    index.add(id, deadline, recurring=bool(repeat))
+                if search_index is not None:
+                    search_index.add(id, task_name)
+        elif id not in self:
+            return
+        elif op == 'rm':
+            if index is not None or search_index is not None:
+                for node, _, _ in self.records(id):
+                    if index is not None:
+                        index.remove(node)
+                    if search_index is not None:
+                        search_index.remove(node)
+            self._remove(id)
+        elif op == 'done' and on is not None:
+            self._update(id, **recurrence.mark_done(self.task(id), on))
+        elif op == 'done':
+            self._update(id, complete=True)
+        elif op == 'undone' and on is not None:
+            self._update(id, **recurrence.mark_undone(self.task(id), on))
+        elif op == 'undone':
+            self._update(id, complete=False)
+        elif op == 'reschedule':
+            # for a recurring task this moves the start of the series
+            self._update(id, deadline=deadline)
+            if index is not None:
+                index.add(id, deadline, recurring='repeat' in self.task(id))
+        else:
+            raise ValueError(f"Unknown task tree operation: '{op}'")
+
+    def commit(self, op, entries):
+        # applies many changes and then writes the whole tree once instead of journaling them.
+        # the task file is replaced atomically, so after a crash either all of them are in it
+        # or none are (per file, for a workspace)
+        if self.workspace is not None:
+            routed = self.workspace.route(op, entries)
+            for entry in entries:
+                self.apply(op, **entry)
+            self.workspace.commit(op, routed)
+            return self
+
+        with self.locked():
+            for entry in entries:
+                self.apply(op, **entry)
+            self.save(self.file)
+        return self
+
+    def compact(self):
+        # folds the journal into the task file
+        with self.locked():
+            self.save(self.file)
+
+    def subtree(self,callback):
+        #callback must return a boolean based on node,data inputs
+        self.require_all()
+        selected_nodes = [node for node,data in self.nodes() if callback(node,data)]
+        return self._select(selected_nodes)
+
+    def deadline_index(self):
+        # built from the full tree on first use, then kept up to date by apply()
+        base = self.base
+        if base._deadline_index is None:
+            base._deadline_index = DeadlineIndex(base.nodes())
+        return base._deadline_index
+
+    def require_tasks(self, task_ids):
+        # makes sure the given tasks are in a lazily loaded sharded tree, reading their shards
+        state = self.base.shards
+        if state is not None and state.unloaded:
+            self.base._load_shards({shards.shard_of(task_id) for task_id in task_ids})
+
+    def require_due(self, start, end, open_only=False):
+        # reads the shards that can hold tasks due from start to end (None leaves that end
+        # open), going by the deadline bounds in the manifest. open_only: only unfinished tasks matter
+        state = self.base.shards
+        if state is not None and state.unloaded:
+            self.base._load_shards({
+                milestone for milestone in state.unloaded
+                if state.manifest.shards[milestone].may_be_due(start, end, open_only)
+            })
+
+    def require_all(self):
+        state = self.base.shards
+        if state is not None and state.unloaded:
+            self.base._load_shards(set(state.unloaded))
+
+    def require_query(self, query):
+        # the shards a TaskQuery can select tasks from
+        if query.root_id != '0':
+            self.require_tasks([query.root_id])
+        elif query.max_depth is not None and query.max_depth <= 1:
+            pass  # the milestones are always there
+        elif query.has_deadline_range():
+            self.require_due(query.start, query.end, open_only=query.completion_status is False and not query.promotes())
+        else:
+            self.require_all()
+
+    def _load_shards(self, milestones):
+        state = self.shards
+        milestones = [milestone for milestone in state.manifest.shards if milestone in milestones and milestone in state.unloaded]
+        if not milestones:
+            return
+        with profiling.phase('load'), self.lock.hold(shared=True) if self.lock else nullcontext():
+            if self.lock is not None and storage.stamp(self.file) != self.stamp:
+                # another process saved since the manifest was read, and the shard files it
+                # listed may be gone: catch up first, then read from the new manifest
+                self.catch_up()
+                return self._load_shards(set(milestones))
+            for milestone in milestones:
+                for task_id, parent_id, attrs in shards.read_shard(state.directory, state.manifest.shards[milestone]):
+                    if task_id != milestone:
+                        self._insert(parent_id, task_id, attrs)
+                state.unloaded.discard(milestone)
+            # the tree changed, though not on disk: the deadline index is built again when needed
+            self._deadline_index = None
+            self.version += 1
+
+    def search_index(self):
+        # task names by word, for `due find` (see search.py): loaded or built on first use, then
+        # kept up to date by apply()
+        base = self.base
+        if base._search_index is None:
+            from due import search
+            base._search_index = search.for_tree(base)
+        return base._search_index
+
+    def history(self):
+        # deadline changes by task, milestone and category: read on first use, then brought up
+        # to date with what was appended since on every later one
+        base = self.base
+        if base.workspace is not None:
+            return base.workspace.history()
+        if base._history is None:
+            base._history = history.History.load(history.history_file(base.file)) if base.file else history.History()
+        else:
+            base._history.catch_up()
+        return base._history
+
+    def due_candidates(self, start, end):
+        # ids of tasks due from start to end from the deadline index, plus the recurring tasks
+        # with an open occurrence in that range (only those few are expanded). in a lazily loaded
+        # sharded tree the shards that can hold them are read first
+        self.require_due(start, end)
+        index = self.deadline_index()
+        yield from index.between(start, end)
+        for task_id in index.recurring:
+            if task_id in self.base:
+                occurrence = recurrence.next_open(self.base.task(task_id), start)
+                if occurrence is not None and (end is None or occurrence <= end):
+                    yield task_id
+
+    def due_between(self, start, end):
+        # tasks due from start to end (inclusive; None leaves that end open), found by bisecting
+        # the deadline index, plus the ancestors that connect them to the root '0'
+        selected = {'0'}
+        for task_id in self.due_candidates(start, end):
+            chain, node = [], task_id
+            while node is not None and node not in selected and node in self:
+                chain.append(node)
+                node = self.parent(node)
+            # a task whose ancestors were filtered out of this view stays out
+            if node in selected:
+                selected.update(chain)
+        return self._select(selected)
+
+    def due_by(self,deadline):
+        if deadline in (False,None):
+            return self
+        return self.due_between(None, deadline)
+
+    def depth_limit(self,depth):
+        # only the tasks down to `depth` are visited, so listing milestones (depth 1)
+        # costs as much as the milestones, not the whole tree
+        if depth is None:
+            return self
+        if depth > 1:
+            self.require_all()  # the milestones (depth 1) are always there
+        return self._select(node for node, _ in self.depths(max_depth=depth))
+
+    def completed(self,completion_status,promote='prune'):
+        # promote='context' or 'lift' keeps matching subtasks of tasks that don't match, see TaskQuery
+        if completion_status == None:
+            return self
+        if promote != 'prune':
+            from due.query import TaskQuery
+            return TaskQuery('0').completed(completion_status).promote(promote).run(self)
+        callback = lambda node,data: node == '0' or data['complete'] == completion_status
+        return self.subtree(callback)
+
+    def depth(self, task_id):
+        # distance from the root '0'; cached on the full tree, since a task's depth never changes
+        cache = self.base._depths
+        chain = []
+        while task_id not in cache:
+            chain.append(task_id)
+            task_id = self.base.parent(task_id)
+        depth = cache[task_id]
+        for node in reversed(chain):
+            depth += 1
+            cache[node] = depth
+        return depth
+
+    def depths(self, root_task_id='0', max_depth=None):
+        # yields (task_id, depth) for the tasks reachable from root_task_id, breadth first,
+        # without expanding tasks at max_depth. depths are counted from the root '0'
+        cache = self.base._depths
+        depth = self.depth(root_task_id)
+        level = [root_task_id]
+        while level:
+            for node in level:
+                cache[node] = depth
+                yield node, depth
+            if max_depth is not None and depth >= max_depth:
+                break
+            level = [child for node in level for child in self.children(node)]
+            depth += 1
+
+    def records(self, root_task_id='0'):
+        # yields (task_id, parent_id, attrs) for every task under root_task_id in preorder
+        stack = [(root_task_id, None)]
+        while stack:
+            node, parent = stack.pop()
+            yield node, parent, self.task(node)
+            stack.extend((child, node) for child in reversed(list(self.children(node))))
+
+    def save(self, file:Path = None) -> None:
+        # the file format (.json or .snap) is chosen by extension, see storage.py
+        # saving over the tree's own task file is refused (storage.TaskFileChanged) if another
+        # process changed it since it was read, instead of silently dropping their changes;
+        # locked() merges them first. a workspace is saved file by file
+        if file is None and self.workspace is not None:
+            self.workspace.save()
+            return
+        file = file or due.TASK_FILE_PATH
+        if self.lock is None or file != self.file:
+            # a copy elsewhere needs every shard
+            self.require_all()
+            with profiling.phase('save'):
+                storage.write_records(file, self.records())
+            return
+
+        with self.lock.hold():
+            if self.changed_on_disk():
+                raise storage.TaskFileChanged(f"{file} was changed by another process since it was read")
+            with profiling.phase('save'):
+                if self.shards is not None:
+                    # only the shards that changed are written
+                    shards.save(file, self, self.shards)
+                else:
+                    storage.write_records(file, self.records())
+                self.stamp = storage.stamp(file)
+                # a search index in use is saved for the new version of the file
+                if self._search_index is not None:
+                    from due import search
+                    self._search_index.save(search.index_file(file), self.stamp, self)
+
+            # the task file now contains every journaled change, so the journal can start over
+            if self.journal is not None:
+                self.journal.truncate()
+
+    @classmethod
+    def load(cls, file:Path = None, journaled=True, lazy=False):
+        # journaled trees replay todo.json.log on top of todo.json, and log every later change to it.
+        # the file and its journal are read under a shared lock, so never halfway through a save.
+        # lazy: a sharded store (see shards.py) is read one milestone at a time, as needed
+        file = file or due.TASK_FILE_PATH
+        lock = locking.FileLock(file)
+        with profiling.phase('load'), lock.hold(shared=True):
+            t = cls._read(file, journaled, lazy)
+        t.lock = lock
+        return t
+
+    @classmethod
+    def _read(cls, file, journaled, lazy=False, records=None):
+        # records: the file's contents when the caller already has them (see workspace.py)
+        if records is not None:
+            t = cls.from_records(records)
+        elif lazy and shards.is_sharded(file):
+            manifest = shards.read_manifest(file)
+            t = cls.from_records(manifest.base_records())
+            t.shards = shards.ShardState(file, manifest)
+        else:
+            t = cls.from_records(storage.read_records(file))
+        t.file = file
+        t.stamp = storage.stamp(file)
+
+        if journaled:
+            t.journal = journal.Journal(file)
+            for entry in t.journal.replay():
+                t.apply(**entry)
+        return t
@@ -1,121 +1,225 @@
 import json
 import argparse
-import calendar
-import re
+import os
+import sys
 from datetime import datetime, date, timedelta
 from itertools import chain
 from pathlib import Path
 
-from rich.console import Console
-# from rich import print as rprint
-from rich.tree import Tree
+import due
+from due import export, monthview, profiling, recurrence, viewcache
+from due.query import TaskQuery
+
+# rich, the config theme (due.COLOR) and the task tree (due.TASK_TREE)
+# are all looked up lazily inside the methods that need them, to keep `python -m due` startup cheap.
+# the views (`due today / tomorrow / week`, `due ls`) don't import rich at all, see terminal.py
+
+
+# extra keyword arguments for every rich Console, e.g. set by `due serve` to render for its client
+CONSOLE_OPTIONS = {}
+
+
+def console(**options):
+    # create a rich console with the config colors loaded as its theme
+    from rich.console import Console
+    return Console(theme=due.COLOR, **dict(CONSOLE_OPTIONS, **options))
+
+
+def view_console():
+    # the views print their markup without importing rich, unless the config theme has styles
+    # only rich knows (see terminal.py)
+    from due import terminal
+    try:
+        return terminal.Console(due.STYLES, fallback=console, **CONSOLE_OPTIONS)
+    except terminal.StyleError:
+        return console()
+
+
+def print_cached(cons, key, size, render):
+    # prints what render() prints to cons, replaying it from the task tree's render cache if the
+    # same output was made before (see viewcache.py). output of views with more than
+    # RENDER_CACHE_TASKS tasks is streamed instead of held in memory
+    renders = due.TASK_TREE.view_cache.renders
+    text = renders.get(key)
+    if text is None:
+        if size > viewcache.RENDER_CACHE_TASKS:
+            render()
+            return
+        with cons.capture() as capture:
+            render()
+        text = capture.get()
+        renders.put(key, text, len(text))
+    cons.file.write(text)
+    cons.file.flush()
+
+
+def check_writable(command, task_id, parent=False):
+    # in a workspace, the root and the mounted files aren't tasks to change (see workspace.py)
+    workspace = due.TASK_TREE.workspace
+    if workspace is None:
+        return
+    from due.workspace import WorkspaceError
+    try:
+        workspace.check(task_id, parent)
+    except WorkspaceError as e:
+        print(f"due {command}: {e}", file=sys.stderr)
+        sys.exit(1)
 
 
-from due import CAL_STR, TODAY, TASK_TREE, TASK_FILE_PATH, COLOR
-from due.tasks import TaskTree
-
 class RichTextCal:
 
-    @staticmethod
-    def header_offset():
-        # find the end index of the calendar header
-        cal_header_pattern = re.compile(r"Sa\n",re.MULTILINE)
-        match = cal_header_pattern.search(CAL_STR)
-        header_offset = match.end()
-        return header_offset
+    # the month text and where each day sits in it come from monthview.py
 
     @staticmethod
-    def highlight_match(regex, multiline=False):
-        # find start and end indexes for regex in CAL_STR
-        header_offset = RichTextCal.header_offset()
-        pattern = re.compile(regex,re.MULTILINE) if multiline else re.compile(regex)
-        match = pattern.search(CAL_STR[header_offset:])
-        match_start, match_end = header_offset+match.start(), header_offset+match.end()
-        cal_str = (
-            CAL_STR[:match_start] + 
-            r"[reverse]" + 
-            CAL_STR[match_start:match_end] + 
-            r"[/reverse]" + 
-            CAL_STR[match_end:]
-        )
-        return cal_str
+    def task_counts(first, last):
+        # number of unfinished tasks due on each day from first to last, for the heatmap
+        counts = {}
+        due.TASK_TREE.require_due(first, last, open_only=True)
+        index = due.TASK_TREE.deadline_index()
+        for task_id in index.between(first, last):
+            attr = due.TASK_TREE.task(task_id)
+            if not attr['complete']:
+                counts[attr['deadline']] = counts.get(attr['deadline'], 0) + 1
+        # recurring tasks count on each of their open occurrences in the range
+        for task_id in index.recurring:
+            attr = due.TASK_TREE.task(task_id)
+            if not attr['complete']:
+                for day in recurrence.occurrences(attr, first, last):
+                    counts[day] = counts.get(day, 0) + 1
+        return counts
 
+    @staticmethod
+    def print_calendar(day, months=1, heatmap=False, **highlight):
+        with profiling.phase('calendar'):
+            counts = RichTextCal.task_counts(*monthview.span(day, months)) if heatmap else None
+            cal_str = monthview.render(day, months, counts=counts, **highlight)
+            cons = view_console()
+            cons.print(cal_str, highlight=False) #highlight=False because I don't want numbers to be highlighted different color
 
     @staticmethod
-    def print_week(day=TODAY.day):
+    def print_week(day=None, months=1, heatmap=False):
         # highlights week around a given day on calendar
-        week_regex = rf"^.*\b{day}.*$"
-        cal_str = RichTextCal.highlight_match(week_regex, multiline=True)
-        cons = Console(theme=COLOR)
-        cons.print(cal_str, highlight=False) #highlight=False because I don't want numbers to be highlighted different color
-
+        day = day or due.TODAY
+        RichTextCal.print_calendar(day, months, heatmap, weeks=monthview.week(day))
 
     @staticmethod
-    def print_day(day=TODAY.day):
+    def print_day(day=None, months=1, heatmap=False):
         # highlights day only on calendar
+        day = day or due.TODAY
+        RichTextCal.print_calendar(day, months, heatmap, days=[day])
+
+# milestone progress bars for `due stats`
+PROGRESS_WIDTH, PROGRESS_DONE, PROGRESS_OPEN = 20, '█', '░'
+
+# box-drawing guides, the same ones rich.tree.Tree draws
+GUIDE_SPACE, GUIDE_CONTINUE, GUIDE_FORK, GUIDE_END = '    ', '│   ', '├── ', '└── '
 
-        # want to highlight space in front of day if it's only one digit.
-        day_regex = f' {day}' if len(str(day)) == 1 else str(day)
-        cal_str = RichTextCal.highlight_match(day_regex, multiline=False)
-        cons = Console(theme=COLOR)
-        cons.print(cal_str, highlight=False) #highlight=False because I don't want numbers to be highlighted different color
 
 class RichTextTree:
     # TODO: clean up this class. I believe format_task() should call print_task() and print_task should be renamed
-    # TODO: don't need to pass attr for this function. this can be retrieved from TASK_TREE using TASK_TREE.tree.nodes[kwargs['id']
+    # TODO: don't need to pass attr for this function. this can be retrieved from TASK_TREE using TASK_TREE.task(kwargs['id'])
     @staticmethod
     def print_task(task_id, attr, tag, message):
-        t_id, name, deadline = task_id, attr['task_name'], attr['deadline'].strftime("%Y-%m-%d")
-        line = f"{message}: [{tag}]{t_id} {name} {deadline}[/{tag}]"
+        t_id, name = task_id, attr['task_name']
+        deadline = f" {attr['deadline'].strftime('%Y-%m-%d')}" if attr.get('deadline') else ''
+        line = f"{message}: [{tag}]{t_id} {name}{deadline}[/{tag}]"
         return line
 
     @staticmethod 
-    def format_task(task_id, attr, noids, nodates, noyear):
+    def format_task(task_id, attr, noids, nodates, noyear, context=False):
 
-        if not attr:
+        # the files of a workspace are shown as tasks without a deadline
+        deadline = attr.get('deadline')
+        if deadline is not None:
+            deadline = deadline.strftime("%m-%d") if noyear else deadline.strftime("%Y-%m-%d")
+
+        # the root '0' has no name (its only attribute, if any, is its subtask id counter)
+        if 'task_name' not in attr:
             line = '' if noids else f"[task_id]{task_id}[/task_id]"
 
         # if task is complete, appy [complete] tags
         elif  attr['complete']:
             format_id =  '' if noids else f"{task_id} "
             format_name = f"{attr['task_name']} "
-            deadline = attr['deadline'].strftime("%m-%d") if noyear else attr['deadline'].strftime("%Y-%m-%d")
-            format_deadline = '' if nodates else f"{deadline} "
+            format_deadline = '' if nodates or deadline is None else f"{deadline} "
             line = f"[complete]{format_id} {format_name} {format_deadline}[/complete]"
 
         # if task isn't complete, just display id, name and deadline
         else:
             format_id =  '' if noids else f"[task_id]{task_id}[/task_id] "
             format_name= f"[task_name]{attr['task_name']}[/task_name] "
-            deadline = attr['deadline'].strftime("%m-%d") if noyear else attr['deadline'].strftime("%Y-%m-%d")
-            format_deadline = '' if nodates else f"[deadline]{deadline}[/deadline] "
+            format_deadline = '' if nodates or deadline is None else f"[deadline]{deadline}[/deadline] "
             line = f"{format_id}{format_name}{format_deadline}"
 
+        # recurring tasks are marked, their deadline being the occurrence shown
+        if 'repeat' in attr:
+            line = f"{line}[deadline]↻[/deadline] "
+
+        # tasks that are only shown to connect the ones that matched (ls --done) are dimmed
+        if context:
+            line = f"[dim]{line}[/dim]"
+
         return line
 
     @staticmethod 
     def format_tree(root_task_id, task_tree, noids, nodates, noyear):
+        from rich.tree import Tree
 
         # CREATE RICH TEXT TREE
-        attr = task_tree.tree.nodes[root_task_id]
+        attr = task_tree.task(root_task_id)
         display_tree = Tree(RichTextTree.format_task(root_task_id, attr, noids, nodates, noyear) )
 
-        def dfs(node,display_tree):
+        # depth first, with an explicit stack so deep subtask chains can't hit the recursion limit
+        stack = [(root_task_id, display_tree)]
+        while stack:
+            node, branch = stack.pop()
+            added = []
+            for neighbor in task_tree.children(node):
 
-            for neighbor in task_tree.tree.adj[node]:
-
-                attr = task_tree.tree.nodes[neighbor]
-                line = RichTextTree.format_task(neighbor, attr, noids, nodates, noyear)
+                attr = task_tree.occurrence(neighbor)
+                line = RichTextTree.format_task(neighbor, attr, noids, nodates, noyear, neighbor in task_tree.context)
 
                 # the tree.add() method returns a pointer to the node that was just added
-                branch = display_tree.add(line)
-                dfs(neighbor,branch)
-            
-            return display_tree
+                added.append((neighbor, branch.add(line)))
+            stack.extend(reversed(added))
 
-        display_tree = dfs(root_task_id,display_tree)
         return display_tree
 
+    @staticmethod
+    def stream_tree(root_task_id, task_tree, noids, nodates, noyear, cons):
+        # prints the same tree as format_tree, but line by line while walking it, so output starts
+        # right away and memory stays flat: only one pending iterator per level is kept around
+        cons.print(RichTextTree.format_task(root_task_id, task_tree.task(root_task_id), noids, nodates, noyear), highlight=False, soft_wrap=True)
+
+        stack = [(RichTextTree.last_flagged(task_tree.children(root_task_id)), '')]
+        while stack:
+            children, guide = stack[-1]
+            child, last = next(children, (None, None))
+            if child is None:
+                stack.pop()
+                continue
+
+            line = RichTextTree.format_task(child, task_tree.occurrence(child), noids, nodates, noyear, child in task_tree.context)
+            branch = GUIDE_END if last else GUIDE_FORK
+            cons.print(f"[guide_line]{guide}{branch}[/guide_line]{line}", highlight=False, soft_wrap=True)
+
+            stack.append((
+                RichTextTree.last_flagged(task_tree.children(child)),
+                guide + (GUIDE_SPACE if last else GUIDE_CONTINUE),
+            ))
+
+    @staticmethod
+    def last_flagged(iterable):
+        # yields (item, is_last_item) pairs
+        iterator = iter(iterable)
+        previous = next(iterator, None)
+        if previous is None:
+            return
+        for item in iterator:
+            yield previous, False
+            previous = item
+        yield previous, True
+
 class Commands:
 
     @staticmethod
@@ -133,9 +237,19 @@ class Commands:
             msg = f"Not a valid date: '{date_string}'. Use YYYY-MM-DD format"
             raise argparse.ArgumentTypeError(msg)
 
+    @staticmethod
+    def valid_repeat(rule):
+        try:
+            recurrence.parse(rule)
+        except recurrence.RuleError as e:
+            raise argparse.ArgumentTypeError(str(e))
+        return rule
+
     @staticmethod
     def valid_id(id_string):
-            if id_string in TASK_TREE.tree.nodes:
+            # (reading its shard first, if the task file is sharded)
+            due.TASK_TREE.require_tasks([id_string])
+            if id_string in due.TASK_TREE:
                 return id_string
             else:
                 msg = f"Id not found in task tree: '{id_string}'"
@@ -152,33 +266,58 @@ class Commands:
         nodates = kwargs['nodates']
         noyear = kwargs['noyear']
 
-        if kwargs['done'] == True: # TODO: --done flag will not produce a complete tree because children can be completed before parents and so there's no way to get to parents. need to use "promote" algorithm to elevate children in this case.
+        # children can be completed before their parents, so --done keeps unfinished parents of
+        # finished tasks as dimmed context by default (or lifts the finished tasks, with --promote lift)
+        if kwargs['done'] == True:
             completion_status = True
         elif kwargs['undone'] == True: 
             completion_status = False
         else:
             completion_status = None
 
-        # LOAD TASK TREE FROM JSON and filter based on cli args
-        task_tree = (
-            TASK_TREE
+        # LOAD TASK TREE FROM JSON and filter based on cli args, all in one pass (see query.py)
+        query = (
+            TaskQuery(root_id)
             .depth_limit(depth)
             .due_by(deadline)
             .completed(completion_status)
+            .promote(kwargs.get('promote') or ('context' if completion_status else 'prune'))
+            .name_contains(kwargs.get('name'))
         )
+        task_tree = query.run(due.TASK_TREE)
+
+        # EXPORT TASKS AS JSON LINES, CSV OR MARKDOWN, streamed straight to stdout without rich
+        export_format = kwargs.get('export')
+        if export_format:
+            try:
+                with profiling.phase('render'):
+                    export.WRITERS[export_format](export.rows(task_tree, root_id), sys.stdout)
+                    sys.stdout.flush()
+            except BrokenPipeError:
+                devnull = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull, sys.stdout.fileno())
+            return
 
-        # CREATE RICH TEXT TREE FROM TASK_TREE
-        display_tree = RichTextTree.format_tree(root_id, task_tree, noids, nodates, noyear)
-
-        # GET CONFIG FILE CONTENTS AND LOAD COLOR INTO CONSOLE AS THEME
-        cons = Console(theme=COLOR)
-
-        # DISPLAY RICH TEXT TREE ON CONSOLE
-        cons.print(display_tree)
+        try:
+            with profiling.phase('render'):
+                # GET CONFIG FILE CONTENTS AND LOAD COLOR INTO CONSOLE AS THEME
+                cons = view_console()
+
+                # DISPLAY TASK TREE ON CONSOLE, one line at a time (or as it was shown before, if
+                # neither the tree nor the console has changed since)
+                key = (
+                    query.key(), due.TASK_TREE.version, due.TODAY, noids, nodates, noyear,
+                    cons.width, cons.color_system, cons.is_terminal,
+                )
+                print_cached(cons, key, query.matched, lambda: RichTextTree.stream_tree(root_id, task_tree, noids, nodates, noyear, cons))
+        except BrokenPipeError:
+            # output was piped into something like `head` that has stopped reading
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
 
     @classmethod
     def display_today(*args,**kwargs):
-        RichTextCal.print_day()
+        RichTextCal.print_day(months=kwargs.get('months', 1), heatmap=kwargs.get('heatmap', False))
         Commands.ls(
             id='0',
             depth= None,
@@ -187,14 +326,14 @@ class Commands:
             nodates= True,
             noids=False,
             noyear=False,
-            deadline=TODAY
+            deadline=due.TODAY
         )
 
 
     @classmethod
     def display_tomorrow(*args, **kwargs):
-        tomorrow = TODAY + timedelta(days=1)
-        RichTextCal.print_day(tomorrow.day)
+        tomorrow = due.TODAY + timedelta(days=1)
+        RichTextCal.print_day(tomorrow, kwargs.get('months', 1), kwargs.get('heatmap', False))
         Commands.ls(
             id='0',
             depth= None,
@@ -208,7 +347,7 @@ class Commands:
 
     @classmethod
     def display_week(*args, **kwargs):
-        RichTextCal.print_week()
+        RichTextCal.print_week(months=kwargs.get('months', 1), heatmap=kwargs.get('heatmap', False))
         Commands.ls(
             id='0',
             depth= None,
@@ -217,54 +356,288 @@ class Commands:
             nodates= True,
             noids=False,
             noyear=False,
-            deadline=Commands.get_next_saturday(TODAY)
+            deadline=Commands.get_next_saturday(due.TODAY)
         )
 
     @classmethod
     def add_task(*args, **kwargs):
-        pass
-        # TASK_TREE = TASK_TREE
-
-        # # positional arguments from command line:
-        # id = kwargs['parent_id']
-        # task_name = kwargs['child_task_name']
-        # deadline = kwargs['child_task_deadline']
 
-        # # add subtask to task tree and print result to terminal
-        # TASK_TREE.get_subtask(id).add_subtask(
-        #     TaskTree(
-        #         task_name =  task_name,
-        #         deadline =  deadline
-        #     )
-        # )
-        # print(TASK_TREE)
-
-        # # repeated tasks (optional)
-
-        # # save task tree to json file
-        # TASK_TREE.to_json_file()
+        # positional arguments from command line:
+        parent_id = kwargs['parent_id']
+        task_name = kwargs['child_task_name']
+        deadline = kwargs['child_task_deadline']
+        repeat, until = kwargs.get('repeat'), kwargs.get('until')
+        if until and not repeat:
+            print("due add: --until only applies to tasks with --repeat", file=sys.stderr)
+            sys.exit(2)
+        check_writable('add', parent_id, parent=True)
+
+        # add subtask to task tree (the change is journaled, see journal.py) and print result to terminal.
+        # the id is picked under the task file's lock, after catching up with other processes
+        with due.TASK_TREE.locked(parent_id):
+            task_id = due.TASK_TREE.next_task_id(parent_id)
+            due.TASK_TREE.add_task(parent_id, task_name, deadline, repeat, until)
+        line = RichTextTree.print_task(task_id,due.TASK_TREE.task(task_id),'task_name','added')
+        if repeat:
+            line += f" (repeats {repeat}" + (f" until {until})" if until else ")")
+        cons = console()
+        cons.print(line)
 
     @classmethod
     def rm_task(*args, **kwargs):
-        # TODO: displays deleted task in terminal; make it actually change the task
-        line = RichTextTree.print_task(kwargs['id'],TASK_TREE.tree.nodes[kwargs['id']],'delete','deleted')
-        cons=Console(theme=COLOR)
+        check_writable('rm', kwargs['id'])
+        line = RichTextTree.print_task(kwargs['id'],due.TASK_TREE.task(kwargs['id']),'delete','deleted')
+        due.TASK_TREE.delete_task(kwargs['id'])
+        cons = console()
         cons.print(line)
 
     @classmethod
     def complete_task(*args, **kwargs):
-        # TODO: displays complete task in terminal; make it actually change the task
-        line = RichTextTree.print_task(kwargs['id'],TASK_TREE.tree.nodes[kwargs['id']],'complete','marked done')
-        cons=Console(theme=COLOR)
+        # for a recurring task only one occurrence is done: the one given with --on, or else the
+        # first one that's still open
+        check_writable('done', kwargs['id'])
+        attr = due.TASK_TREE.task(kwargs['id'])
+        on = kwargs.get('on')
+        if 'repeat' in attr:
+            on = on or recurrence.next_open(attr)
+        if on is None or 'repeat' not in attr:
+            due.TASK_TREE.complete_task(kwargs['id'])
+            attr = due.TASK_TREE.task(kwargs['id'])
+        else:
+            due.TASK_TREE.complete_task(kwargs['id'], on)
+            attr = dict(attr, deadline=on)
+        line = RichTextTree.print_task(kwargs['id'],attr,'complete','marked done')
+        cons = console()
         cons.print(line)
 
     @classmethod
     def uncomplete_task(*args, **kwargs):
-        # TODO: displays incomplete task in terminal; make it actually change the task
-        line = RichTextTree.print_task(kwargs['id'],TASK_TREE.tree.nodes[kwargs['id']],'incomplete','marked undone')
-        cons=Console(theme=COLOR)
+        # for a recurring task: the occurrence given with --on, or else the last one done
+        check_writable('undone', kwargs['id'])
+        attr = due.TASK_TREE.task(kwargs['id'])
+        on = kwargs.get('on')
+        if 'repeat' in attr and not attr['complete']:
+            on = on or recurrence.last_done(attr)
+        if on is None or 'repeat' not in attr:
+            due.TASK_TREE.uncomplete_task(kwargs['id'])
+            attr = due.TASK_TREE.task(kwargs['id'])
+        else:
+            due.TASK_TREE.uncomplete_task(kwargs['id'], on)
+            attr = dict(attr, deadline=on)
+        line = RichTextTree.print_task(kwargs['id'],attr,'incomplete','marked undone')
+        cons = console()
         cons.print(line)
 
+    @classmethod
+    def reschedule_task(*args, **kwargs):
+        # moves the deadline, recording from when to when (and why) in the history store
+        # --shift moves the subtasks by as many days as the task, --clamp brings forward the ones
+        # due after its new deadline
+        task_id, deadline = kwargs['id'], kwargs['deadline']
+        check_writable('reschedule', task_id)
+        if task_id == '0' and not kwargs.get('clamp'):
+            print("due reschedule: '0' is the root, not a task; use --clamp to bring every task due later forward to the date", file=sys.stderr)
+            sys.exit(1)
+        old = due.TASK_TREE.task(task_id).get('deadline')
+        if kwargs.get('shift') and old is None:
+            print(f"due reschedule: {task_id} has no deadline to shift its subtasks from; use --clamp or no option", file=sys.stderr)
+            sys.exit(1)
+        if kwargs.get('shift'):
+            moved = due.TASK_TREE.shift_deadlines(task_id, deadline - old, kwargs['category'], kwargs['reason'])
+        elif kwargs.get('clamp'):
+            moved = due.TASK_TREE.clamp_deadlines(task_id, deadline, kwargs['category'], kwargs['reason'])
+        else:
+            due.TASK_TREE.reschedule_task(task_id, deadline, kwargs['category'], kwargs['reason'])
+            moved = [task_id]
+        cons = console()
+        if task_id == '0':
+            # the root has no deadline or name of its own: only its subtasks were moved
+            count = len(moved)
+            cons.print(f"rescheduled: {count} task{'' if count == 1 else 's'} brought forward to {deadline.strftime('%Y-%m-%d')}", highlight=False)
+            return
+        attr = due.TASK_TREE.task(task_id)
+        change = f"{old.strftime('%Y-%m-%d')} → " if old else ''
+        subtasks = len([t for t in moved if t != task_id])
+        also = f" (and {subtasks} subtask{'' if subtasks == 1 else 's'})" if subtasks else ''
+        line = f"rescheduled: [task_name]{task_id} {attr['task_name']} {change}{attr['deadline'].strftime('%Y-%m-%d')}[/task_name]{also}"
+        cons.print(line, highlight=False)
+
+    @classmethod
+    def deferments(*args, **kwargs):
+        # deadline changes of a task and its subtasks, with statistics per category and then by
+        # milestone: the milestone's own, and its subtasks' (see history.py)
+        from due import history
+        store = due.TASK_TREE.history()
+        task_id, category = kwargs['id'], kwargs['category']
+        if task_id == '0':
+            records = store.of_category(category) if category else store.since(0)
+        else:
+            records = [record for record in store.under(task_id) if not category or record['category'] == category]
+
+        if kwargs['jsonl']:
+            for record in records:
+                print(json.dumps(record))
+            return
+        if not records:
+            print("due deferments: no deadline changes recorded" + (f" in '{category}'" if category else ''), file=sys.stderr)
+            sys.exit(1)
+
+        cons = console()
+        for name, stats in history.summary(records).items():
+            mean = f" ({stats['mean_days']} days each)" if stats['deferments'] else ''
+            cons.print(
+                f"[task_name]{name}[/task_name] {stats['changes']} change{'' if stats['changes'] == 1 else 's'}, "
+                f"{stats['deferments']} deferred by {stats['days']} days{mean}",
+                highlight=False,
+            )
+
+        by_milestone = {}
+        for record in records:
+            by_milestone.setdefault(record['milestone'], []).append(record)
+        for milestone in sorted(by_milestone, key=lambda m: [int(n) for n in m.split('.')]):
+            group = by_milestone[milestone]
+            own = [record for record in group if record['id'] == milestone]
+            if milestone in due.TASK_TREE:
+                name = due.TASK_TREE.task(milestone)['task_name']
+            else:
+                name = own[0]['name'] if own else '(deleted)'
+            cons.print(f"\n[task_id]{milestone}[/task_id] [task_name]{name}[/task_name]", highlight=False)
+            for title, rows in ((f"deferments of {name}", own), ("deferments of subtasks", [record for record in group if record['id'] != milestone])):
+                if not rows:
+                    continue
+                cons.print(f"{GUIDE_SPACE}{title}", highlight=False)
+                for record in rows:
+                    reason = f"  {record['reason']}" if record['reason'] else ''
+                    cons.print(
+                        f"{GUIDE_SPACE * 2}{record['at']}  [task_id]{record['id']}[/task_id] {record['name']}  "
+                        f"[deadline]{record['from'] or '-'} → {record['to']}[/deadline]  {record['category']}{reason}",
+                        highlight=False, soft_wrap=True,
+                    )
+
+    @classmethod
+    def import_tasks(*args, **kwargs):
+        # grafts the tasks in a file under an existing task, see importer.py
+        from due import importer
+        check_writable('import', kwargs['parent'], parent=True)
+        try:
+            entries = importer.import_file(
+                due.TASK_TREE, kwargs['file'], kwargs['parent'], kwargs['import_format'], kwargs['dry_run'],
+            )
+        except importer.ImportFileError as e:
+            for error in e.errors:
+                print(f"due import: {error}", file=sys.stderr)
+            sys.exit(1)
+
+        cons = console()
+        if kwargs['dry_run']:
+            for entry in entries:
+                cons.print(RichTextTree.print_task(entry['id'], entry, 'task_name', 'would add'), highlight=False)
+        message = 'would import' if kwargs['dry_run'] else 'imported'
+        cons.print(f"{message}: {len(entries)} tasks under [task_id]{kwargs['parent']}[/task_id]")
+
+    @classmethod
+    def stats(*args, **kwargs):
+        # milestone progress and deadline counts, see analytics.py
+        try:
+            from due import analytics
+        except ImportError:
+            print("due stats: numpy is needed for statistics (pip install numpy)", file=sys.stderr)
+            sys.exit(1)
+
+        root_id = kwargs['id']
+        if root_id == '0':
+            # (valid_id has read the shard of any other task)
+            due.TASK_TREE.require_all()
+        columns = analytics.TaskColumns.from_tree(due.TASK_TREE, root_id)
+
+        try:
+            if kwargs['series']:
+                bounds = analytics.deadline_range(columns) or (due.TODAY, due.TODAY)
+                start, end = kwargs['start'] or bounds[0], kwargs['end'] or bounds[1]
+                json.dump(analytics.series(columns, start, end, due.TODAY), sys.stdout, indent=4)
+                print()
+                sys.stdout.flush()
+                return
+
+            summary = analytics.summary(columns, due.TODAY)
+            milestones = analytics.milestone_stats(columns, due.TODAY)
+            if kwargs['json']:
+                json.dump({'summary': summary, 'milestones': milestones}, sys.stdout, indent=4)
+                print()
+                sys.stdout.flush()
+                return
+
+            cons = console()
+            for stats in milestones:
+                attr = due.TASK_TREE.task(stats['id'])
+                filled = round(stats['ratio'] * PROGRESS_WIDTH)
+                bar = PROGRESS_DONE * filled + PROGRESS_OPEN * (PROGRESS_WIDTH - filled)
+                overdue = f" [delete]{stats['overdue']} overdue[/delete]" if stats['overdue'] else ''
+                cons.print(
+                    f"[task_id]{stats['id']}[/task_id] [task_name]{attr['task_name']}[/task_name] "
+                    f"{bar} {stats['done']}/{stats['total']} ({stats['ratio']:.0%}){overdue}",
+                    highlight=False,
+                )
+            cons.print(
+                f"{summary['total']} tasks: {summary['done']} done, {summary['open']} open, "
+                f"{summary['overdue']} overdue, {summary['due_today']} due today, "
+                f"{summary['due_this_week']} due this week",
+                highlight=False,
+            )
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # output was piped into something like `head` that has stopped reading
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+
+    @classmethod
+    def find_tasks(*args, **kwargs):
+        # ranked matches for the query among task names, with the tasks they're under, see search.py
+        from due import search
+        query = ' '.join(kwargs['query'])
+        with profiling.phase('filter'):
+            # unless the task tree is loaded already (e.g. by `due serve`), only the matches are
+            # read, from the saved index's records
+            found = None
+            if 'TASK_TREE' not in due.__dict__ and not due.WORKSPACE:
+                found = search.find_saved(due.TASK_FILE_PATH, query, kwargs['limit'] or None)
+            if found is None:
+                tree = due.TASK_TREE
+                matches = search.find(tree, query, kwargs['limit'] or None)
+            else:
+                tree, matches = found
+
+        if not matches:
+            print(f"due find: no tasks match '{query}'", file=sys.stderr)
+            sys.exit(1)
+
+        with profiling.phase('render'):
+            if kwargs['jsonl']:
+                for task_id, score in matches:
+                    attr = tree.occurrence(task_id)
+                    deadline = attr.get('deadline')
+                    print(json.dumps({
+                        'id': task_id,
+                        'name': attr['task_name'],
+                        'deadline': deadline.strftime("%Y-%m-%d") if deadline else None,
+                        'complete': attr.get('complete', False),
+                        'path': search.path(tree, task_id),
+                        'score': round(score, 4),
+                    }))
+                return
+
+            cons = console()
+            for task_id, _ in matches:
+                line = RichTextTree.format_task(task_id, tree.occurrence(task_id), False, False, False)
+                path = ' › '.join(search.path(tree, task_id))
+                cons.print(f"{line}[guide_line]{path}[/guide_line]" if path else line, highlight=False, soft_wrap=True)
+
+    @classmethod
+    def serve(*args, **kwargs):
+        # answer commands from other `due` invocations until interrupted, see server.py
+        from due import server
+        server.serve(kwargs.get('socket'))
+
 
     # @classmethod 
     # init(*args,**kwargs):
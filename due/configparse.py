@@ -1,20 +1,52 @@
+import os
+from functools import lru_cache
 from pathlib import Path
 
-import yaml
-from rich.theme import Theme
+from due import profiling
 
 # this configparse.py file exists to avoid circular import between __init__.py and tasks.py:
-    # tasks.py uses 'from due import TASK_FILE_PATH'
+    # tasks.py uses 'due.TASK_FILE_PATH'
     # __init__.py uses 'from due.tasks import TaskTree'
 
-# import configuration data from config.yaml
-CONFIG_PATH = Path(__file__).parent / 'config.yaml'
+# configuration data comes from config.yaml, or from the file named by $DUE_CONFIG
+CONFIG_PATH = Path(os.environ.get('DUE_CONFIG', Path(__file__).parent / 'config.yaml'))
 
-with CONFIG_PATH.open(mode='r') as config_file:
-    config = yaml.load(config_file, Loader=yaml.FullLoader)
 
-# assign config data to variables
-TASK_FILE_PATH = Path(config['task_file'])
-COLOR = Theme(config['color'])
+@lru_cache(maxsize=None)
+def load_config():
+    # yaml is only imported (and config.yaml only parsed) the first time a setting is needed
+    with profiling.phase('config'):
+        import yaml
 
+        with CONFIG_PATH.open(mode='r') as config_file:
+            return yaml.load(config_file, Loader=yaml.FullLoader)
 
+
+def __getattr__(name):
+    # assign config data to variables lazily, on first attribute access
+    if name == 'config':
+        value = load_config()
+    elif name == 'TASK_FILE_PATH':
+        value = Path(load_config()['task_file'])
+    elif name == 'WORKSPACE':
+        # [(name, path)] of the task files of a workspace, or None for a single task_file
+        config = load_config().get('workspace')
+        if config:
+            from due import workspace
+            value = workspace.entries(config)
+        else:
+            value = None
+    elif name == 'BACKEND':
+        value = load_config().get('backend', 'networkx')
+    elif name == 'STYLES':
+        # the color settings as they are, for printing without rich (see terminal.py)
+        value = dict(load_config()['color'])
+    elif name == 'COLOR':
+        with profiling.phase('config'):
+            from rich.theme import Theme
+            value = Theme(load_config()['color'])
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
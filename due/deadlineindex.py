@@ -0,0 +1,79 @@
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+# moving more tasks than this at once rebuilds the sorted entries in one pass rather than
+# removing and inserting each task
+BULK_MOVE = 64
+
+
+class DeadlineIndex:
+
+    # tasks sorted by deadline, so "due on or before" and "due between" queries are a pair of
+    # bisections plus the matching slice instead of a scan over every task in the tree.
+    # TaskTree keeps it up to date as tasks are added, deleted and rescheduled.
+    #
+    # recurring tasks (see recurrence.py) are due on many days, so they aren't sorted in; their
+    # ids are kept in `recurring` and every range query has to consider them as well.
+
+    def __init__(self, nodes=()):
+        # nodes is an iterable of (task_id, attrs), as from TaskTree.nodes()
+        self.deadlines = {}
+        self.recurring = set()
+        for task_id, data in nodes:
+            if 'repeat' in data:
+                self.recurring.add(task_id)
+            elif data.get('deadline', None):
+                self.deadlines[task_id] = data['deadline']
+        self.entries = sorted((deadline, task_id) for task_id, deadline in self.deadlines.items())
+
+    def __len__(self):
+        return len(self.entries) + len(self.recurring)
+
+    def add(self, task_id, deadline, recurring=False):
+        if task_id in self.deadlines or task_id in self.recurring:
+            self.remove(task_id)
+        if recurring:
+            self.recurring.add(task_id)
+        elif deadline:
+            self.deadlines[task_id] = deadline
+            insort(self.entries, (deadline, task_id))
+
+    def remove(self, task_id):
+        self.recurring.discard(task_id)
+        deadline = self.deadlines.pop(task_id, None)
+        if deadline:
+            del self.entries[bisect_left(self.entries, (deadline, task_id))]
+
+    def move_many(self, deadlines):
+        # new deadlines for many tasks ({task_id: deadline}), e.g. a whole subtree shifted.
+        # recurring tasks stay where they are, being due on any day anyway
+        moved = {task_id: deadline for task_id, deadline in deadlines.items() if task_id not in self.recurring}
+        if len(moved) <= BULK_MOVE:
+            for task_id, deadline in moved.items():
+                self.add(task_id, deadline)
+            return
+        kept = [entry for entry in self.entries if entry[1] not in moved]
+        for task_id, deadline in moved.items():
+            if deadline:
+                self.deadlines[task_id] = deadline
+            else:
+                self.deadlines.pop(task_id, None)
+        # two sorted runs, which sort() merges in linear time
+        kept.extend(sorted((deadline, task_id) for task_id, deadline in moved.items() if deadline))
+        kept.sort()
+        self.entries = kept
+
+    def _bounds(self, start, end):
+        lo = 0 if start is None else bisect_left(self.entries, (start,))
+        hi = len(self.entries) if end is None else bisect_left(self.entries, (end + timedelta(days=1),))
+        return lo, hi
+
+    def between(self, start=None, end=None):
+        # ids of tasks due from start to end, inclusive, in deadline order; None leaves that end open
+        lo, hi = self._bounds(start, end)
+        return [task_id for _, task_id in self.entries[lo:hi]]
+
+    def count(self, start=None, end=None):
+        # an upper bound, counting every recurring task
+        lo, hi = self._bounds(start, end)
+        return hi - lo + len(self.recurring)
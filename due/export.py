@@ -0,0 +1,72 @@
+import csv
+import json
+
+# machine-readable output for `due ls --jsonl / --csv / --md`. rows are produced one task at a
+# time while walking the (filtered) task tree and written straight out, so exporting a large
+# tree needs neither a rich tree nor the whole tree as one nested dict.
+
+# context: the task doesn't match the query itself, it's only there to connect the matches
+# under it to the root (shown dimmed by `due ls`, see TaskQuery.promote)
+FIELDS = ('id', 'name', 'deadline', 'complete', 'depth', 'parent', 'context')
+
+
+def rows(task_tree, root_id='0'):
+    # yields one dict per task under root_id, in preorder. the root '0' is a placeholder
+    # without a name, so it's left out. only one pending iterator per level is kept around
+    if 'task_name' in task_tree.occurrence(root_id):
+        yield task_row(task_tree, root_id, task_tree.base.parent(root_id), task_tree.depth(root_id))
+    stack = [(iter(task_tree.children(root_id)), root_id, task_tree.depth(root_id) + 1)]
+    while stack:
+        children, parent, depth = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            continue
+        yield task_row(task_tree, child, parent, depth)
+        stack.append((iter(task_tree.children(child)), child, depth + 1))
+
+
+def task_row(task_tree, node, parent, depth):
+    data = task_tree.occurrence(node)
+    deadline = data.get('deadline')
+    return {
+        'id': node,
+        'name': data.get('task_name'),
+        'deadline': deadline.strftime("%Y-%m-%d") if deadline else None,
+        'complete': data.get('complete', False),
+        'depth': depth,
+        'parent': parent,
+        'context': node in task_tree.context,
+    }
+
+
+def write_jsonl(task_rows, file):
+    for row in task_rows:
+        file.write(json.dumps(row) + '\n')
+
+
+def write_csv(task_rows, file):
+    writer = csv.DictWriter(file, fieldnames=FIELDS, lineterminator='\n')
+    writer.writeheader()
+    for row in task_rows:
+        writer.writerow(row)
+
+
+def write_md(task_rows, file):
+    # nested markdown checklist, indented relative to the first task written
+    base_depth = None
+    for row in task_rows:
+        if base_depth is None:
+            base_depth = row['depth']
+        indent = '  ' * (row['depth'] - base_depth)
+        checkbox = '[x]' if row['complete'] else '[ ]'
+        deadline = f" ({row['deadline']})" if row['deadline'] else ''
+        context = ' *(context)*' if row['context'] else ''
+        file.write(f"{indent}- {checkbox} {row['id']} {row['name']}{deadline}{context}\n")
+
+
+WRITERS = {
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+    'md': write_md,
+}
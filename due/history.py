@@ -0,0 +1,242 @@
+import json
+import os
+from datetime import date
+from pathlib import Path
+
+from due import shards
+
+# history of deadline changes (`due reschedule`), kept out of the task tree in an append-only
+# file next to the task file (todo.json -> todo.json.history), so the tree file doesn't grow
+# with every deferment and load/save never touch it. each line is one change:
+#
+#   {"at": "2026-10-18", "id": "0.3.1", "milestone": "0.3", "name": "draft", "from": "2026-10-16",
+#    "to": "2026-10-23", "category": "blocked", "reason": "waiting on review"}
+#
+# (the old Task class kept these in a deadline_changes attribute on every task.) reading the file
+# indexes the changes by task, milestone and category, so reports like the deferments of a
+# milestone's subtasks or the counts per category are lookups rather than scans.
+#
+# the index is saved next to the history file (todo.json.history.index) along with how much of
+# the file it covers and where each change's line starts. a later process loads it, reads just
+# the lines appended since, and reads the changes a report needs from their lines on demand.
+
+HISTORY_SUFFIX = '.history'
+INDEX_SUFFIX = '.index'
+FORMAT_VERSION = 1
+UNCATEGORIZED = 'uncategorized'
+
+
+def history_file(task_file:Path) -> Path:
+    return task_file.with_name(task_file.name + HISTORY_SUFFIX)
+
+
+def index_file(file:Path) -> Path:
+    return file.with_name(file.name + INDEX_SUFFIX)
+
+
+def change(task_id, name, old, new, category=None, reason=None, at=None):
+    # a history record for a task's deadline moving from old to new
+    if task_id == '0':
+        raise ValueError("the root '0' isn't a task, it has no deadline changes")
+    import due
+    return {
+        'at': (at or due.TODAY).isoformat(),
+        'id': task_id,
+        'milestone': shards.shard_of(task_id),
+        'name': name,
+        'from': old.isoformat() if old else None,
+        'to': new.isoformat() if new else None,
+        'category': category or UNCATEGORIZED,
+        'reason': reason,
+    }
+
+
+def days(record):
+    # how far the deadline moved (negative: brought forward), None if it had none before
+    if record['from'] is None or record['to'] is None:
+        return None
+    return (date.fromisoformat(record['to']) - date.fromisoformat(record['from'])).days
+
+
+def append(file:Path, records):
+    # appends records with a single write and fsync, like the journal
+    if not records:
+        return
+    data = b''.join(json.dumps(record).encode('utf-8') + b'\n' for record in records)
+    with file.open(mode='ab') as append_file:
+        append_file.write(data)
+        append_file.flush()
+        os.fsync(append_file.fileno())
+
+
+class History:
+
+    def __init__(self, file:Path = None):
+        self.file = file
+        # by position: the change, or None if it's in the file and hasn't been read yet, and
+        # where its line in the file starts (None for changes that aren't in it)
+        self.records = []
+        self.lines = []
+        self.offset = 0  # bytes of the file read so far
+        # positions, by task id, milestone id and category
+        self.tasks = {}
+        self.milestones = {}
+        self.categories = {}
+        # positions by every task above a milestone (in a workspace, the file the milestone is in)
+        self.above = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    @classmethod
+    def load(cls, file:Path):
+        history = cls.load_index(file) or cls(file)
+        offset = history.offset
+        history.catch_up()
+        if history.offset != offset:
+            history.save_index()
+        return history
+
+    @classmethod
+    def load_index(cls, file:Path):
+        # the saved index, if it still covers the start of this history file; else None
+        try:
+            with index_file(file).open(mode='r') as read_file:
+                data = json.load(read_file)
+            stat = os.stat(file)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != FORMAT_VERSION or data.get('inode') != stat.st_ino or data.get('offset', 0) > stat.st_size:
+            return None
+
+        history = cls(file)
+        history.offset, history.lines = data['offset'], data['lines']
+        history.records = [None] * len(history.lines)
+        history.tasks, history.milestones, history.categories = data['tasks'], data['milestones'], data['categories']
+        for milestone, positions in history.milestones.items():
+            for task_id in ancestors(milestone):
+                history.above.setdefault(task_id, []).extend(positions)
+        for positions in history.above.values():
+            positions.sort()
+        return history
+
+    def save_index(self):
+        # written to a temporary file that then replaces the old one, like the search index. an
+        # index that can't be written (e.g. a read-only directory) is simply built again next time
+        file = index_file(self.file)
+        temp_file = file.with_name(f'.{file.name}.{os.getpid()}.tmp')
+        try:
+            with temp_file.open(mode='w') as write_file:
+                json.dump({
+                    'version': FORMAT_VERSION,
+                    'inode': os.stat(self.file).st_ino,
+                    'offset': self.offset,
+                    'lines': self.lines,
+                    'tasks': self.tasks,
+                    'milestones': self.milestones,
+                    'categories': self.categories,
+                }, write_file, separators=(',', ':'))
+            os.replace(temp_file, file)
+        except OSError:
+            temp_file.unlink(missing_ok=True)
+
+    def catch_up(self):
+        # reads what was appended since the last read (by this process or another one). a torn
+        # last line (crash mid-append) is left for a later read, once it's complete
+        if self.file is None or not self.file.exists():
+            return
+        with self.file.open(mode='rb') as read_file:
+            read_file.seek(self.offset)
+            data = read_file.read()
+        end = data.rfind(b'\n') + 1
+        start = 0
+        while start < end:
+            line_end = data.index(b'\n', start) + 1
+            if data[start:line_end].strip():
+                self.add(json.loads(data[start:line_end]), self.offset + start)
+            start = line_end
+        self.offset += end
+
+    def add(self, record, line=None):
+        # indexes a record in memory; line: where it starts in the file, if it's in it
+        position = len(self.records)
+        self.records.append(record)
+        self.lines.append(line)
+        self.tasks.setdefault(record['id'], []).append(position)
+        self.milestones.setdefault(record['milestone'], []).append(position)
+        self.categories.setdefault(record['category'], []).append(position)
+        for task_id in ancestors(record['milestone']):
+            self.above.setdefault(task_id, []).append(position)
+
+    def read(self, positions):
+        # the changes at positions, reading those not read yet from their lines in the file
+        missing = [i for i in positions if self.records[i] is None]
+        if missing:
+            with self.file.open(mode='rb') as read_file:
+                for i in sorted(missing, key=self.lines.__getitem__):
+                    read_file.seek(self.lines[i])
+                    self.records[i] = json.loads(read_file.readline())
+        return [self.records[i] for i in positions]
+
+    def since(self, position):
+        # every change from position on, in the order they were recorded
+        return self.read(range(position, len(self.records)))
+
+    def of_task(self, task_id):
+        return self.read(self.tasks.get(task_id, ()))
+
+    def of_milestone(self, milestone):
+        # changes of the milestone itself and of every task under it
+        return self.read(self.milestones.get(milestone, ()))
+
+    def of_category(self, category):
+        return self.read(self.categories.get(category, ()))
+
+    def under(self, task_id):
+        # changes of a task and of every task under it: for a milestone or a task above the
+        # milestones (a file in a workspace), those indexed under it; for a task below a
+        # milestone, those of its milestone, narrowed down to the task's own subtree
+        if task_id == '0':
+            return self.since(0)
+        if task_id in self.milestones:
+            return self.of_milestone(task_id)
+        if task_id in self.above:
+            return self.read(self.above[task_id])
+        milestone = next((node for node in ancestors(task_id) if node in self.milestones), None)
+        if milestone is None:
+            return []
+        prefix = task_id + '.'
+        return [record for record in self.of_milestone(milestone) if record['id'] == task_id or record['id'].startswith(prefix)]
+
+    def counts(self):
+        # number of changes per category, most first
+        return dict(sorted(((category, len(positions)) for category, positions in self.categories.items()), key=lambda item: -item[1]))
+
+    def mount(self, prefix, records):
+        # adds the records of a file mounted under prefix in a workspace (see workspace.py), with
+        # their ids moved under it: the file's '0.3.1' (milestone '0.3') is '0.1.3.1' (milestone
+        # '0.1.3') under the prefix '0.1'
+        for record in records:
+            self.add(dict(record, id=prefix + record['id'][1:], milestone=prefix + record['milestone'][1:]))
+
+
+def ancestors(task_id):
+    # the tasks above task_id, the nearest first, leaving out the root '0'
+    parts = task_id.split('.')
+    return ['.'.join(parts[:n]) for n in range(len(parts) - 1, 1, -1)]
+
+
+def summary(records):
+    # per category: number of changes, deferments among them (deadline moved later) and the
+    # days deferred in total and on average
+    stats = {}
+    for record in records:
+        category = stats.setdefault(record['category'], {'changes': 0, 'deferments': 0, 'days': 0})
+        category['changes'] += 1
+        moved = days(record)
+        if moved and moved > 0:
+            category['deferments'] += 1
+            category['days'] += moved
+    for category in stats.values():
+        category['mean_days'] = round(category['days'] / category['deferments'], 1) if category['deferments'] else 0
+    return dict(sorted(stats.items(), key=lambda item: -item[1]['changes']))
@@ -0,0 +1,210 @@
+import csv
+import json
+import sys
+from collections.abc import Hashable
+from contextlib import nullcontext
+from datetime import date
+from pathlib import Path
+
+# `due import`: reads tasks from a file and grafts them under an existing task, all at once.
+#
+#   .jsonl / .csv       one task per line/row, with the fields `due ls --jsonl / --csv` writes
+#                       (id, name, deadline, complete, parent); only name and deadline are needed
+#   .yaml / .json       a list of tasks, each optionally holding its subtasks in `children`
+#                       (a todo.json-style {"children": [...]} mapping works too)
+#
+# a task whose `parent` is the `id` of an earlier task in the file becomes its subtask; any other
+# task goes directly under the import target. the whole file is read and checked before the
+# tree is touched, every problem is reported at once, and the tree is then saved a single time.
+
+FORMATS = {
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.csv': 'csv',
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.json': 'json',
+}
+
+TRUE_STRINGS = ('true', 'yes', 'y', 'x', '1', 'done')
+
+
+class ImportFileError(ValueError):
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('\n'.join(errors))
+
+
+def file_format(file, fmt=None):
+    if fmt:
+        return fmt
+    try:
+        return FORMATS[Path(file).suffix.lower()]
+    except KeyError:
+        raise ImportFileError([f"can't tell the format of '{file}', use --format"])
+
+
+def read_jsonl(lines):
+    for line in lines:
+        line = line.strip()
+        try:
+            yield json.loads(line) if line else None
+        except ValueError:
+            # reported by validate() along with everything else
+            yield line
+
+
+def read_csv(lines):
+    # the header is line 1
+    yield None
+    yield from csv.DictReader(lines)
+
+
+def read_tree(data):
+    # flattens nested tasks into preorder rows, giving subtasks a parent id when they have none
+    if isinstance(data, dict):
+        data = data.get('children', [])
+    if not isinstance(data, list):
+        raise ImportFileError(["expected a list of tasks"])
+
+    stack = [(task, None) for task in reversed(data)]
+    count = 0
+    while stack:
+        task, parent = stack.pop()
+        if not isinstance(task, dict):
+            yield task
+            continue
+        count += 1
+        row = {k: v for k, v in task.items() if k != 'children'}
+        row.setdefault('id', f'#{count}')
+        if parent is not None:
+            row['parent'] = parent
+        yield row
+        stack.extend((child, row['id']) for child in reversed(task.get('children') or []))
+
+
+def read_rows(file, fmt):
+    # yields task dicts (None for blank lines and the csv header, so line numbers stay right)
+    # stdin is read but left open (through `due serve`, stdin imports run in the client itself,
+    # see server.reads_stdin)
+    try:
+        handle = nullcontext(sys.stdin) if str(file) == '-' else open(file, newline='')
+    except OSError as e:
+        raise ImportFileError([f"can't read '{file}': {e.strerror}"])
+    with handle as handle:
+        if fmt == 'jsonl':
+            yield from read_jsonl(handle)
+        elif fmt == 'csv':
+            yield from read_csv(handle)
+        elif fmt == 'yaml':
+            import yaml
+            try:
+                data = yaml.safe_load(handle)
+            except yaml.YAMLError as e:
+                raise ImportFileError([f"not valid yaml: {e}"])
+            yield from read_tree(data)
+        elif fmt == 'json':
+            try:
+                data = json.load(handle)
+            except ValueError as e:
+                raise ImportFileError([f"not valid json: {e}"])
+            yield from read_tree(data)
+        else:
+            raise ImportFileError([f"unknown import format '{fmt}'"])
+
+
+def parse_complete(value):
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_STRINGS
+    return bool(value)
+
+
+def validate(rows, label='line'):
+    # checks every row, converting deadlines (each distinct string is parsed once). returns
+    # (source id, source parent id, name, deadline, complete) tuples, or raises ImportFileError
+    # listing every bad row
+    errors, tasks = [], []
+    deadlines = {}
+    seen = set()
+    for number, row in enumerate(rows, 1):
+        if row is None:
+            continue
+        where = f"{label} {number}"
+        if not isinstance(row, dict):
+            errors.append(f"{where}: not a task: {row!r}")
+            continue
+
+        name = row.get('name') or row.get('task_name')
+        if not name:
+            errors.append(f"{where}: missing name")
+        elif isinstance(name, (list, dict)):
+            errors.append(f"{where}: not a valid name: {name!r}")
+        else:
+            # e.g. a yaml `name: 123` is read as a number; names are strings everywhere else
+            name = str(name)
+
+        deadline = row.get('deadline')
+        if isinstance(deadline, date):
+            pass
+        elif not isinstance(deadline, Hashable):
+            # e.g. a yaml list or mapping
+            errors.append(f"{where}: not a valid deadline: {deadline!r}. Use YYYY-MM-DD format")
+            deadline = None
+        elif deadline in deadlines:
+            deadline = deadlines[deadline]
+        else:
+            try:
+                deadline = deadlines[deadline] = date.fromisoformat(str(deadline).strip())
+            except ValueError:
+                errors.append(f"{where}: not a valid deadline: {deadline!r}. Use YYYY-MM-DD format")
+                deadline = deadlines[deadline] = None
+
+        task_id = str(row['id']) if row.get('id') not in (None, '') else None
+        parent = str(row['parent']) if row.get('parent') not in (None, '') else None
+        tasks.append((task_id, parent, name, deadline, parse_complete(row.get('complete', False))))
+        if task_id is not None:
+            if task_id in seen:
+                errors.append(f"{where}: duplicate id '{task_id}'")
+            seen.add(task_id)
+
+    # a parent that's in the file has to come before its subtasks
+    listed = set()
+    for task_id, parent, *_ in tasks:
+        if parent in seen and parent not in listed:
+            errors.append(f"task '{task_id}': listed before its parent '{parent}'")
+        listed.add(task_id)
+
+    if errors:
+        raise ImportFileError(errors)
+    return tasks
+
+
+def plan(task_tree, parent_task_id, tasks):
+    # journal-style 'add' entries for the validated tasks, with ids allocated under
+    # parent_task_id the way add_task would
+    new_ids = {}
+    next_ids = {parent_task_id: task_tree.next_id(parent_task_id)}
+    entries = []
+    for task_id, parent, name, deadline, complete in tasks:
+        new_parent = new_ids.get(parent, parent_task_id)
+        new_id = f'{new_parent}.{next_ids.get(new_parent, 0)}'
+        next_ids[new_parent] = next_ids.get(new_parent, 0) + 1
+        if task_id is not None:
+            new_ids[task_id] = new_id
+        entries.append(dict(id=new_id, parent=new_parent, task_name=name, deadline=deadline, complete=complete))
+    return entries
+
+
+def import_file(task_tree, file, parent_task_id='0', fmt=None, dry_run=False):
+    # grafts the tasks in file under parent_task_id and saves the tree once. returns the
+    # 'add' entries that were (or, with dry_run, would be) applied
+    fmt = file_format(file, fmt)
+    label = 'task' if fmt in ('yaml', 'json') else 'line'
+    tasks = validate(read_rows(file, fmt), label)
+    # ids are allocated under the task file's lock, after catching up with other processes
+    with task_tree.locked(parent_task_id):
+        entries = plan(task_tree, parent_task_id, tasks)
+        if not dry_run and entries:
+            task_tree.commit('add', entries)
+    return entries
@@ -0,0 +1,94 @@
+import json
+import os
+from datetime import date
+from pathlib import Path
+
+# append-only log of task tree mutations, kept next to the task file (todo.json -> todo.json.log).
+# each line is one json entry like {"op": "done", "id": "0.1.2"}; every append is fsynced,
+# so a change is durable as soon as add/rm/done/undone returns, without rewriting the task file.
+# TaskTree.load() replays the log on top of the task file, and TaskTree.save() (which
+# TaskTree.compact() calls every COMPACT_AFTER entries) folds it back into the task file.
+
+COMPACT_AFTER = 500
+
+# entry fields holding dates: a task's deadline, and the occurrence of a recurring task marked done/undone
+DATE_FIELDS = ('deadline', 'on')
+
+
+class Journal:
+
+    def __init__(self, task_file:Path):
+        self.task_file = task_file
+        self.file = task_file.with_name(task_file.name + '.log')
+        self.entries = 0
+        # how much of the log this tree has seen: replayed, or written itself. other processes
+        # appending to the same log make it grow past this, see BaseTaskTree.catch_up()
+        self.offset = 0
+        self._handle = None
+
+    def append(self, op, **entry):
+        self.extend(op, [entry])
+
+    def extend(self, op, entries):
+        # appends several entries of the same op with a single write and fsync
+        if self._handle is None:
+            self._handle = self.file.open(mode='ab')
+
+        # dates are written as YYYY-MM-DD strings, same as in the json task file
+        lines = [
+            json.dumps(dict(op=op, **entry), default=lambda d: d.strftime("%Y-%m-%d")).encode('utf-8') + b'\n'
+            for entry in entries
+        ]
+        self._handle.write(b''.join(lines))
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self.entries += len(lines)
+        self.offset = self._handle.tell()
+
+    def size(self):
+        try:
+            return self.file.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def replay(self, start=0):
+        # yields logged entries in order with dates converted back to date objs.
+        # a torn last line (crash mid-append) is dropped and cut off the end of the file.
+        # start is a byte offset to replay from, for catching up with what others appended
+        if not self.file.exists():
+            return
+
+        good_bytes = start
+        with self.file.open(mode='rb') as read_file:
+            read_file.seek(start)
+            for line in read_file:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('incomplete journal entry')
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+
+                good_bytes += len(line)
+                self.offset = good_bytes
+                self.entries += 1
+                for key in DATE_FIELDS:
+                    if entry.get(key, None):
+                        entry[key] = date.fromisoformat(entry[key])
+                yield entry
+
+        if good_bytes < self.file.stat().st_size:
+            os.truncate(self.file, good_bytes)
+
+    def truncate(self):
+        # called once every logged entry is part of the task file
+        self.close()
+        if self.file.exists():
+            os.truncate(self.file, 0)
+        self.entries = 0
+        self.offset = 0
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
@@ -0,0 +1,69 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory locks (windows): processes sharing a task file aren't coordinated
+    fcntl = None
+
+# locks that let several processes (terminals, cron jobs, editor plugins) use one task file.
+# the lock is taken on a file next to the task file (todo.json -> todo.json.lock) rather than
+# on the task file itself, since saving replaces the task file with a new one.
+#
+#   readers hold it shared while they read the task file and its journal, so any number of
+#       them can load at once, but never in the middle of a save
+#   writers hold it exclusively while they catch up with changes other processes made,
+#       apply and journal their own, and (when compacting) rewrite the task file
+#
+# the lock file is never deleted: removing it could let two processes lock different files.
+
+LOCK_SUFFIX = '.lock'
+
+
+def lock_file(task_file:Path) -> Path:
+    return task_file.with_name(task_file.name + LOCK_SUFFIX)
+
+
+class FileLock:
+
+    # a shared or exclusive lock on a task file, reentrant within the process: holding it again
+    # (e.g. mutate() inside add_task()) only counts, since a second flock() on a new descriptor
+    # would wait for the first
+
+    def __init__(self, task_file:Path):
+        self.file = lock_file(task_file)
+        self.handle = None
+        self.depth = 0
+        self.exclusive = False
+
+    @contextmanager
+    def hold(self, shared=False):
+        if fcntl is None:
+            yield self
+            return
+
+        if self.depth == 0:
+            self.handle = os.open(self.file, os.O_RDWR | os.O_CREAT, 0o600)
+        if self.depth == 0 or (not shared and not self.exclusive):
+            # a shared lock is turned into an exclusive one by locking again
+            fcntl.flock(self.handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            upgraded = self.depth > 0
+            self.exclusive = not shared
+        else:
+            upgraded = False
+
+        self.depth += 1
+        try:
+            yield self
+        finally:
+            self.depth -= 1
+            if upgraded:
+                fcntl.flock(self.handle, fcntl.LOCK_SH)
+                self.exclusive = False
+            if self.depth == 0:
+                fcntl.flock(self.handle, fcntl.LOCK_UN)
+                os.close(self.handle)
+                self.handle = None
+                self.exclusive = False
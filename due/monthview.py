@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+from functools import lru_cache
+
+# month calendars for `due today / tomorrow / week`, laid out like calendar.TextCalendar with
+# two-character day cells. a day's row and column follow from the weekday of the 1st, so
+# highlighting a day or a week is a matter of wrapping the right cells in markup; nothing is
+# searched for in the rendered text. layouts are cached per (year, month, firstweekday).
+#
+#       October 2026
+#   Su Mo Tu We Th Fr Sa
+#                1  2  3
+#    4  5  6  7  8  9 10
+
+FIRSTWEEKDAY = 6  # weeks start on sunday
+CELL_WIDTH = 3  # two digits and a space
+MONTH_WIDTH = 7 * CELL_WIDTH - 1
+MONTH_GAP = '    '
+
+# background for days with tasks due, from fewest to most tasks (relative to the busiest day shown)
+HEAT_STYLES = ('on #1E3A1E', 'on #2B5E2B', 'on #3A863A', 'on #4CAF4C')
+
+
+class MonthLayout:
+
+    def __init__(self, year, month, firstweekday=FIRSTWEEKDAY):
+        # calendar (and the locale module it imports) only when a calendar is shown
+        import calendar
+
+        self.year, self.month = year, month
+        self.offset = (calendar.weekday(year, month, 1) - firstweekday) % 7
+        self.length = calendar.monthrange(year, month)[1]
+
+        title = f"{calendar.month_name[month]} {year}".center(MONTH_WIDTH).rstrip()
+        header = ' '.join(calendar.day_abbr[(firstweekday + i) % 7][:2] for i in range(7))
+        self.header = [title, header]
+
+        # cells[row][column] is a day of the month, or 0 before the 1st and after the last day
+        self.cells = [[0] * 7 for _ in range((self.offset + self.length + 6) // 7)]
+        for day in range(1, self.length + 1):
+            row, column = self.position(day)
+            self.cells[row][column] = day
+
+    def position(self, day):
+        # (week row, column) of a day of the month
+        return divmod(self.offset + day - 1, 7)
+
+    def dates(self):
+        first = date(self.year, self.month, 1)
+        return first, first + timedelta(days=self.length - 1)
+
+    def lines(self, days=(), weeks=(), heat=None):
+        # the month as markup lines: cells of `days` reversed, rows holding any of `weeks`
+        # reversed, and days in `heat` ({day: style}) given a background. yields
+        # (markup, visible width) pairs
+        for line in self.header:
+            yield line, len(line)
+
+        week_rows = {self.position(day)[0] for day in weeks}
+        for row, cells in enumerate(self.cells):
+            # rows are right-stripped like TextCalendar's, so drop the empty cells at the end
+            used = 7
+            while cells[used - 1] == 0:
+                used -= 1
+
+            markup = []
+            for day in cells[:used]:
+                text = f'{day:2}' if day else '  '
+                if day in days:
+                    text = f'[reverse]{text}[/reverse]'
+                if heat and day in heat:
+                    text = f'[{heat[day]}]{text}[/]'
+                markup.append(text)
+
+            line = ' '.join(markup)
+            if row in week_rows:
+                line = f'[reverse]{line}[/reverse]'
+            yield line, used * CELL_WIDTH - 1
+
+
+@lru_cache(maxsize=None)
+def layout(year, month, firstweekday=FIRSTWEEKDAY):
+    return MonthLayout(year, month, firstweekday)
+
+
+def months(first, count):
+    # (year, month) of `count` consecutive months, starting with the month of `first`
+    year, month = first.year, first.month
+    for _ in range(count):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def span(first, count):
+    # first and last date shown by render(first, count)
+    shown = [layout(year, month) for year, month in months(first, count)]
+    return shown[0].dates()[0], shown[-1].dates()[1]
+
+
+def heat_levels(counts):
+    # {date: style} from {date: number of tasks}, scaled to the busiest day
+    busiest = max(counts.values(), default=0)
+    levels = len(HEAT_STYLES)
+    return {
+        day: HEAT_STYLES[min(levels - 1, (count * levels - 1) // busiest)]
+        for day, count in counts.items() if count
+    }
+
+
+def week(day, firstweekday=FIRSTWEEKDAY):
+    # the seven dates of the week holding day
+    start = day - timedelta(days=(day.weekday() - firstweekday) % 7)
+    return [start + timedelta(days=i) for i in range(7)]
+
+
+def render(first, count=1, days=(), weeks=(), counts=None, firstweekday=FIRSTWEEKDAY):
+    # markup for `count` months side by side, starting with the month of `first`. days are
+    # highlighted, as are the week rows holding any date in weeks; counts ({date: number of
+    # tasks}) shades each day by how many tasks are due on it
+    heat = heat_levels(counts) if counts else {}
+
+    columns = []
+    for year, month in months(first, count):
+        month_days = lambda dates: {d.day for d in dates if (d.year, d.month) == (year, month)}
+        month_heat = {d.day: style for d, style in heat.items() if (d.year, d.month) == (year, month)}
+        columns.append(list(layout(year, month, firstweekday).lines(
+            month_days(days), month_days(weeks), month_heat,
+        )))
+
+    height = max(len(column) for column in columns)
+    lines = []
+    for i in range(height):
+        parts = []
+        for n, column in enumerate(columns):
+            markup, width = column[i] if i < len(column) else ('', 0)
+            last = n == len(columns) - 1
+            parts.append(markup if last else markup + ' ' * (MONTH_WIDTH - width) + MONTH_GAP)
+        lines.append(''.join(parts).rstrip(' '))
+    return '\n'.join(lines) + '\n'
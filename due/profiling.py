@@ -0,0 +1,113 @@
+import sys
+import time
+from contextlib import contextmanager
+
+# per-phase timing for `due --profile <command>`. the code that loads, filters, renders and
+# saves wraps itself in `with profiling.phase('load'):`, which does nothing unless a profile is
+# running. each phase records its wall time and the net change in allocated memory blocks
+# (sys.getallocatedblocks), excluding any phase nested inside it: config parsed while loading
+# the task tree counts as 'config', not 'load'.
+#
+#   due --profile week                      breakdown on stderr
+#   due --profile-json week.json week       breakdown as JSON
+#   due --cprofile week.prof week           cProfile dump, for `python -m pstats week.prof`
+
+PHASES = ('import', 'config', 'load', 'filter', 'calendar', 'render', 'save')
+
+# the running Profile, if any
+ACTIVE = None
+
+
+class Profile:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.blocks = sys.getallocatedblocks()
+        # name: [seconds, blocks, calls]
+        self.phases = {}
+        # [name, start, blocks at start, seconds of nested phases, blocks of nested phases]
+        self.stack = []
+        self.total = None
+
+    def record(self, name, seconds, blocks, calls=1):
+        stats = self.phases.setdefault(name, [0.0, 0, 0])
+        stats[0] += seconds
+        stats[1] += blocks
+        stats[2] += calls
+
+    def enter(self, name):
+        self.stack.append([name, time.perf_counter(), sys.getallocatedblocks(), 0.0, 0])
+
+    def exit(self):
+        name, start, blocks, nested_seconds, nested_blocks = self.stack.pop()
+        seconds = time.perf_counter() - start
+        blocks = sys.getallocatedblocks() - blocks
+        # a phase nested in one of the same name (loading the tree imports its backend, then
+        # reads the file) is counted as part of the same call
+        calls = 0 if self.stack and self.stack[-1][0] == name else 1
+        self.record(name, seconds - nested_seconds, blocks - nested_blocks, calls)
+        if self.stack:
+            self.stack[-1][3] += seconds
+            self.stack[-1][4] += blocks
+
+    def stop(self):
+        seconds = time.perf_counter() - self.started
+        blocks = sys.getallocatedblocks() - self.blocks
+        # whatever ran outside of a phase (argument parsing, the command itself)
+        measured = [stats for name, stats in self.phases.items() if name != 'import']
+        self.record('other', seconds - sum(s[0] for s in measured), blocks - sum(s[1] for s in measured))
+        imported = self.phases.get('import', [0.0, 0, 0])
+        self.total = (seconds + imported[0], blocks + imported[1])
+
+    def results(self):
+        # {phase: {'seconds', 'blocks', 'calls'}}, in PHASES order
+        order = {name: i for i, name in enumerate(PHASES)}
+        names = sorted(self.phases, key=lambda name: order.get(name, len(PHASES)))
+        results = {
+            name: dict(zip(('seconds', 'blocks', 'calls'), self.phases[name]))
+            for name in names
+        }
+        results['total'] = {'seconds': self.total[0], 'blocks': self.total[1], 'calls': 1}
+        return results
+
+    def format(self):
+        lines = [f"{'phase':<10}{'ms':>10}{'blocks':>12}{'calls':>7}"]
+        for name, stats in self.results().items():
+            lines.append(f"{name:<10}{stats['seconds'] * 1000:>10.1f}{stats['blocks']:>+12,}{stats['calls']:>7}")
+        return '\n'.join(lines)
+
+
+def start():
+    global ACTIVE
+    ACTIVE = Profile()
+    return ACTIVE
+
+
+def stop():
+    global ACTIVE
+    profile, ACTIVE = ACTIVE, None
+    profile.stop()
+    return profile
+
+
+@contextmanager
+def phase(name):
+    profile = ACTIVE
+    if profile is None:
+        yield
+        return
+    profile.enter(name)
+    try:
+        yield
+    finally:
+        profile.exit()
+
+
+def report(profile, json_file=None):
+    # the breakdown goes to stderr, so it doesn't mix with the command's output
+    if json_file:
+        import json
+        with open(json_file, 'w') as write_file:
+            json.dump(profile.results(), write_file, indent=4)
+    else:
+        print(profile.format(), file=sys.stderr)
@@ -0,0 +1,299 @@
+import due
+from due import profiling, recurrence
+from due.basetree import BaseTaskTree
+
+# a deadline range is looked up in the deadline index when it matches at most 1/INDEX_FRACTION
+# of the tree; otherwise a traversal is cheaper than walking up from every match
+INDEX_FRACTION = 4
+
+# how a promote-aware completion filter treats tasks that fail it but have kept subtasks
+PROMOTE_MODES = ('prune', 'context', 'lift')
+
+
+class TaskQuery:
+
+    # collects the filters `due ls` applies and evaluates them together, instead of chaining
+    # TaskTree.depth_limit(...).due_by(...).completed(...) where every step scans all tasks and
+    # wraps the previous view in another one.
+    #
+    #   TaskQuery('0.2').depth_limit(2).due_by(TODAY).completed(False).run(TASK_TREE)
+    #
+    # there are two kinds of filters:
+    #   depth, completion and id prefix are pruning filters: a task that fails one is dropped
+    #       along with all of its subtasks (as with the chained TaskTree filters)
+    #   deadline and name are matching filters: a task is kept if it matches, or if any of its
+    #       subtasks is kept, so matches stay connected to the root (as with TaskTree.due_by)
+    #
+    # completion can also be promote-aware (see promote()), so that e.g. finished subtasks of an
+    # unfinished milestone still show up with --done. it then acts like a matching filter, and a
+    # task that fails it but has subtasks that are kept is either
+    #   'context': kept, and listed in the result's `context` set so it can be shown dimmed
+    #   'lift':    dropped, with its kept subtasks moved up to take its place
+    #
+    # a recurring task is checked as of its first open occurrence in the deadline range (see
+    # recurrence.py); the result's `occurrences` hold those, so the view shows their dates
+
+    def __init__(self, root_id='0'):
+        self.root_id = root_id
+        self.max_depth = None
+        self.start = None
+        self.end = None
+        self.completion_status = None
+        self.name = None
+        self.prefix = None
+        self.promote_mode = 'prune'
+        self.occurrences = {}
+        # number of tasks in the last result
+        self.matched = 0
+
+    def depth_limit(self, depth):
+        self.max_depth = depth
+        return self
+
+    def due_between(self, start, end):
+        self.start, self.end = start, end
+        return self
+
+    def due_by(self, deadline):
+        return self.due_between(None, deadline or None)
+
+    def completed(self, completion_status):
+        self.completion_status = completion_status
+        return self
+
+    def promote(self, mode):
+        # how tasks failing the completion filter are handled: 'prune', 'context' or 'lift'
+        if mode not in PROMOTE_MODES:
+            raise ValueError(f"Unknown promote mode: '{mode}'")
+        self.promote_mode = mode
+        return self
+
+    def name_contains(self, text):
+        self.name = text.lower() if text else None
+        return self
+
+    def id_prefix(self, prefix):
+        self.prefix = prefix
+        return self
+
+    def has_deadline_range(self):
+        return self.start is not None or self.end is not None
+
+    def key(self):
+        # everything the result depends on besides the tree itself
+        return (
+            self.root_id, self.max_depth, self.start, self.end, self.completion_status,
+            self.name, self.prefix, self.promote_mode,
+        )
+
+    def promotes(self):
+        # whether completion is checked on the way up (promote-aware) rather than on the way down
+        return self.completion_status is not None and self.promote_mode != 'prune'
+
+    def _passes_id(self, task_id):
+        # the pruning filters that only need the task id (the root task is never pruned)
+        if task_id == self.root_id:
+            return True
+        if self.max_depth is not None and task_id.count('.') > self.max_depth:
+            return False
+        if self.prefix is not None:
+            # keep tasks inside the prefix and the ancestors leading to it
+            inside = task_id == self.prefix or task_id.startswith(self.prefix + '.')
+            if not inside and not self.prefix.startswith(task_id + '.'):
+                return False
+        return True
+
+    def _passes(self, task_id, data):
+        # the pruning filter on the task's attributes
+        if self.completion_status is None or task_id == self.root_id or self.promotes():
+            return True
+        return self._completes(data)
+
+    def _completes(self, data):
+        return data.get('complete') == self.completion_status
+
+    def _data(self, task_tree, task_id):
+        # a task's attributes, recurring tasks expanded to their occurrence in the range
+        data = task_tree.task(task_id)
+        if 'repeat' in data:
+            data = self.occurrences[task_id] = recurrence.expand(data, self.start, self.end)
+        return data
+
+    def _matches(self, task_id, data):
+        # the matching filters (ancestors of the id prefix are only kept to connect what's inside it)
+        if self.prefix is not None and self.prefix.startswith(task_id + '.'):
+            return False
+        deadline = data.get('deadline')
+        if self.start is not None and (deadline is None or deadline < self.start):
+            return False
+        if self.end is not None and (deadline is None or deadline > self.end):
+            return False
+        if self.name is not None and self.name not in data.get('task_name', '').lower():
+            return False
+        return True
+
+    def run(self, task_tree):
+        # returns a view of task_tree holding the tasks under root_id that pass the query.
+        # results for a full tree are cached by (query, tree version, TODAY), see viewcache.py;
+        # views are never changed once built, so a cached one can be handed out again
+        with profiling.phase('filter'):
+            base = task_tree.base
+            base.require_query(self)
+            if task_tree is not base:
+                return self._run(task_tree)
+
+            key = (self.key(), base.version, due.TODAY)
+            cached = base.view_cache.views.get(key)
+            if cached is not None:
+                view, self.matched = cached
+                return view
+            view = self._run(task_tree)
+            base.view_cache.views.put(key, (view, self.matched), self.matched)
+            return view
+
+    def _run(self, task_tree):
+        # a deadline range is answered from the deadline index unless it matches so much of the
+        # tree (e.g. `due_by` over years of finished tasks) that one traversal is cheaper
+        self.occurrences = {}
+        # promote-aware completion needs every ancestor's verdict, so it always traverses
+        use_index = False
+        if self.has_deadline_range() and not self.promotes():
+            index = task_tree.deadline_index()
+            use_index = index.count(self.start, self.end) <= len(task_tree.base) // INDEX_FRACTION
+
+        if use_index:
+            selected = self._run_indexed(task_tree)
+        else:
+            selected, context, lifted = self._run_traversal(task_tree)
+            if lifted is not None:
+                view = LiftedView(task_tree, self.root_id, lifted)
+                view.occurrences = self.occurrences
+                self.matched = len(view)
+                return view
+        selected.add(self.root_id)
+        self.matched = len(selected)
+        view = task_tree._select(selected)
+        if not use_index:
+            view.context = context
+        view.occurrences = self.occurrences
+        return view
+
+    def _run_indexed(self, task_tree):
+        # candidates come straight from the deadline index; each one is checked against the
+        # pruning filters on the way up to root_id, remembering which ancestors passed, so the
+        # work is proportional to the matches rather than to the tree
+        passed = {self.root_id: True}
+        selected = set()
+        index = task_tree.deadline_index()
+        for task_id in index.between(self.start, self.end) + list(index.recurring):
+            if task_id not in task_tree or not self._matches(task_id, self._data(task_tree, task_id)):
+                continue
+
+            chain, node = [], task_id
+            while node is not None and node not in passed:
+                chain.append(node)
+                if node in task_tree and self._passes_id(node) and self._passes(node, self._data(task_tree, node)):
+                    node = task_tree.parent(node)
+                else:
+                    node = None
+
+            ok = node is not None and passed[node]
+            for link in chain:
+                passed[link] = ok
+            if ok:
+                selected.update(chain)
+        return selected
+
+    def _run_traversal(self, task_tree):
+        # one depth-first pass from root_id. pruning filters are checked on the way down, so a
+        # failing subtree is never entered, and nothing below max_depth is even listed. with
+        # matching filters, matches are propagated to their ancestors on the way back up.
+        # returns the selected tasks, the context tasks among them, and (for 'lift') the kept
+        # subtasks of every kept task, built on the way up as well
+        promotes = self.promotes()
+        lift = promotes and self.promote_mode == 'lift'
+        matching = self.has_deadline_range() or self.name is not None or promotes
+        need_data = matching or self.completion_status is not None
+        selected, context = set(), set()
+        # for 'lift': kept subtasks of kept tasks, and the tasks a dropped task hands up to its parent
+        lifted, handed_up = {}, {}
+        stack = [(self.root_id, self.root_id.count('.'), None, False)]
+        while stack:
+            node, depth, data, visited = stack.pop()
+            if visited:
+                is_root = node == self.root_id
+                matched = not is_root and self._matches(node, data) and (not promotes or self._completes(data))
+                if node in selected or matched:
+                    selected.add(node)
+                    if not is_root:
+                        selected.add(task_tree.parent(node))
+                    if promotes and not is_root and not self._completes(data):
+                        context.add(node)
+                if lift and node in selected:
+                    kept = [
+                        task for child in task_tree.children(node) if child in selected
+                        for task in handed_up.pop(child, (child,))
+                    ]
+                    if node in context:
+                        handed_up[node] = kept
+                    else:
+                        lifted[node] = kept
+                continue
+
+            if matching:
+                stack.append((node, depth, data, True))
+            else:
+                selected.add(node)
+
+            if self.max_depth is None or depth < self.max_depth:
+                for child in task_tree.children(node):
+                    if not self._passes_id(child):
+                        continue
+                    child_data = self._data(task_tree, child) if need_data else None
+                    if self._passes(child, child_data):
+                        stack.append((child, depth + 1, child_data, False))
+        return selected, context, (lifted if lift else None)
+
+
+class LiftedView(BaseTaskTree):
+
+    # result of a 'lift' query: the kept tasks of task_tree, each listed under its nearest kept
+    # ancestor. the parent/children links come from the query rather than from the tree, so
+    # this is a view class of its own instead of a backend's _select()
+
+    def __init__(self, task_tree, root_id, children):
+        super().__init__()
+        self.base = task_tree.base
+        self._children = children
+        self._parents = {child: node for node, kept in children.items() for child in kept}
+        self._parents.setdefault(root_id, task_tree.base.parent(root_id))
+        self._children.setdefault(root_id, [])
+
+    def __contains__(self, task_id):
+        return task_id in self._children
+
+    def __len__(self):
+        return len(self._children)
+
+    def task(self, task_id):
+        return self.base.task(task_id)
+
+    def children(self, task_id):
+        return iter(self._children[task_id])
+
+    def parent(self, task_id):
+        return self._parents[task_id]
+
+    def nodes(self):
+        return ((task_id, self.task(task_id)) for task_id in self._children)
+
+    def _select(self, task_ids):
+        # tasks whose parent isn't selected are dropped along with their subtasks, as with
+        # the backends' views
+        task_ids = set(task_ids)
+        children = {
+            node: [child for child in kept if child in task_ids]
+            for node, kept in self._children.items() if node in task_ids
+        }
+        root_id = next(node for node in children if self._parents[node] not in children)
+        return LiftedView(self, root_id, children)
@@ -0,0 +1,285 @@
+import calendar
+from datetime import date, timedelta
+from functools import lru_cache
+
+# recurring tasks. a recurring task is a single task whose attributes hold its rule, and only
+# the occurrences a view asks about are ever worked out:
+#
+#   deadline        first occurrence
+#   repeat          the rule, see parse()
+#   until           last day an occurrence may fall on (YYYY-MM-DD), optional
+#   done_through    every occurrence up to this day is done (YYYY-MM-DD), optional
+#   done_dates      done occurrences after done_through, usually empty (YYYY-MM-DD list)
+#
+# completing the earliest open occurrence just moves done_through forward, so completion state
+# stays a couple of attributes however long the task has been repeating.
+#
+#   due add 0.1 'water plants' 2026-10-18 --repeat weekly:-m-w-f- --until 2026-12-31
+
+WEEKDAY_LETTERS = 'smtwtfs'  # sunday first, as in the calendar
+DAY = timedelta(days=1)
+
+# a cron rule is looked for this far ahead before giving up
+CRON_HORIZON_YEARS = 8
+
+
+class RuleError(ValueError):
+    pass
+
+
+class Rule:
+
+    # next(first, day) is the first occurrence on or after day of a series starting at first
+
+    def __init__(self, text):
+        self.text = text
+
+    def next(self, first, day):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.text!r})"
+
+
+class Daily(Rule):
+
+    def next(self, first, day):
+        return max(first, day)
+
+
+class Weekly(Rule):
+
+    def __init__(self, text, weekdays=None):
+        # weekdays: set of date.weekday() numbers, None for the weekday of the first occurrence
+        super().__init__(text)
+        self.weekdays = weekdays
+
+    def next(self, first, day):
+        day = max(first, day)
+        weekdays = self.weekdays or {first.weekday()}
+        for ahead in range(7):
+            if (day.weekday() + ahead) % 7 in weekdays:
+                return day + timedelta(days=ahead)
+
+
+class Monthly(Rule):
+
+    def next(self, first, day):
+        day = max(first, day)
+        year, month = day.year, day.month
+        while True:
+            # the 31st falls on the last day of shorter months
+            candidate = date(year, month, min(first.day, calendar.monthrange(year, month)[1]))
+            if candidate >= day:
+                return candidate
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class Yearly(Rule):
+
+    def next(self, first, day):
+        day = max(first, day)
+        for year in (day.year, day.year + 1):
+            # february 29th falls on the 28th in other years
+            candidate = date(year, first.month, min(first.day, calendar.monthrange(year, first.month)[1]))
+            if candidate >= day:
+                return candidate
+
+
+class Cron(Rule):
+
+    # the day fields of a crontab line: day of month, month and day of week (0 or 7 = sunday).
+    # as in cron, when both day fields are restricted a day matching either one counts
+
+    def __init__(self, text, days, months, weekdays, any_day, any_weekday):
+        super().__init__(text)
+        self.days, self.months, self.weekdays = days, months, weekdays
+        self.any_day, self.any_weekday = any_day, any_weekday
+
+    def matches(self, day):
+        in_month = day.day in self.days
+        on_weekday = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and on_weekday
+        return in_month or on_weekday
+
+    def next(self, first, day):
+        day = max(first, day)
+        horizon = date(min(day.year + CRON_HORIZON_YEARS, date.max.year), 12, 31)
+        while day <= horizon:
+            if day.month not in self.months:
+                # skip to the 1st of the next month
+                day = date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+                continue
+            if self.matches(day):
+                return day
+            day += DAY
+        return None
+
+
+def cron_field(text, low, high):
+    # values of one crontab field: *, numbers, ranges a-b and steps */n or a-b/n, comma separated
+    values = set()
+    for part in text.split(','):
+        part, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(n) for n in part.split('-', 1))
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(part)
+        values.update(range(start, end + 1, step))
+    return values
+
+
+@lru_cache(maxsize=None)
+def parse(text):
+    # daily | weekly | weekly:smtwtfs | monthly | yearly | cron:<crontab fields>
+    #   weekly:smtwtfs  one position per day from sunday to saturday, a letter for days the task
+    #                   repeats on and '-' for the others: weekly:-m-w-f- is mon, wed and fri
+    #   cron            'dom month dow', or a full 'min hour dom month dow' line (only days count)
+    kind, _, argument = text.strip().partition(':')
+    kind = kind.lower()
+    if kind == 'daily' and not argument:
+        return Daily(text)
+    if kind == 'monthly' and not argument:
+        return Monthly(text)
+    if kind == 'yearly' and not argument:
+        return Yearly(text)
+    if kind == 'weekly':
+        if not argument:
+            return Weekly(text)
+        mask = argument.lower()
+        if len(mask) != 7 or any(c not in (letter, '-') for c, letter in zip(mask, WEEKDAY_LETTERS)) or mask == '-' * 7:
+            raise RuleError(f"Not a valid weekly rule: '{text}'. Use weekly:smtwtfs with '-' for days off, e.g. weekly:-m-w-f-")
+        # position 0 is sunday, date.weekday() 6
+        return Weekly(text, {(i - 1) % 7 for i, c in enumerate(mask) if c != '-'})
+    if kind == 'cron':
+        fields = argument.split()
+        if len(fields) == 5:
+            fields = fields[2:]
+        try:
+            if len(fields) != 3:
+                raise ValueError(argument)
+            days, months, weekdays = fields
+            weekday_values = {n % 7 for n in cron_field(weekdays, 0, 7)}
+            return Cron(
+                text, cron_field(days, 1, 31), cron_field(months, 1, 12), weekday_values,
+                days == '*', weekdays == '*',
+            )
+        except ValueError:
+            raise RuleError(f"Not a valid cron rule: '{text}'. Use cron:'dom month dow', e.g. cron:'1,15 * *'")
+    raise RuleError(f"Not a valid repeat rule: '{text}'. Use daily, weekly, weekly:smtwtfs, monthly, yearly or cron:'dom month dow'")
+
+
+def to_date(text):
+    return date.fromisoformat(text) if text else None
+
+
+def is_recurring(attrs):
+    return 'repeat' in attrs
+
+
+def next_open(attrs, day=None):
+    # the first occurrence on or after day (default: the start of the series) that isn't done,
+    # or None if there are no more
+    rule, first = parse(attrs['repeat']), attrs['deadline']
+    until = to_date(attrs.get('until'))
+    done_through = to_date(attrs.get('done_through'))
+    done = attrs.get('done_dates') or ()
+
+    day = max(day or first, first)
+    if done_through is not None and day <= done_through:
+        day = done_through + DAY
+    occurrence = rule.next(first, day)
+    while occurrence is not None and occurrence.isoformat() in done:
+        occurrence = rule.next(first, occurrence + DAY)
+    if occurrence is None or (until is not None and occurrence > until):
+        return None
+    return occurrence
+
+
+def expand(attrs, start=None, end=None):
+    # a recurring task's attributes as of its first open occurrence from start on (from the
+    # start of the series if start is None): that occurrence becomes the deadline. when all
+    # occurrences are done the task counts as complete. `end` is accepted for symmetry with the
+    # query window; an occurrence past it simply won't match
+    occurrence = next_open(attrs, start)
+    if occurrence is None:
+        return dict(attrs, complete=True)
+    return dict(attrs, deadline=occurrence, complete=attrs.get('complete', False))
+
+
+def occurrences(attrs, start, end, open_only=True):
+    # occurrences from start to end (inclusive), worked out one at a time
+    rule, first = parse(attrs['repeat']), attrs['deadline']
+    until = to_date(attrs.get('until'))
+    if until is not None and until < end:
+        end = until
+    occurrence = next_open(attrs, start) if open_only else rule.next(first, start)
+    while occurrence is not None and occurrence <= end:
+        yield occurrence
+        if open_only:
+            occurrence = next_open(attrs, occurrence + DAY)
+        else:
+            occurrence = rule.next(first, occurrence + DAY)
+
+
+def mark_done(attrs, on):
+    # attribute updates recording that the occurrence on `on` is done. done dates right after
+    # done_through are folded into it, so the list only holds out-of-order completions
+    done = set(attrs.get('done_dates') or ())
+    done.add(on.isoformat())
+    updated = dict(attrs, done_dates=sorted(done))
+    done_through = to_date(attrs.get('done_through'))
+
+    following = next_open(dict(updated, done_dates=()), None)
+    while following is not None and following.isoformat() in done:
+        done.discard(following.isoformat())
+        done_through = following
+        following = next_open(dict(updated, done_through=done_through.isoformat(), done_dates=()), None)
+
+    changes = {'done_dates': sorted(done)}
+    if done_through is not None:
+        changes['done_through'] = done_through.isoformat()
+    return changes
+
+
+def mark_undone(attrs, on):
+    # attribute updates recording that the occurrence on `on` is not done
+    done = set(attrs.get('done_dates') or ())
+    done_through = to_date(attrs.get('done_through'))
+    if done_through is not None and on <= done_through:
+        # occurrences after `on` that were covered by done_through are listed one by one instead
+        rule, first = parse(attrs['repeat']), attrs['deadline']
+        occurrence = rule.next(first, on + DAY)
+        while occurrence is not None and occurrence <= done_through:
+            done.add(occurrence.isoformat())
+            occurrence = rule.next(first, occurrence + DAY)
+        done_through = on - DAY
+    done.discard(on.isoformat())
+
+    changes = {'done_dates': sorted(done)}
+    changes['done_through'] = done_through.isoformat() if done_through is not None else None
+    return changes
+
+
+def last_done(attrs):
+    # the latest done occurrence, or None
+    dates = [to_date(d) for d in attrs.get('done_dates') or ()]
+    done_through = to_date(attrs.get('done_through'))
+    if done_through is not None:
+        # done_through may be a day between occurrences; find the occurrence on or before it
+        # (a year and a bit back covers every rule but a sparse cron one)
+        rule, first = parse(attrs['repeat']), attrs['deadline']
+        latest = None
+        occurrence = rule.next(first, max(first, done_through - timedelta(days=400)))
+        while occurrence is not None and occurrence <= done_through:
+            latest = occurrence
+            occurrence = rule.next(first, occurrence + DAY)
+        if latest is not None:
+            dates.append(latest)
+    return max(dates, default=None)
@@ -0,0 +1,371 @@
+import heapq
+import json
+import math
+import os
+import re
+from pathlib import Path
+
+from due import journal, shards, storage
+
+# full-text search over task names for `due find`. names are split into lowercase word tokens;
+# an inverted index maps each token to the tasks whose names hold it, and a prefix trie over the
+# tokens finds every token starting with a partial word. a query's words must all match (each
+# one exactly or as a prefix), and matches are ranked by how rare the words they matched are.
+#
+# the tree keeps its index up to date as tasks are added and deleted (see BaseTaskTree.apply).
+# it's also saved next to the task file (todo.json -> todo.json.search), along with the stamp of
+# the task file it was built for; a later process loads it and replays the journal on top
+# instead of tokenizing every task again. saves of the task file rewrite it.
+#
+# saved from a whole tree, it comes with a copy of every task's record (todo.json.search.docs,
+# one json line each, at offsets the index lists). `due find` then answers without loading the
+# task file: it ranks the matches from the index and reads just the records of the best ones and
+# their ancestors into a small tree, replaying the journal over it (see find_saved).
+#
+#   due find 'groc list'        tasks with a word starting with 'groc' and one starting with 'list'
+
+INDEX_SUFFIX = '.search'
+DOCS_SUFFIX = '.docs'
+FORMAT_VERSION = 1
+
+# an exact word scores higher than a word the query only starts
+EXACT_WEIGHT, PREFIX_WEIGHT = 1.0, 0.6
+
+TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def index_file(task_file:Path) -> Path:
+    return task_file.with_name(task_file.name + INDEX_SUFFIX)
+
+
+def numeric(task_id):
+    return [int(n) for n in task_id.split('.')]
+
+
+class Trie:
+
+    # the distinct tokens of the index, one node per character. each node is a dict of child
+    # nodes by character; a node that ends a token holds it under the key None
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, token):
+        node = self.root
+        for char in token:
+            node = node.setdefault(char, {})
+        node[None] = token
+
+    def remove(self, token):
+        # drops the token, and the nodes only it was using
+        path, node = [], self.root
+        for char in token:
+            path.append((node, char))
+            node = node.get(char)
+            if node is None:
+                return
+        node.pop(None, None)
+        for parent, char in reversed(path):
+            if parent[char]:
+                break
+            del parent[char]
+
+    def starting_with(self, prefix):
+        # every token starting with prefix
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        tokens, stack = [], [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is None:
+                    tokens.append(child)
+                else:
+                    stack.append(child)
+        return tokens
+
+
+class SearchIndex:
+
+    def __init__(self):
+        self.postings = {}  # token: task ids (a list as loaded, a set once changed)
+        self._tokens = None # task id: tokens of its name, only needed for changes
+        self.count = 0      # number of tasks
+        self.trie = Trie()
+        self.offsets = None # task id: offset of its record in the docs file, if saved with one
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def tokens(self):
+        # the postings turned around, worked out on the first change rather than on load
+        if self._tokens is None:
+            self._tokens = {}
+            for token, ids in self.postings.items():
+                for task_id in ids:
+                    self._tokens.setdefault(task_id, set()).add(token)
+        return self._tokens
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        # nodes is an iterable of (task_id, attrs), as from TaskTree.nodes()
+        index = cls()
+        for task_id, data in nodes:
+            if 'task_name' in data:
+                index.add(task_id, data['task_name'])
+        return index
+
+    def add(self, task_id, name):
+        if task_id in self.tokens:
+            self.remove(task_id)
+        tokens = set(tokenize(name))
+        self.tokens[task_id] = tokens
+        self.count += 1
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                self.trie.add(token)
+            elif not isinstance(ids, set):
+                ids = self.postings[token] = set(ids)
+            ids.add(task_id)
+
+    def remove(self, task_id):
+        if task_id not in self.tokens:
+            return
+        self.count -= 1
+        for token in self.tokens.pop(task_id):
+            ids = self.postings[token]
+            if not isinstance(ids, set):
+                ids = self.postings[token] = set(ids)
+            ids.discard(task_id)
+            if not ids:
+                del self.postings[token]
+                self.trie.remove(token)
+
+    def apply(self, entry):
+        # a journal entry, as replayed by load()
+        if entry['op'] == 'add':
+            self.add(entry['id'], entry['task_name'])
+        elif entry['op'] == 'rm':
+            prefix = entry['id'] + '.'
+            for task_id in [t for t in self.tokens if t == entry['id'] or t.startswith(prefix)]:
+                self.remove(task_id)
+
+    def search(self, query):
+        # {task_id: score} of the tasks matching every word of the query
+        return search_indexes([('0', self)], query)
+
+    def save(self, file:Path, stamp, task_tree=None):
+        # written like the task file: to a temporary file that then replaces the old one. with
+        # the whole task_tree (every shard read), the docs file is written first
+        self.offsets = None
+        if task_tree is not None and (task_tree.shards is None or not task_tree.shards.unloaded):
+            self.offsets = write_docs(docs_file(file), task_tree, stamp)
+        temp_file = file.with_name(f'.{file.name}.{os.getpid()}.tmp')
+        with temp_file.open(mode='w') as write_file:
+            json.dump({
+                'version': FORMAT_VERSION,
+                'stamp': list(stamp) if stamp else None,
+                'count': self.count,
+                'postings': {token: sorted(ids) for token, ids in self.postings.items()},
+                'offsets': self.offsets,
+            }, write_file, separators=(',', ':'))
+        os.replace(temp_file, file)
+
+    @classmethod
+    def load(cls, file:Path, stamp):
+        # the saved index, if it was built for this version (stamp) of the task file; else None
+        try:
+            with file.open(mode='r') as read_file:
+                data = json.load(read_file)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != FORMAT_VERSION or data.get('stamp') != (list(stamp) if stamp else None):
+            return None
+
+        index = cls()
+        index.postings = data['postings']
+        index.count = data['count']
+        index.offsets = data.get('offsets')
+        for token in index.postings:
+            index.trie.add(token)
+        return index
+
+
+def search_indexes(parts, query):
+    # {task_id: score} of the tasks matching every word of the query in any of several indexes,
+    # scored as one: [(prefix, SearchIndex)], the ids of each under its prefix ('0.1' turns the
+    # index's '0.3' into '0.1.3'; '0' leaves them as they are)
+    scores = None
+    total = max(sum(index.count for _, index in parts), 1)
+    for word in dict.fromkeys(tokenize(query)):
+        # tasks holding each token starting with the word, over all the indexes
+        postings = {}
+        for prefix, index in parts:
+            for token in index.trie.starting_with(word):
+                postings.setdefault(token, []).append((prefix, index.postings[token]))
+        # best score of this word for every task it matches
+        word_scores = {}
+        for token, found in postings.items():
+            weight = (EXACT_WEIGHT if token == word else PREFIX_WEIGHT) * math.log(1 + total / sum(len(ids) for _, ids in found))
+            for prefix, ids in found:
+                for task_id in ids:
+                    if prefix != '0':
+                        task_id = prefix + task_id[1:]
+                    if word_scores.get(task_id, 0) < weight:
+                        word_scores[task_id] = weight
+        if scores is None:
+            scores = word_scores
+        else:
+            scores = {task_id: score + word_scores[task_id] for task_id, score in scores.items() if task_id in word_scores}
+        if not scores:
+            break
+    return scores or {}
+
+
+class MountedIndex:
+
+    # the search index of a workspace (see workspace.py): the saved indexes of its files,
+    # searched together. each file's tree keeps its own index current, so the changes the
+    # workspace tree passes on here are left to them
+
+    def __init__(self, parts):
+        self.parts = parts  # [(mount id, SearchIndex)]
+
+    def __len__(self):
+        return sum(index.count for _, index in self.parts)
+
+    def add(self, task_id, name):
+        pass
+
+    def remove(self, task_id):
+        pass
+
+    def search(self, query):
+        return search_indexes(self.parts, query)
+
+
+def docs_file(index:Path) -> Path:
+    # the records saved with an index (todo.json.search -> todo.json.search.docs)
+    return index.with_name(index.name + DOCS_SUFFIX)
+
+
+def write_docs(file:Path, task_tree, stamp):
+    # every task's record as a json line ([id, parent id, attrs]) after a header with the stamp;
+    # returns {task_id: offset of its line}
+    offsets = {}
+    temp_file = file.with_name(f'.{file.name}.{os.getpid()}.tmp')
+    with temp_file.open(mode='wb') as write_file:
+        write_file.write(json.dumps({'stamp': list(stamp) if stamp else None}).encode('utf-8') + b'\n')
+        for task_id, parent_id, attrs in task_tree.records():
+            if parent_id is None:
+                continue
+            offsets[task_id] = write_file.tell()
+            write_file.write(json.dumps([task_id, parent_id, shards.encode_attrs(attrs)]).encode('utf-8') + b'\n')
+    os.replace(temp_file, file)
+    return offsets
+
+
+def read_docs(file:Path, offsets, task_ids, stamp):
+    # the records of task_ids (those the docs file has), or None if it isn't the one for stamp
+    records = []
+    with file.open(mode='rb') as read_file:
+        if json.loads(read_file.readline()).get('stamp') != (list(stamp) if stamp else None):
+            return None
+        for task_id in task_ids:
+            if task_id in offsets:
+                read_file.seek(offsets[task_id])
+                task_id, parent_id, attrs = json.loads(read_file.readline())
+                records.append((task_id, parent_id, shards.decode_attrs(attrs)))
+    return records
+
+
+def for_tree(task_tree):
+    # the search index of a loaded tree: the saved one plus the journal's changes when it's still
+    # current, else built from the tree (and saved for next time)
+    file, stamp = task_tree.file, task_tree.stamp
+    if task_tree.workspace is not None:
+        return MountedIndex([(mount, tree.search_index()) for mount, tree in task_tree.workspace.trees.items()])
+    if file is None:
+        return SearchIndex.from_nodes(task_tree.nodes())
+
+    index = SearchIndex.load(index_file(file), stamp)
+    if index is not None:
+        if task_tree.journal is not None:
+            for entry in journal.Journal(file).replay():
+                index.apply(entry)
+        return index
+
+    task_tree.require_all()
+    index = SearchIndex.from_nodes(task_tree.nodes())
+    try:
+        index.save(index_file(file), stamp, task_tree)
+    except OSError:
+        pass  # e.g. a read-only directory: searching still works, just without the saved copy
+    return index
+
+
+def rank(scores, matches, limit=None):
+    # [(task_id, score)] of matches, best first; ties go to shallower tasks, then to the order
+    # they were added in
+    key = lambda task_id: (-scores[task_id], task_id.count('.'), numeric(task_id))
+    ranked = sorted(matches, key=key) if limit is None else heapq.nsmallest(limit, matches, key=key)
+    return [(task_id, scores[task_id]) for task_id in ranked]
+
+
+def find(task_tree, query, limit=None):
+    # [(task_id, score)] of the tasks matching query, best first
+    scores = task_tree.search_index().search(query)
+    task_tree.require_tasks(scores)
+    return rank(scores, [task_id for task_id in scores if task_id in task_tree], limit)
+
+
+def find_saved(task_file:Path, query, limit=None):
+    # find() without loading the task file: (tree, matches), the tree holding just the matches
+    # and their ancestors, or None if there's no saved index with records for the file as it is
+    stamp = storage.stamp(task_file)
+    index = SearchIndex.load(index_file(task_file), stamp)
+    if index is None or index.offsets is None:
+        return None
+    entries = list(journal.Journal(task_file).replay())
+    for entry in entries:
+        index.apply(entry)
+
+    scores = index.search(query)
+    ranked = rank(scores, list(scores), limit)
+    needed = {'.'.join(task_id.split('.')[:n]) for task_id, _ in ranked for n in range(2, task_id.count('.') + 2)}
+    try:
+        records = read_docs(docs_file(index_file(task_file)), index.offsets, sorted(needed, key=numeric), stamp)
+    except (OSError, ValueError):
+        return None
+    if records is None:
+        return None
+
+    # parents come before their subtasks, and ones added since come from the journal. the tree is
+    # only read, so it's an ArrayTaskTree whatever the backend: that one loads without networkx
+    from due.arraytree import ArrayTaskTree
+    tree = ArrayTaskTree.from_records([('0', None, {})] + records)
+    for entry in entries:
+        tree.apply(**entry)
+    return tree, [(task_id, score) for task_id, score in ranked if task_id in tree]
+
+
+def path(task_tree, task_id):
+    # names of the task's ancestors, from its milestone down to its parent
+    names = []
+    node = task_tree.parent(task_id)
+    while node is not None:
+        name = task_tree.task(node).get('task_name')
+        if name is not None:
+            names.append(name)
+        node = task_tree.parent(node)
+    return names[::-1]
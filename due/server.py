@@ -0,0 +1,265 @@
+import json
+import os
+import signal
+import socket
+import sys
+
+# `due serve` keeps the config, rich and the loaded task tree in one long-running process and
+# answers commands over a unix socket, so a command costs a round trip instead of an interpreter
+# start, imports and a load of todo.json. `python -m due ...` tries the socket first and falls
+# back to running the command itself when no server is listening.
+#
+#   due serve &
+#   due today          # answered by the server
+#   DUE_NO_SERVER=1 due today   # always run in this process
+#
+# commands run in the client's working directory; a client reading another config file, or
+# piping tasks into `due import -`, runs the command itself instead.
+#
+# the client half of this module only imports what the standard library has already loaded,
+# so trying the socket is cheap when there is no server.
+
+ENCODING = 'utf-8'
+CHUNK = 65536
+
+# seconds the server waits for a client to send its request, so a stalled client can't hold up
+# the commands queued behind it
+RECEIVE_TIMEOUT = 5
+
+
+def socket_path():
+    # $DUE_SOCKET, or a per-user socket in $XDG_RUNTIME_DIR (or the temp directory)
+    if os.environ.get('DUE_SOCKET'):
+        return os.environ['DUE_SOCKET']
+    directory = os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('TMPDIR') or '/tmp'
+    return os.path.join(directory, f'due-{os.getuid()}.sock')
+
+
+def config_path():
+    # the config file a process run here would read, as configparse.CONFIG_PATH finds it
+    default = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yaml')
+    return os.path.realpath(os.environ.get('DUE_CONFIG', default))
+
+
+def reads_stdin(argv):
+    # commands that read the client's stdin (`due import -`) run in the client's own process
+    return argv[:1] == ['import'] and '-' in argv[1:]
+
+
+def receive(conn):
+    chunks = []
+    while True:
+        chunk = conn.recv(CHUNK)
+        if not chunk:
+            return json.loads(b''.join(chunks).decode(ENCODING))
+        chunks.append(chunk)
+
+
+# client
+
+def request(argv, path=None):
+    # runs the command in argv on a running server and copies its output here. returns the
+    # command's exit status, or None if there is no server to ask (the caller runs it instead)
+    if argv[:1] == ['serve'] or os.environ.get('DUE_NO_SERVER') or reads_stdin(argv):
+        return None
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path or socket_path())
+    except OSError:
+        conn.close()
+        return None
+
+    try:
+        terminal = sys.stdout.isatty()
+        conn.sendall(json.dumps({
+            'argv': argv,
+            'cwd': os.getcwd(),
+            'config': config_path(),
+            'terminal': terminal,
+            'width': os.get_terminal_size(sys.stdout.fileno()).columns if terminal else None,
+            'env': {key: os.environ.get(key) for key in ('TERM', 'COLORTERM', 'NO_COLOR')},
+        }).encode(ENCODING))
+        conn.shutdown(socket.SHUT_WR)
+        response = receive(conn)
+    except (OSError, ValueError) as e:
+        # the server may already have run the command, so it isn't run a second time here
+        print(f"due: lost connection to the server: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+    if response.get('status') is None:
+        # the server reads another config file: the command runs here instead
+        return None
+    try:
+        sys.stderr.write(response['stderr'])
+        sys.stdout.write(response['stdout'])
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # output was piped into something like `head` that has stopped reading
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    return response['status']
+
+
+# server
+
+def color_system(options):
+    # what rich would pick for the client's terminal, from the client's environment
+    env = options['env']
+    if not options['terminal'] or env.get('NO_COLOR') is not None:
+        return None
+    if env.get('COLORTERM') in ('truecolor', '24bit'):
+        return 'truecolor'
+    if '256' in (env.get('TERM') or ''):
+        return '256'
+    return 'standard'
+
+
+def task_files():
+    # the files the task tree is loaded from: the task file, or the files of a workspace
+    import due
+    if due.WORKSPACE:
+        return [file for _, file in due.WORKSPACE]
+    return [due.TASK_FILE_PATH]
+
+
+def file_stamps(task_files):
+    # (mtime, size) of the task files and their journals, to notice changes made by other processes
+    stamps = []
+    for file in [name for task_file in task_files for name in (str(task_file), str(task_file) + '.log')]:
+        try:
+            stat = os.stat(file)
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamps.append(None)
+    return stamps
+
+
+class Server:
+
+    def __init__(self, path=None):
+        self.path = path or socket_path()
+        self.stamps = None
+
+    def refresh(self):
+        # brings the cached state in the due module up to date before a command runs
+        import due
+        from datetime import datetime
+
+        due.TODAY = datetime.today().date()
+
+        # reload the task tree if todo.json or its journal were changed by someone else
+        stamps = file_stamps(task_files())
+        if stamps != self.stamps and 'TASK_TREE' in due.__dict__:
+            tree = due.__dict__.pop('TASK_TREE')
+            if tree.journal is not None:
+                tree.journal.close()
+        self.stamps = stamps
+
+    def run(self, options):
+        # runs one command, returning what it printed and its exit status
+        import io
+        from contextlib import redirect_stderr, redirect_stdout
+
+        import due
+        from due import cli
+        from due.__main__ import main
+
+        if options['argv'][:1] == ['serve']:
+            return {'stdout': '', 'stderr': "due: already serving\n", 'status': 2}
+        if options.get('config') != config_path():
+            # not served: a client using another config file (so other task files) runs the
+            # command itself
+            return {'stdout': '', 'stderr': '', 'status': None}
+
+        self.refresh()
+        cli.CONSOLE_OPTIONS.update(
+            force_terminal=options['terminal'],
+            color_system=color_system(options),
+            width=options['width'],
+        )
+
+        # relative paths in the command (import files, --profile-json) are the client's. commands
+        # that read stdin aren't sent here (see reads_stdin), so nothing reads the server's
+        stdout, stderr = io.StringIO(), io.StringIO()
+        status = 0
+        cwd, stdin = os.getcwd(), sys.stdin
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                os.chdir(options.get('cwd') or cwd)
+                sys.stdin = io.StringIO()
+                main(options['argv'])
+            except SystemExit as e:
+                status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                if isinstance(e.code, str):
+                    print(e.code, file=sys.stderr)
+            except Exception as e:
+                print(f"due: {type(e).__name__}: {e}", file=sys.stderr)
+                status = 1
+            finally:
+                os.chdir(cwd)
+                sys.stdin = stdin
+
+        # the command's own writes shouldn't trigger a reload before the next one
+        self.stamps = file_stamps(task_files())
+        return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'status': status}
+
+    def handle(self, conn):
+        conn.settimeout(RECEIVE_TIMEOUT)
+        try:
+            response = self.run(receive(conn))
+        except ValueError as e:
+            response = {'stdout': '', 'stderr': f"due: bad request: {e}\n", 'status': 2}
+        conn.sendall(json.dumps(response).encode(ENCODING))
+
+    def serve_forever(self):
+        import due
+
+        # load everything up front, so the first command is as fast as the rest
+        due.TASK_TREE
+        self.stamps = file_stamps(task_files())
+
+        # a socket left behind by a server that didn't shut down cleanly is replaced
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise SystemExit(f"due: a server is already listening on {self.path}")
+            finally:
+                probe.close()
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)  # only this user may connect
+        try:
+            listener.bind(self.path)
+        finally:
+            os.umask(umask)
+        listener.listen()
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        print(f"due: serving {', '.join(map(str, task_files()))} on {self.path}", file=sys.stderr)
+
+        try:
+            while True:
+                conn, _ = listener.accept()
+                with conn:
+                    try:
+                        self.handle(conn)
+                    except OSError:
+                        pass  # the client went away, or stalled past RECEIVE_TIMEOUT
+        except KeyboardInterrupt:
+            pass
+        finally:
+            listener.close()
+            os.unlink(self.path)
+            if 'TASK_TREE' in due.__dict__:
+                for name, stats in due.TASK_TREE.view_cache.stats().items():
+                    print(f"due: {name} cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions", file=sys.stderr)
+
+
+def serve(path=None):
+    Server(path).serve_forever()
@@ -0,0 +1,250 @@
+import json
+import os
+from datetime import date
+from pathlib import Path
+
+# sharded task store (a directory named like todo.shards): one json file per milestone (each
+# subtask of the root '0') holding its whole subtree, plus a small manifest.json with the root's
+# attributes and, per milestone, its own attributes, its shard file and the deadline bounds of
+# its subtree:
+#
+#   {"version": 1, "generation": 7, "root": {"next_id": 4},
+#    "shards": [{"id": "0.3", "file": "0.3.7.json", "attrs": {"task_name": ..., "deadline": ...},
+#                "count": 120, "first": "2026-01-04", "last": "2026-12-30",
+#                "first_open": "2026-10-20", "recurring": false}, ...]}
+#
+# a tree loaded lazily from it (BaseTaskTree.load(lazy=True), as the cli does) starts out with
+# just the root and the milestones; shards are read when something needs them (see
+# BaseTaskTree.require_tasks / require_due / require_all), so `due ls 0.3` reads one shard,
+# `due today` only the shards with open tasks due by today, and `due ls -e 1` none at all.
+# saving writes only the shards that changed, each to a new file named after the manifest's
+# generation; the manifest is replaced last, so a crash leaves the previous version whole.
+
+SHARDS_SUFFIX = '.shards'
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def is_sharded(file:Path):
+    return file.suffix == SHARDS_SUFFIX
+
+
+def manifest_file(directory:Path) -> Path:
+    return directory / MANIFEST
+
+
+def shard_of(task_id):
+    # id of the milestone a task belongs to (itself for a milestone), None for the root
+    parts = task_id.split('.', 2)
+    return '.'.join(parts[:2]) if len(parts) > 1 else None
+
+
+def to_date(text):
+    return date.fromisoformat(text) if text else None
+
+
+def encode_attrs(attrs):
+    # dates as YYYY-MM-DD, as in the json task file
+    return {k: (v.strftime("%Y-%m-%d") if k == 'deadline' and v else v) for k, v in attrs.items()}
+
+
+def decode_attrs(attrs):
+    attrs = dict(attrs)
+    if attrs.get('deadline', None):
+        attrs['deadline'] = date.fromisoformat(attrs['deadline'])
+    return attrs
+
+
+class Shard:
+
+    def __init__(self, task_id, file, attrs, count=1, first=None, last=None, first_open=None, recurring=False):
+        self.id = task_id
+        self.file = file
+        self.attrs = attrs  # the milestone's own attributes
+        self.count = count  # tasks in the subtree, the milestone included
+        self.first, self.last = first, last  # earliest and latest deadline in the subtree
+        self.first_open = first_open  # earliest deadline of an unfinished task
+        self.recurring = recurring  # whether the subtree holds recurring tasks (due on any day)
+
+    def may_be_due(self, start, end, open_only=False):
+        # whether the subtree can hold a task due from start to end (None leaves that end open)
+        if self.recurring:
+            return True
+        first = self.first_open if open_only else self.first
+        if first is None:
+            return False
+        return (end is None or first <= end) and (start is None or self.last >= start)
+
+    @classmethod
+    def of_records(cls, records, file):
+        # a shard for the subtree in records (preorder, the milestone first)
+        milestone, _, attrs = records[0]
+        deadlines = [data['deadline'] for _, _, data in records if data.get('deadline')]
+        open_deadlines = [data['deadline'] for _, _, data in records if data.get('deadline') and not data.get('complete')]
+        return cls(
+            milestone, file, attrs, len(records),
+            min(deadlines, default=None), max(deadlines, default=None), min(open_deadlines, default=None),
+            any('repeat' in data for _, _, data in records),
+        )
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'file': self.file,
+            'attrs': encode_attrs(self.attrs),
+            'count': self.count,
+            'first': self.first.isoformat() if self.first else None,
+            'last': self.last.isoformat() if self.last else None,
+            'first_open': self.first_open.isoformat() if self.first_open else None,
+            'recurring': self.recurring,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data['id'], data['file'], decode_attrs(data['attrs']), data['count'],
+            to_date(data['first']), to_date(data['last']), to_date(data['first_open']), data['recurring'],
+        )
+
+
+class Manifest:
+
+    def __init__(self, root=None, shards=None, generation=0):
+        self.root = root or {}
+        self.shards = shards or {}  # milestone id: Shard, in the order of the milestones
+        self.generation = generation
+
+    def base_records(self):
+        # the root and the milestones, without their subtasks
+        yield '0', None, dict(self.root)
+        for shard in self.shards.values():
+            yield shard.id, '0', dict(shard.attrs)
+
+    @classmethod
+    def read(cls, directory:Path):
+        with manifest_file(directory).open(mode='r') as read_file:
+            data = json.load(read_file)
+        if data.get('version') != FORMAT_VERSION:
+            raise ValueError(f"{directory}: unknown shard manifest version {data.get('version')}")
+        shards = [Shard.from_json(shard) for shard in data['shards']]
+        return cls(data['root'], {shard.id: shard for shard in shards}, data['generation'])
+
+    def write(self, directory:Path):
+        data = {
+            'version': FORMAT_VERSION,
+            'generation': self.generation,
+            'root': self.root,
+            'shards': [shard.to_json() for shard in self.shards.values()],
+        }
+        temp_file = directory / f'.{MANIFEST}.{os.getpid()}.tmp'
+        with temp_file.open(mode='w') as write_file:
+            json.dump(data, write_file, indent=1)
+            write_file.flush()
+            os.fsync(write_file.fileno())
+        os.replace(temp_file, manifest_file(directory))
+
+
+def read_manifest(directory:Path):
+    # a store that doesn't exist yet is converted from the json file next to it (todo.shards
+    # from todo.json), like snapshots are
+    from due import storage
+    json_file = directory.with_suffix(storage.JSON_SUFFIX)
+    if not manifest_file(directory).exists() and json_file.exists():
+        write(directory, storage.read_json(json_file))
+    return Manifest.read(directory)
+
+
+def read_shard(directory:Path, shard):
+    # the records of a milestone's subtree, the milestone first
+    from due import storage
+    for task_id, parent_id, attrs in storage.read_json(directory / shard.file):
+        yield task_id, parent_id or '0', attrs
+
+
+def read(directory:Path):
+    # every record in the store, in preorder
+    manifest = read_manifest(directory)
+    yield '0', None, dict(manifest.root)
+    for shard in manifest.shards.values():
+        yield from read_shard(directory, shard)
+
+
+def write_shard(directory:Path, records, generation):
+    # writes a milestone's subtree to a new shard file, returning its Shard
+    from due import storage
+    records = list(records)
+    milestone = records[0][0]
+    file = f'{milestone}.{generation}.json'
+    storage.write_json(directory / file, ((task_id, None if task_id == milestone else parent_id, attrs) for task_id, parent_id, attrs in records))
+    return Shard.of_records(records, file)
+
+
+def commit(directory:Path, manifest, old_files=()):
+    # the manifest is replaced last, so until then the previous one (and its shard files) stays
+    # intact; shard files it no longer lists are removed afterwards
+    manifest.write(directory)
+    kept = {shard.file for shard in manifest.shards.values()}
+    for file in old_files:
+        if file not in kept:
+            try:
+                os.remove(directory / file)
+            except FileNotFoundError:
+                pass
+
+
+def write(directory:Path, records):
+    # writes a whole tree as a new generation of the store
+    directory.mkdir(parents=True, exist_ok=True)
+    try:
+        old = Manifest.read(directory)
+    except (OSError, ValueError):
+        old = Manifest()
+    manifest = Manifest(generation=old.generation + 1)
+
+    subtree = None
+    for task_id, parent_id, attrs in records:
+        if parent_id is None:
+            manifest.root = dict(attrs)
+        elif parent_id == '0':
+            if subtree:
+                shard = write_shard(directory, subtree, manifest.generation)
+                manifest.shards[shard.id] = shard
+            subtree = [(task_id, parent_id, attrs)]
+        else:
+            subtree.append((task_id, parent_id, attrs))
+    if subtree:
+        shard = write_shard(directory, subtree, manifest.generation)
+        manifest.shards[shard.id] = shard
+
+    commit(directory, manifest, [shard.file for shard in old.shards.values()])
+
+
+def save(directory:Path, task_tree, state):
+    # writes the shards of task_tree that changed since state.manifest (plus new milestones) and
+    # a new manifest; shards that weren't loaded or touched keep their files
+    old = state.manifest
+    manifest = Manifest(dict(task_tree.task('0')), generation=old.generation + 1)
+    for milestone in task_tree.children('0'):
+        shard = old.shards.get(milestone)
+        if shard is None or milestone in state.changed:
+            shard = write_shard(directory, task_tree.records(milestone), manifest.generation)
+        manifest.shards[milestone] = shard
+
+    commit(directory, manifest, [shard.file for shard in old.shards.values()])
+    state.manifest = manifest
+    state.changed.clear()
+
+
+class ShardState:
+
+    # what a lazily loaded tree knows about its store: the manifest it was loaded from, which
+    # shards are still unread, and which ones were changed since
+
+    def __init__(self, directory:Path, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        self.unloaded = set(manifest.shards)
+        self.changed = set()
+
+    def loaded(self):
+        return [milestone for milestone in self.manifest.shards if milestone not in self.unloaded]
@@ -0,0 +1,177 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import date
+from pathlib import Path
+
+# binary snapshot format for task trees (.snap files)
+#
+#   header       magic, format version, node count, string count
+#   nodes        one fixed-width record per task, in preorder so parents come before children:
+#                    id string, name string, parent record (-1 for root),
+#                    deadline as a date ordinal (0 for none), extra-attributes string, flags
+#   offsets      string count + 1 little-endian uint32 offsets into the string blob
+#   strings      utf-8 blob; names are interned, so repeated task names are stored once
+#
+# a reader memory-maps the file and decodes its records in one pass, straight from the mapping.
+# attributes other than task_name/deadline/complete are stored as json, so they have to be json
+# values (dates in them are YYYY-MM-DD strings, as in the json task file).
+
+MAGIC = b'DUES'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHHII')
+RECORD = struct.Struct('<IIiiIB3x')
+
+NO_STRING = 0xFFFFFFFF
+
+# record flags
+HAS_TASK = 1 # node carries task_name/deadline/complete (everything but the root)
+COMPLETE = 2
+
+TASK_KEYS = ('task_name', 'deadline', 'complete')
+
+# array('I') uses native byte order; the format is little-endian on disk regardless of the host
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def encode_extra(task_id, extra):
+    # the attributes other than TASK_KEYS, as json (a date would come back as a string)
+    try:
+        return json.dumps(extra)
+    except TypeError as e:
+        raise SnapshotError(f"task '{task_id}' has an attribute that isn't a json value: {e}")
+
+
+def write(file:Path, records) -> None:
+    # records is an iterable of (task_id, parent_id, attrs) tuples in preorder
+    strings = {}
+    def intern(s):
+        index = strings.get(s)
+        if index is None:
+            index = strings[s] = len(strings)
+        return index
+
+    positions = {}
+    packed = []
+    for task_id, parent_id, attrs in records:
+        positions[task_id] = len(packed)
+        parent = -1 if parent_id is None else positions[parent_id]
+        deadline = attrs.get('deadline')
+        extra = {k: v for k, v in attrs.items() if k not in TASK_KEYS}
+
+        flags = 0
+        if 'task_name' in attrs:
+            flags |= HAS_TASK
+        if attrs.get('complete'):
+            flags |= COMPLETE
+
+        packed.append(RECORD.pack(
+            intern(task_id),
+            intern(attrs['task_name']) if flags & HAS_TASK else NO_STRING,
+            parent,
+            deadline.toordinal() if deadline else 0,
+            intern(encode_extra(task_id, extra)) if extra else NO_STRING,
+            flags,
+        ))
+
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = array('I', [0])
+    for s in encoded:
+        offsets.append(offsets[-1] + len(s))
+    if offsets.itemsize != 4:
+        raise SnapshotError('platform has no 4-byte unsigned int array type')
+
+    with file.open(mode='wb') as write_file:
+        write_file.write(HEADER.pack(MAGIC, VERSION, 0, len(packed), len(encoded)))
+        write_file.write(b''.join(packed))
+        if not LITTLE_ENDIAN:
+            offsets.byteswap()
+        write_file.write(offsets.tobytes())
+        write_file.write(b''.join(encoded))
+        write_file.flush()
+        os.fsync(write_file.fileno())
+
+
+class SnapshotReader:
+
+    # memory-mapped view of a snapshot file
+
+    def __init__(self, file:Path):
+        self.file = file
+        with file.open(mode='rb') as read_file:
+            if file.stat().st_size < HEADER.size:
+                raise SnapshotError(f"Not a task snapshot: '{file}'")
+            self._mmap = mmap.mmap(read_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, self.node_count, self.string_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise SnapshotError(f"Not a task snapshot: '{file}'")
+        if version != VERSION:
+            self.close()
+            raise SnapshotError(f"Unsupported snapshot version {version}: '{file}'")
+
+        self._records_offset = HEADER.size
+        self._offsets_offset = self._records_offset + self.node_count * RECORD.size
+        self._strings_offset = self._offsets_offset + (self.string_count + 1) * 4
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.node_count
+
+    def records(self):
+        # yields every record in file (pre)order, decoding each string and each distinct date
+        # once. records and strings are read in place from the mapping rather than copied out
+        with memoryview(self._mmap) as view, view[self._records_offset:self._offsets_offset] as packed:
+            strings = self._strings(view)
+            dates = {}
+            ids = []
+            for task_ref, name_ref, parent, ordinal, extra_ref, flags in RECORD.iter_unpack(packed):
+                task_id = strings[task_ref]
+                ids.append(task_id)
+
+                attrs = {}
+                if flags & HAS_TASK:
+                    attrs['task_name'] = strings[name_ref]
+                    if ordinal:
+                        deadline = dates.get(ordinal)
+                        if deadline is None:
+                            deadline = dates[ordinal] = date.fromordinal(ordinal)
+                        attrs['deadline'] = deadline
+                    attrs['complete'] = bool(flags & COMPLETE)
+                if extra_ref != NO_STRING:
+                    attrs.update(json.loads(strings[extra_ref]))
+
+                yield task_id, (None if parent < 0 else ids[parent]), attrs
+
+    def _strings(self, view):
+        # the blob is copied out once: slicing bytes is much cheaper than slicing the mapping
+        # for every string
+        offsets = array('I')
+        offsets.frombytes(view[self._offsets_offset:self._strings_offset])
+        if not LITTLE_ENDIAN:
+            offsets.byteswap()
+        blob = self._mmap[self._strings_offset:self._strings_offset + offsets[-1]]
+        return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(self.string_count)]
+
+
+def read(file:Path):
+    # yields (task_id, parent_id, attrs) records from a snapshot file
+    with SnapshotReader(file) as reader:
+        yield from reader.records()
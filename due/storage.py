@@ -0,0 +1,106 @@
+import json
+import os
+from datetime import date
+from pathlib import Path
+
+from due import shards, snapshot
+
+# task files are read and written as a stream of (task_id, parent_id, attrs) records in preorder,
+# where parent_id is None for the root and attrs['deadline'] is a date object.
+# the on-disk format is chosen by file extension:
+#   .json    nested tree, same layout as networkx's json_graph.tree_data (the original format)
+#   .snap    binary snapshot, see snapshot.py
+#   .shards  directory with one json file per milestone and a manifest, see shards.py
+
+JSON_SUFFIX = '.json'
+SNAPSHOT_SUFFIX = '.snap'
+
+
+class TaskFileChanged(RuntimeError):
+    # raised when saving over a task file that another process changed since it was read
+    pass
+
+
+def stamp(file:Path):
+    # identifies a version of a task file: saving replaces the file, so its inode changes along
+    # with its mtime and size. None if there's no file. a sharded store's version is its manifest's
+    if shards.is_sharded(file):
+        file = shards.manifest_file(file)
+    try:
+        stat = os.stat(file)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def read_records(file:Path):
+    if shards.is_sharded(file):
+        return shards.read(file)
+    if file.suffix == SNAPSHOT_SUFFIX:
+        # a snapshot that doesn't exist yet is converted from the json file next to it
+        json_file = file.with_suffix(JSON_SUFFIX)
+        if not file.exists() and json_file.exists():
+            convert(json_file, file)
+        return snapshot.read(file)
+    return read_json(file)
+
+
+def write_records(file:Path, records) -> None:
+    if shards.is_sharded(file):
+        shards.write(file, records)
+        return
+    # written to a temporary file that then replaces the task file, so a crash mid-save
+    # leaves the previous version in place instead of a half-written file. the temporary file
+    # is named after the process, so two processes saving at once can't write into the same one
+    temp_file = file.with_name(f'.{file.name}.{os.getpid()}.tmp')
+    if file.suffix == SNAPSHOT_SUFFIX:
+        snapshot.write(temp_file, records)
+    else:
+        write_json(temp_file, records)
+    os.replace(temp_file, file)
+
+
+def convert(source:Path, destination:Path) -> None:
+    # converts a task file between formats, e.g. convert(Path('todo.json'), Path('todo.snap'))
+    write_records(destination, read_records(source))
+
+
+def read_json(file:Path):
+    with file.open(mode='r') as read_file:
+        data = json.load(read_file)
+
+    # iterative preorder walk, so deep task chains can't hit the recursion limit
+    stack = [(data, None)]
+    while stack:
+        node, parent_id = stack.pop()
+        attrs = {k: v for k, v in node.items() if k not in ('id', 'children')}
+
+        # convert any deadline attributes from string to date obj after loading
+        if attrs.get('deadline', None):
+            attrs['deadline'] = date.fromisoformat(attrs['deadline'])
+
+        yield node['id'], parent_id, attrs
+        stack.extend((child, node['id']) for child in reversed(node.get('children', ())))
+
+
+def write_json(file:Path, records) -> None:
+    nodes = {}
+    root = None
+    for task_id, parent_id, attrs in records:
+        node = dict(attrs, id=task_id)
+
+        # convert any deadline attributes from date obj to strings before saving
+        if node.get('deadline', None):
+            node['deadline'] = node['deadline'].strftime("%Y-%m-%d")
+
+        if parent_id is None:
+            node['children'] = []
+            root = node
+        else:
+            nodes[parent_id].setdefault('children', []).append(node)
+        nodes[task_id] = node
+
+    with file.open(mode='w') as write_file:
+        json.dump(root, write_file, indent=4)
+        write_file.flush()
+        os.fsync(write_file.fileno())
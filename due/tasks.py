@@ -1,106 +1,64 @@
-import json
-
-from pathlib import Path
-from datetime import date,datetime
-
 import networkx as nx
-from networkx.readwrite import json_graph
 
-from due import TASK_FILE_PATH
+from due.basetree import BaseTaskTree
 
 
-class TaskTree:
+class TaskTree(BaseTaskTree):
+
+    # task tree stored as a networkx DiGraph, one node per task carrying its attributes
 
     def __init__(self):
+        super().__init__()
 
         self.tree = nx.DiGraph()
         self.tree.add_node('0')
 
-    def add_task(self, parent_task_id, task_name, deadline):
+    def __contains__(self, task_id):
+        return task_id in self.tree
 
-        # adds subtask to existing task with id parent_task_id
-        # new subtask has subtask name of task_name
-        # and deadline of deadline
+    def __len__(self):
+        return len(self.tree)
 
-        # TODO: assert that deadline of parent must be after deadline of child
-        # TODO: assert that parent can't be done while children aren't (somehow)
+    def task(self, task_id):
+        return self.tree.nodes[task_id]
 
-        id_suffix = str(len(list(self.tree.successors(parent_task_id))))
-        task_id = parent_task_id + '.' + id_suffix
+    def children(self, task_id):
+        return self.tree.adj[task_id]
 
-        self.tree.add_node(
-            task_id, 
-            task_name=task_name, 
-            deadline=deadline,
-            complete=False,
-        )
+    def parent(self, task_id):
+        return next(iter(self.tree.pred[task_id]), None)
 
-        self.tree.add_edge(parent_task_id,task_id)
-        return self
+    def nodes(self):
+        return self.tree.nodes(data=True)
 
-    def delete_task(self,task_id):
-        self.tree.remove_node(task_id)
-        return self
+    def _select(self, task_ids):
+        t = TaskTree() 
+        t.tree = self.tree.subgraph(task_ids)
+        t.base = self.base
+        return t
 
-    def complete_task(self,task_id):
-        # TODO: assert that parent can't be done while children aren't
-        self.tree.nodes[task_id]['complete'] = True
-        return self
+    def _insert(self, parent_task_id, task_id, attrs):
+        self.tree.add_node(task_id, **attrs)
+        self.tree.add_edge(parent_task_id, task_id)
 
-    def uncomplete_task(self,task_id):
-        self.tree.nodes[task_id]['complete'] = False
-        return self
+    def _remove(self, task_id):
+        self.tree.remove_nodes_from(nx.descendants(self.tree, task_id) | {task_id})
 
-    def subtree(self,callback):
-        #callback must return a boolean based on node,data inputs
-        selected_nodes = [node for node,data in self.tree.nodes(data=True) if callback(node,data)]
-        t = TaskTree() 
-        t.tree = self.tree.subgraph(selected_nodes)
-        return t
+    def _update(self, task_id, **attrs):
+        self.tree.nodes[task_id].update(attrs)
 
-    def due_by(self,deadline):
-        if deadline in (False,None):
-            return self
-        callback = lambda node,data: node == '0' or data['deadline'] <= deadline
-        return self.subtree(callback)
-
-    def depth_limit(self,depth):
-        if depth in (False,None):
-            return self
-        node_depth_dict = nx.shortest_path_length(self.tree,'0')
-        callback = lambda node,data: node_depth_dict[node]<=depth
-        return self.subtree(callback)
-
-    def completed(self,completion_status):
-        if completion_status == None:
-            return self
-        callback = lambda node,data: node == '0' or data['complete'] == completion_status
-        return self.subtree(callback)
-
-    def save(self, file:Path = TASK_FILE_PATH) -> None:
-
-        # convert any deadline attributes in task tree from date obj to strings before saving
-        for node,data in self.tree.nodes(data=True):
-            if data.get('deadline',None):
-                self.tree.nodes[node]['deadline'] = datetime.strftime(data['deadline'], "%Y-%m-%d")
-
-        data = json_graph.tree_data(self.tree, root='0')
-        with file.open(mode='w') as write_file:
-            json.dump(data, write_file, indent=4)
-
-    @staticmethod
-    def load(file:Path = TASK_FILE_PATH):
-
-        with file.open(mode='r') as read_file:
-            data = json.load(read_file)
-        t = TaskTree()
-        t.tree = json_graph.tree_graph(data)
-
-        # convert any deadline attributes in task tree from string to date obj after loading
-        for node,data in t.tree.nodes(data=True):
-            if data.get('deadline',None):
-                t.tree.nodes[node]['deadline'] = datetime.strptime(data['deadline'], "%Y-%m-%d").date()
+    @classmethod
+    def from_records(cls, records):
+        # builds a task tree from (task_id, parent_id, attrs) records in preorder
+        nodes, edges = [], []
+        for node, parent, data in records:
+            nodes.append((node, data))
+            if parent is not None:
+                edges.append((parent, node))
 
+        t = cls()
+        t.tree.add_nodes_from(nodes)
+        t.tree.add_edges_from(edges)
         return t
 
 
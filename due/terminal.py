@@ -0,0 +1,332 @@
+import os
+import re
+import sys
+from contextlib import contextmanager
+from io import StringIO
+
+# console output for the views (`due today / tomorrow / week` and `due ls`) without rich. they
+# print console markup such as [task_id]0.3[/task_id] or [on #1E3A1E]18[/], which rich's Console
+# turns into escape codes, but importing rich.console takes longer than loading a task tree of a
+# few thousand tasks, and `due today` runs in shell prompts and status bars. Console renders the
+# markup the views print the way rich does:
+#
+#   tags             config theme names, and styles of attributes (bold, dim, reverse, ...),
+#                    colors (standard names, #rrggbb, rgb(r,g,b), color(n), default) and `on`
+#                    backgrounds; nested, closed by name or with [/]. \[ is a literal bracket
+#   colors           picked for the terminal from the same environment variables rich reads
+#                    (TTY_COMPATIBLE, FORCE_COLOR, NO_COLOR, TERM, COLORTERM), none when piped
+#
+# a line it can't render the same way (an unknown tag, an emoji code like :x:, tabs or control
+# characters, highlighting, a line that rich would wrap) is printed by a rich Console instead.
+
+ATTRIBUTES = {
+    'bold': 0, 'b': 0, 'dim': 1, 'd': 1, 'italic': 2, 'i': 2, 'underline': 3, 'u': 3,
+    'blink': 4, 'blink2': 5, 'reverse': 6, 'r': 6, 'conceal': 7, 'c': 7, 'strike': 8, 's': 8,
+    'underline2': 9, 'uu': 9, 'frame': 10, 'encircle': 11, 'overline': 12, 'o': 12,
+}
+ATTRIBUTE_CODES = ('1', '2', '3', '4', '5', '6', '7', '8', '9', '21', '51', '52', '53')
+
+STANDARD_COLORS = (
+    'black', 'red', 'green', 'yellow', 'blue', 'magenta', 'cyan', 'white',
+    'bright_black', 'bright_red', 'bright_green', 'bright_yellow', 'bright_blue', 'bright_magenta', 'bright_cyan', 'bright_white',
+)
+
+# the 16 colors a 'standard' terminal has, for picking the nearest one (rich's STANDARD_PALETTE)
+STANDARD_PALETTE = (
+    (0, 0, 0), (170, 0, 0), (0, 170, 0), (170, 85, 0), (0, 0, 170), (170, 0, 170), (0, 170, 170), (170, 170, 170),
+    (85, 85, 85), (255, 85, 85), (85, 255, 85), (255, 255, 85), (85, 85, 255), (255, 85, 255), (85, 255, 255), (255, 255, 255),
+)
+CUBE_LEVELS = (0, 95, 135, 175, 215, 255)
+
+TERM_COLORS = {'kitty': '256', '256color': '256', '16color': 'standard'}
+COLOR_SYSTEMS = {'standard': 1, '256': 2, 'truecolor': 3}
+
+# the markup syntax, as rich parses it
+TAG = re.compile(r'((\\*)\[([a-z#/@][^[]*?)])')
+EMOJI_CODE = re.compile(r'(:(\S*?)(?:(?:\-)(emoji|text))?:)')
+CONTROL = re.compile('[\x07\x08\x0b\x0c\x0d\t]')
+HEX_COLOR = re.compile(r'#([0-9a-f]{6})$')
+NUMBERED_COLOR = re.compile(r'color\(([0-9]{1,3})\)$')
+RGB_COLOR = re.compile(r'rgb\(([\d\s,]+)\)$')
+
+
+class StyleError(ValueError):
+    pass
+
+
+class Style:
+
+    # attributes (a bitmask over ATTRIBUTES, with the ones it sets either way in `given`) and
+    # colors as ('standard' | '256' | 'truecolor' | 'default', number or (r, g, b)), or None
+
+    def __init__(self, attributes=0, given=0, color=None, bgcolor=None):
+        self.attributes, self.given = attributes, given
+        self.color, self.bgcolor = color, bgcolor
+
+    @classmethod
+    def parse(cls, definition):
+        style = cls()
+        if definition.strip() == 'none':
+            return style
+        words = iter(definition.lower().split())
+        for word in words:
+            if word == 'on':
+                style.bgcolor = parse_color(next(words, ''))
+            elif word == 'not':
+                bit = ATTRIBUTES.get(next(words, ''))
+                if bit is None:
+                    raise StyleError(f"expected a style attribute after 'not' in {definition!r}")
+                style.given |= 1 << bit
+                style.attributes &= ~(1 << bit)
+            elif word in ATTRIBUTES:
+                style.given |= 1 << ATTRIBUTES[word]
+                style.attributes |= 1 << ATTRIBUTES[word]
+            else:
+                style.color = parse_color(word)
+        return style
+
+    def __add__(self, other):
+        # other on top of self
+        return Style(
+            (self.attributes & ~other.given) | other.attributes, self.given | other.given,
+            other.color or self.color, other.bgcolor or self.bgcolor,
+        )
+
+    def codes(self, color_system, no_color=False):
+        codes = [ATTRIBUTE_CODES[bit] for bit in range(len(ATTRIBUTE_CODES)) if self.attributes & (1 << bit)]
+        if not no_color:
+            for color, foreground in ((self.color, True), (self.bgcolor, False)):
+                if color is not None:
+                    codes.extend(color_codes(downgrade(color, color_system), foreground))
+        return ';'.join(codes)
+
+
+def parse_color(word):
+    if word == 'default':
+        return ('default', None)
+    if word in STANDARD_COLORS:
+        return ('standard', STANDARD_COLORS.index(word))
+    match = HEX_COLOR.match(word)
+    if match:
+        value = match.group(1)
+        return ('truecolor', (int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)))
+    match = NUMBERED_COLOR.match(word)
+    if match and int(match.group(1)) <= 255:
+        number = int(match.group(1))
+        return ('standard' if number < 16 else '256', number)
+    match = RGB_COLOR.match(word)
+    if match:
+        components = match.group(1).split(',')
+        if len(components) == 3 and all(c.strip().isdigit() and int(c) <= 255 for c in components):
+            return ('truecolor', tuple(int(c) for c in components))
+    # rich knows more color names (dark_orange, grey42, ...); those are left to it
+    raise StyleError(f"unknown color {word!r}")
+
+
+def palette_color(number):
+    # (r, g, b) of one of the 240 extra colors of a 256 color terminal
+    if number >= 232:
+        gray = 8 + (number - 232) * 10
+        return (gray, gray, gray)
+    number -= 16
+    return (CUBE_LEVELS[number // 36], CUBE_LEVELS[number // 6 % 6], CUBE_LEVELS[number % 6])
+
+
+def nearest_standard(rgb):
+    # the closest of the 16 standard colors, by rich's (red-mean weighted) distance
+    red1, green1, blue1 = rgb
+    def distance(index):
+        red2, green2, blue2 = STANDARD_PALETTE[index]
+        red_mean = (red1 + red2) // 2
+        red, green, blue = red1 - red2, green1 - green2, blue1 - blue2
+        return (((512 + red_mean) * red * red) >> 8) + 4 * green * green + (((767 - red_mean) * blue * blue) >> 8)
+    return min(range(len(STANDARD_PALETTE)), key=distance)
+
+
+def downgrade(color, color_system):
+    # the color as a terminal with color_system shows it
+    kind, value = color
+    if kind == 'default' or COLOR_SYSTEMS[kind] <= COLOR_SYSTEMS[color_system]:
+        return color
+    if color_system == '256':
+        from colorsys import rgb_to_hls
+        _, lightness, saturation = rgb_to_hls(*(component / 255 for component in value))
+        if saturation < 0.15:
+            # grayscale
+            gray = round(lightness * 25.0)
+            return ('256', 16 if gray == 0 else 231 if gray == 25 else 231 + gray)
+        red, green, blue = (c / 95 if c < 95 else 1 + (c - 95) / 40 for c in value)
+        return ('256', 16 + 36 * round(red) + 6 * round(green) + round(blue))
+    return ('standard', nearest_standard(value if kind == 'truecolor' else palette_color(value)))
+
+
+def color_codes(color, foreground):
+    kind, value = color
+    if kind == 'default':
+        return ['39' if foreground else '49']
+    if kind == 'standard':
+        return [str((30 if foreground else 40) + value if value < 8 else (82 if foreground else 92) + value)]
+    if kind == '256':
+        return ['38' if foreground else '48', '5', str(value)]
+    return ['38' if foreground else '48', '2', *(str(c) for c in value)]
+
+
+def detect_terminal(file, environ):
+    # whether escape codes may be written to file, as rich decides it
+    tty_compatible = environ.get('TTY_COMPATIBLE', '')
+    if tty_compatible in ('0', '1'):
+        return tty_compatible == '1'
+    force_color = environ.get('FORCE_COLOR')
+    if force_color is not None:
+        return force_color != ''
+    try:
+        return file.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def detect_color_system(is_terminal, environ):
+    if not is_terminal or environ.get('TERM', '').lower() in ('dumb', 'unknown'):
+        return None
+    if environ.get('COLORTERM', '').strip().lower() in ('truecolor', '24bit'):
+        return 'truecolor'
+    colors = environ.get('TERM', '').strip().lower().rpartition('-')[2]
+    return TERM_COLORS.get(colors, 'standard')
+
+
+def detect_width(environ):
+    width = None
+    for fd in (0, 1, 2):
+        try:
+            width = os.get_terminal_size(fd).columns
+        except (AttributeError, ValueError, OSError):
+            continue
+        break
+    columns = environ.get('COLUMNS')
+    if columns is not None and columns.isdigit():
+        width = int(columns)
+    return width or 80
+
+
+class Capture(StringIO):
+
+    def get(self):
+        return self.getvalue()
+
+
+class Console:
+
+    # the part of rich.console.Console the views use: print(), capture(), file, width,
+    # color_system and is_terminal, taking the same force_terminal / color_system / width
+    # options (`due serve` sets them for its client)
+
+    def __init__(self, styles, file=None, force_terminal=None, color_system='auto', width=None, fallback=None):
+        # styles: the config theme, {name: style definition}. fallback() makes the rich
+        # Console for what this one doesn't render
+        self.styles = {name.lower(): Style.parse(definition) for name, definition in styles.items()}
+        self._file = file
+        self._fallback, self._rich = fallback, None
+        environ = os.environ
+        self.is_terminal = detect_terminal(self.file, environ) if force_terminal is None else force_terminal
+        dumb = environ.get('TERM', '').lower() in ('dumb', 'unknown')
+        if color_system == 'auto':
+            color_system = detect_color_system(self.is_terminal, environ)
+        self.color_system = color_system
+        self.no_color = environ.get('NO_COLOR', '') != ''
+        self.width = width or (80 if self.is_terminal and dumb else detect_width(environ))
+
+    @property
+    def file(self):
+        return self._file or sys.stdout
+
+    @file.setter
+    def file(self, file):
+        self._file = file
+
+    @contextmanager
+    def capture(self):
+        captured, file = Capture(), self._file
+        self._file = captured
+        try:
+            yield captured
+        finally:
+            self._file = file
+
+    def print(self, markup, highlight=True, soft_wrap=False):
+        segments = None if highlight else self.segments(markup)
+        if segments is None or (not soft_wrap and self.too_wide(segments)):
+            self.rich().print(markup, highlight=highlight, soft_wrap=soft_wrap)
+            return
+        self.file.write(''.join(self.render(text, style) for text, style in segments) + '\n')
+
+    def too_wide(self, segments):
+        # rich wraps lines wider than the console (counting wide characters as two columns)
+        plain = ''.join(text for text, _ in segments)
+        return any((len(line) if line.isascii() else 2 * len(line)) > self.width for line in plain.split('\n'))
+
+    def render(self, text, style):
+        if style is None or self.color_system is None:
+            return text
+        codes = style.codes(self.color_system, self.no_color)
+        return f'\x1b[{codes}m{text}\x1b[0m' if codes else text
+
+    def rich(self):
+        if self._rich is None:
+            self._rich = self._fallback(
+                force_terminal=self.is_terminal, color_system=self.color_system, width=self.width,
+            )
+        self._rich.file = self.file
+        return self._rich
+
+    def segments(self, markup):
+        # the markup as (text, style) pairs, split where a tag opens or closes (as rich splits
+        # it), or None if rich would render it differently
+        stack, segments, text = [], [], []
+
+        def flush():
+            piece = ''.join(text)
+            text.clear()
+            if piece:
+                if CONTROL.search(piece) or EMOJI_CODE.search(piece):
+                    return False
+                style = None
+                for _, tag_style in stack:
+                    style = tag_style if style is None else style + tag_style
+                segments.append((piece, style))
+            return True
+
+        position = 0
+        for match in TAG.finditer(markup):
+            full, escapes, tag = match.groups()
+            start, end = match.span()
+            text.append(markup[position:start].replace('\\[', '['))
+            position = end
+            if escapes:
+                backslashes, escaped = divmod(len(escapes), 2)
+                text.append('\\' * backslashes)
+                if escaped:
+                    text.append(full[len(escapes):])
+                    continue
+            if '=' in tag or tag.startswith('@'):
+                return None  # links and meta data
+            if not flush():
+                return None
+            name = ' '.join(tag.lstrip('/').split()).lower()
+            if tag.startswith('/'):
+                if not stack or (name and stack[-1][0] != name):
+                    # nothing to close (rich raises a MarkupError), or tags closed out of order,
+                    # which rich layers differently
+                    return None
+                stack.pop()
+            else:
+                style = self.styles.get(name)
+                if style is None:
+                    try:
+                        style = Style.parse(name)
+                    except StyleError:
+                        return None
+                stack.append((name, style))
+        text.append(markup[position:].replace('\\[', '['))
+        if not flush():
+            return None
+        return segments
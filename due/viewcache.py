@@ -0,0 +1,87 @@
+from collections import OrderedDict
+
+# caches of filtered views and rendered output for a task tree. `due today / tomorrow / week`
+# and a long-running `due serve` keep asking for the same few views between edits, so results
+# are kept by (query, tree version, TODAY): every mutation bumps the tree's version, which makes
+# entries for the old version unreachable, and they age out of the LRU order like any other.
+#
+#   cache = TASK_TREE.view_cache
+#   cache.views.stats()     {'entries', 'size', 'max_size', 'hits', 'misses', 'evictions'}
+
+# total number of tasks held by cached views
+VIEW_CACHE_TASKS = 200_000
+
+# total characters of cached output, and the largest view whose output is cached (bigger ones
+# are streamed as they're rendered rather than held in memory)
+RENDER_CACHE_CHARS = 4_000_000
+RENDER_CACHE_TASKS = 5_000
+
+
+class LRUCache:
+
+    # least recently used entries are evicted once the sizes of all entries add up to more
+    # than max_size; an entry bigger than max_size on its own isn't kept at all
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # key: (value, size)
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size=1):
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        if size > self.max_size:
+            return
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class ViewCache:
+
+    # views: TaskQuery results, sized by the number of tasks they hold
+    # renders: console output of views, sized in characters
+
+    def __init__(self, view_tasks=VIEW_CACHE_TASKS, render_chars=RENDER_CACHE_CHARS):
+        self.views = LRUCache(view_tasks)
+        self.renders = LRUCache(render_chars)
+
+    def clear(self):
+        self.views.clear()
+        self.renders.clear()
+
+    def stats(self):
+        return {'views': self.views.stats(), 'renders': self.renders.stats()}
@@ -0,0 +1,218 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from due import history, locking, profiling, shards, storage
+
+# workspaces: several task files (one per project or person) shown and edited as one tree.
+# config.yaml lists them instead of a single task_file:
+#
+#   workspace:
+#     - file: ~/work/todo.json
+#       name: work
+#     - ~/notes/todo.snap          (named after the file: 'todo')
+#
+# every file is loaded into a tree of its own (concurrently, in a thread pool), and each one is
+# mounted under a virtual root as a task of its own: the file's task '0.3.1' is '0.1.3.1' in the
+# workspace when the file is mounted as '0.1'. commands work on the union as on any task tree,
+# and changes are passed on to the file the task lives in (and to its journal).
+#
+# parsing json is most of the time a load takes, so every json task file is also kept as a
+# snapshot (see snapshot.py) in a cache directory, keyed by its path and mtime: a file that
+# hasn't changed since is read from its snapshot instead. within a process (e.g. `due serve`)
+# loaded trees are reused as long as their file and journal are unchanged.
+
+CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'due'
+
+# trees loaded in this process, by path: (stamps of the file and its journal, tree)
+LOADED = {}
+
+
+class WorkspaceError(ValueError):
+    pass
+
+
+def entries(config):
+    # (name, path) of every file in the `workspace` setting
+    mounts = []
+    for item in config:
+        if isinstance(item, dict):
+            file = Path(item['file']).expanduser()
+            name = item.get('name') or file.stem
+        else:
+            file = Path(item).expanduser()
+            name = file.stem
+        mounts.append((name, file))
+    return mounts
+
+
+def cache_file(file:Path):
+    # the snapshot of a json task file, named after its path and its current stamp
+    path_key = hashlib.sha1(str(file.resolve()).encode('utf-8')).hexdigest()[:16]
+    stamp_key = hashlib.sha1(repr(storage.stamp(file)).encode('utf-8')).hexdigest()[:16]
+    return CACHE_DIR / f'{path_key}-{stamp_key}.snap'
+
+
+def cached_records(file:Path):
+    # a task file's records, from the cache if the file hasn't changed since it was cached.
+    # snapshots and sharded stores are cheap to read already, so only json files are cached
+    if file.suffix != storage.JSON_SUFFIX:
+        return storage.read_records(file)
+
+    cached = cache_file(file)
+    if cached.exists():
+        return storage.read_records(cached)
+
+    records = list(storage.read_json(file))
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        storage.write_records(cached, records)
+        # snapshots of earlier versions of the file
+        for old in CACHE_DIR.glob(cached.name.split('-')[0] + '-*.snap'):
+            if old != cached:
+                old.unlink()
+    except OSError:
+        pass  # no cache directory: the file is parsed every time
+    return records
+
+
+def journal_stamp(file:Path):
+    return storage.stamp(file.with_name(file.name + '.log'))
+
+
+def load_file(tree_class, file:Path):
+    # one workspace file as a journaled tree of its own, as BaseTaskTree.load() would, but
+    # reading through the cache
+    loaded = LOADED.get(file)
+    if loaded is not None:
+        key, tree = loaded
+        if key == (storage.stamp(file), journal_stamp(file)) and isinstance(tree, tree_class):
+            return tree
+        if tree.journal is not None:
+            tree.journal.close()
+
+    lock = locking.FileLock(file)
+    with lock.hold(shared=True):
+        tree = tree_class._read(file, journaled=True, records=cached_records(file))
+    tree.lock = lock
+    remember(tree)
+    return tree
+
+
+def remember(tree):
+    # keeps a loaded (or just changed) tree for later loads of its file in this process
+    LOADED[tree.file] = ((storage.stamp(tree.file), journal_stamp(tree.file)), tree)
+
+
+class Workspace:
+
+    def __init__(self, names, trees):
+        self.names = names  # mount id: name
+        self.trees = trees  # mount id: the file's own tree
+        # the merged history of the files, and how many records of each one it holds
+        self._history = None
+        self._mounted = {}
+
+    @classmethod
+    def load(cls, tree_class, mounts, workers=None):
+        # loads the (name, file) mounts concurrently and builds their union
+        with profiling.phase('load'):
+            files = [file for _, file in mounts]
+            with ThreadPoolExecutor(max_workers=workers or min(len(files), os.cpu_count() or 1) or 1) as pool:
+                trees = list(pool.map(lambda file: load_file(tree_class, file), files))
+
+            workspace = cls(
+                {f'0.{n}': name for n, (name, _) in enumerate(mounts)},
+                {f'0.{n}': tree for n, tree in enumerate(trees)},
+            )
+            union = tree_class.from_records(workspace.records())
+            union.workspace = workspace
+        return union
+
+    def records(self):
+        # the virtual root, then every file's tree under its mount. a mount is an (unfinished)
+        # task named after its file, without a deadline
+        yield '0', None, {}
+        for mount, tree in self.trees.items():
+            root = tree.task('0')
+            attrs = dict(task_name=self.names[mount], complete=False, mount=str(tree.file))
+            if 'next_id' in root:
+                attrs['next_id'] = root['next_id']
+            yield mount, '0', attrs
+            for task_id, parent_id, data in tree.records():
+                if parent_id is not None:
+                    yield mount + task_id[1:], mount + parent_id[1:], data
+
+    def split(self, task_id):
+        # (mount id, id in the file) of a workspace task id
+        parts = task_id.split('.', 2)
+        mount = '.'.join(parts[:2])
+        if mount not in self.trees:
+            raise WorkspaceError(f"'{task_id}' isn't in any workspace file")
+        return mount, '0' + task_id[len(mount):]
+
+    def tree_of(self, task_id):
+        # the tree of the file a workspace task is in
+        return self.trees[self.split(task_id)[0]]
+
+    def next_id(self, parent_task_id):
+        # the id counter of a task, as its file has it
+        mount, local_id = self.split(parent_task_id)
+        return self.trees[mount].next_id(local_id)
+
+    def check(self, task_id, parent=False):
+        # the virtual root and the mounts stand for files: they can have tasks added under them
+        # (a mount, not the root), but aren't tasks to change
+        if task_id == '0':
+            raise WorkspaceError("tasks go under one of the workspace's files, not under its root '0'" if parent else "the workspace root '0' isn't a task")
+        if task_id in self.trees and not parent:
+            raise WorkspaceError(f"'{task_id}' is the workspace file {self.trees[task_id].file}, not a task")
+
+    def route(self, op, entries):
+        # the entries for each file, with ids as the file has them
+        routed = {}
+        for entry in entries:
+            self.check(entry['id'])
+            mount, local_id = self.split(entry['id'])
+            local = dict(entry, id=local_id)
+            if entry.get('parent') is not None:
+                local['parent'] = self.split(entry['parent'])[1]
+            routed.setdefault(mount, []).append(local)
+        return routed
+
+    def mutate_many(self, op, routed):
+        for mount, entries in routed.items():
+            remember(self.trees[mount].mutate_many(op, entries))
+
+    def commit(self, op, routed):
+        for mount, entries in routed.items():
+            remember(self.trees[mount].commit(op, entries))
+
+    def record_changes(self, records):
+        # deadline changes go to the history of the file the task lives in
+        routed = {}
+        for record in records:
+            mount, local_id = self.split(record['id'])
+            routed.setdefault(mount, []).append(dict(record, id=local_id, milestone=shards.shard_of(local_id)))
+        for mount, local in routed.items():
+            self.trees[mount].record_changes(local)
+
+    def history(self):
+        # the files' histories as one, with workspace ids: kept, and extended on every call with
+        # what each file's history caught up on since
+        if self._history is None:
+            self._history, self._mounted = history.History(), {}
+        for mount, tree in self.trees.items():
+            local = tree.history()
+            self._history.mount(mount, local.since(self._mounted.get(mount, 0)))
+            self._mounted[mount] = len(local)
+        return self._history
+
+    def save(self):
+        for tree in self.trees.values():
+            tree.save(tree.file)
+            remember(tree)
+
+    def files(self):
+        return [tree.file for tree in self.trees.values()]
@@ -0,0 +1,36 @@
+from datetime import date
+
+from due import shards
+from due.arraytree import ArrayTaskTree
+from due.tasks import TaskTree
+
+RECORDS = [
+    ('0', None, {'next_id': 3}),
+    ('0.0', '0', {'task_name': 'soon', 'deadline': date(2026, 10, 20), 'complete': False, 'next_id': 2}),
+    ('0.0.0', '0.0', {'task_name': 'first', 'deadline': date(2026, 10, 18), 'complete': False}),
+    ('0.0.1', '0.0', {'task_name': 'second', 'complete': True, 'note': 'x'}),
+    ('0.1', '0', {'task_name': 'weekly', 'deadline': date(2026, 10, 5), 'complete': False, 'repeat': 'weekly'}),
+    ('0.2', '0', {'task_name': 'done', 'deadline': date(2026, 9, 1), 'complete': True, 'next_id': 1}),
+    ('0.2.0', '0.2', {'task_name': 'old', 'deadline': date(2026, 8, 1), 'complete': True}),
+]
+
+
+def test_matches_networkx_tree():
+    array, graph = ArrayTaskTree.from_records(RECORDS), TaskTree.from_records(RECORDS)
+    assert list(array.records()) == list(graph.records())
+    assert list(array.records('0.0')) == list(graph.records('0.0'))
+    for start, end in [(None, date(2026, 10, 19)), (date(2026, 8, 1), date(2026, 9, 30)), (None, None)]:
+        assert list(array.due_between(start, end).records()) == list(graph.due_between(start, end).records())
+    assert array.next_task_id('0.0') == graph.next_task_id('0.0') == '0.0.2'
+    assert array.next_task_id('0.2.0') == graph.next_task_id('0.2.0') == '0.2.0.0'
+
+
+def test_views_have_their_own_state(tmp_path):
+    directory = tmp_path / 'todo.shards'
+    shards.write(directory, RECORDS)
+    tree = ArrayTaskTree.load(directory, journaled=False, lazy=True)
+    view = tree.completed(False)
+    assert view.base is tree
+    assert view.lock is view.shards is view.workspace is view.file is None
+    assert view.view_cache is not tree.view_cache
+    assert view._deadline_index is view._search_index is None
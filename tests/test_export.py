@@ -0,0 +1,30 @@
+import io
+from datetime import date
+
+from due import export
+from due.tasks import TaskTree
+
+RECORDS = [
+    ('0', None, {}),
+    ('0.0', '0', {'task_name': 'open', 'deadline': date(2026, 10, 20), 'complete': False}),
+    ('0.0.0', '0.0', {'task_name': 'finished', 'deadline': date(2026, 10, 18), 'complete': True}),
+    ('0.1', '0', {'task_name': 'done', 'deadline': None, 'complete': True}),
+]
+
+
+def test_rows_in_preorder():
+    tree = TaskTree.from_records(RECORDS)
+    assert [(row['id'], row['parent'], row['depth']) for row in export.rows(tree)] == [
+        ('0.0', '0', 1), ('0.0.0', '0.0', 2), ('0.1', '0', 1),
+    ]
+    assert [row['id'] for row in export.rows(tree, '0.0')] == ['0.0', '0.0.0']
+
+
+def test_context_tasks_are_marked():
+    view = TaskTree.from_records(RECORDS).completed(True, promote='context')
+    assert [(row['id'], row['context']) for row in export.rows(view)] == [
+        ('0.0', True), ('0.0.0', False), ('0.1', False),
+    ]
+    file = io.StringIO()
+    export.write_md(export.rows(view), file)
+    assert file.getvalue().splitlines()[0] == '- [ ] 0.0 open (2026-10-20) *(context)*'
@@ -0,0 +1,36 @@
+from datetime import date
+
+from due import history
+
+
+def changes(*task_ids):
+    return [history.change(task_id, 'task', date(2026, 10, 1), date(2026, 10, 8), 'blocked' if n % 2 else None) for n, task_id in enumerate(task_ids)]
+
+
+def test_saved_index_catches_up(tmp_path):
+    file = tmp_path / 'todo.json.history'
+    history.append(file, changes('0.1', '0.1.2', '0.2.0'))
+    first = history.History.load(file)
+    assert history.index_file(file).exists()
+    assert [record['id'] for record in first.under('0.1')] == ['0.1', '0.1.2']
+
+    history.append(file, changes('0.1.2.5', '0.3', '0.1.4'))
+    loaded = history.History.load(file)
+    assert loaded.offset == file.stat().st_size
+    assert loaded.records[0] is None  # not read until a report needs it
+
+    history.index_file(file).unlink()
+    scanned = history.History.load(file)
+    for task_id in ['0', '0.1', '0.1.2', '0.1.2.5', '0.2', '0.4']:
+        assert loaded.under(task_id) == scanned.under(task_id)
+    assert [record['id'] for record in loaded.under('0.1.2')] == ['0.1.2', '0.1.2.5']
+    assert loaded.counts() == scanned.counts() == {'uncategorized': 4, 'blocked': 2}
+
+
+def test_under_a_mounted_file():
+    workspace = history.History()
+    workspace.mount('0.1', changes('0.3', '0.3.1', '0.4'))
+    workspace.mount('0.2', changes('0.3'))
+    assert [record['id'] for record in workspace.under('0.1')] == ['0.1.3', '0.1.3.1', '0.1.4']
+    assert [record['id'] for record in workspace.under('0.1.3.1')] == ['0.1.3.1']
+    assert [record['id'] for record in workspace.under('0.2.3')] == ['0.2.3']
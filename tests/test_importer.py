@@ -0,0 +1,24 @@
+from datetime import date
+
+import pytest
+
+from due import importer
+
+
+def test_names_are_strings():
+    rows = [{'name': 123, 'deadline': '2026-10-18'}, {'name': date(2026, 1, 1), 'deadline': '2026-10-18'}]
+    tasks = importer.validate(rows)
+    assert [name for _, _, name, _, _ in tasks] == ['123', '2026-01-01']
+
+
+def test_rejects_list_names():
+    with pytest.raises(importer.ImportFileError) as e:
+        importer.validate([{'name': ['a', 'b'], 'deadline': '2026-10-18'}])
+    assert e.value.errors == ["line 1: not a valid name: ['a', 'b']"]
+
+
+def test_yaml_number_name(tmp_path):
+    file = tmp_path / 'tasks.yaml'
+    file.write_text('- name: 123\n  deadline: 2026-10-18\n')
+    tasks = importer.validate(importer.read_rows(file, 'yaml'), 'task')
+    assert tasks[0][2] == '123'
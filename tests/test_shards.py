@@ -0,0 +1,53 @@
+from datetime import date
+
+import pytest
+
+from due import shards
+from due.arraytree import ArrayTaskTree
+from due.tasks import TaskTree
+
+RECORDS = [
+    ('0', None, {'next_id': 3}),
+    ('0.0', '0', {'task_name': 'soon', 'deadline': date(2026, 10, 20), 'complete': False, 'next_id': 2}),
+    ('0.0.0', '0.0', {'task_name': 'first', 'deadline': date(2026, 10, 18), 'complete': False}),
+    ('0.0.1', '0.0', {'task_name': 'second', 'deadline': date(2026, 10, 19), 'complete': True}),
+    ('0.1', '0', {'task_name': 'later', 'deadline': date(2026, 12, 1), 'complete': False, 'next_id': 1}),
+    ('0.1.0', '0.1', {'task_name': 'early part', 'deadline': date(2026, 10, 19), 'complete': False}),
+    ('0.2', '0', {'task_name': 'done', 'deadline': date(2026, 9, 1), 'complete': True, 'next_id': 1}),
+    ('0.2.0', '0.2', {'task_name': 'old', 'deadline': date(2026, 8, 1), 'complete': True}),
+]
+
+
+@pytest.fixture(params=[TaskTree, ArrayTaskTree])
+def trees(request, tmp_path):
+    # the same tree, loaded in full and lazily from a sharded store
+    directory = tmp_path / 'todo.shards'
+    shards.write(directory, RECORDS)
+    tree_class = request.param
+    return tree_class.load(directory, journaled=False), tree_class.load(directory, journaled=False, lazy=True)
+
+
+def ids(task_tree):
+    return sorted(node for node, _ in task_tree.nodes())
+
+
+def test_lazy_filters_match_full_tree(trees):
+    full, _ = trees
+    filters = [
+        lambda t: t.due_by(date(2026, 10, 19)),
+        lambda t: t.due_between(date(2026, 8, 1), date(2026, 8, 31)),
+        lambda t: t.depth_limit(2),
+        lambda t: t.completed(True),
+        lambda t: t.completed(False, promote='context'),
+        lambda t: t.subtree(lambda node, data: node == '0' or 'e' in data['task_name']),
+    ]
+    for apply in filters:
+        lazy = type(full).load(full.file, journaled=False, lazy=True)
+        assert ids(apply(lazy)) == ids(apply(full))
+
+
+def test_due_between_reads_only_shards_due(trees):
+    _, lazy = trees
+    view = lazy.due_between(date(2026, 10, 19), date(2026, 10, 31))
+    assert ids(view) == ['0', '0.0', '0.0.1', '0.1', '0.1.0']
+    assert lazy.shards.unloaded == {'0.2'}